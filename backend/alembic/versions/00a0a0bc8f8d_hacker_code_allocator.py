@@ -0,0 +1,58 @@
+"""hacker code allocator
+
+Revision ID: 00a0a0bc8f8d
+Revises:
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '00a0a0bc8f8d'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.hacker_code_counter (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            next_value BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    op.execute("INSERT INTO public.hacker_code_counter (id) VALUES (TRUE) ON CONFLICT DO NOTHING")
+    op.execute("ALTER TABLE public.hacker_code_counter ENABLE ROW LEVEL SECURITY")
+
+    # Returns the first value of a block of block_size counter values
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.reserve_hacker_code_block(block_size INTEGER)
+        RETURNS BIGINT
+        LANGUAGE sql
+        SECURITY DEFINER SET search_path = ''
+        AS $$
+            UPDATE public.hacker_code_counter
+            SET next_value = next_value + block_size
+            WHERE id
+            RETURNING next_value - block_size;
+        $$
+    """)
+    op.execute("REVOKE ALL ON FUNCTION public.reserve_hacker_code_block(INTEGER) FROM PUBLIC, anon, authenticated")
+    op.execute("GRANT EXECUTE ON FUNCTION public.reserve_hacker_code_block(INTEGER) TO service_role")
+
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS registrations_hacker_code_key
+        ON public.registrations (hacker_code)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS public.registrations_hacker_code_key")
+    op.execute("DROP FUNCTION IF EXISTS public.reserve_hacker_code_block(INTEGER)")
+    op.execute("DROP TABLE IF EXISTS public.hacker_code_counter")
@@ -0,0 +1,33 @@
+"""unique registration per user
+
+Revision ID: 3c5e1f7a9b2d
+Revises: 00a0a0bc8f8d
+Create Date: 2026-10-17 10:03:11.402977
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5e1f7a9b2d'
+down_revision: Union[str, None] = '00a0a0bc8f8d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # POST /register relies on this index to reject a second registration
+    # atomically instead of checking for an existing row first.
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS registrations_user_id_key
+        ON public.registrations (user_id)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS public.registrations_user_id_key")
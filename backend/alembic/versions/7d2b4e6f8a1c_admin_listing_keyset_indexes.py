@@ -0,0 +1,37 @@
+"""admin listing keyset indexes
+
+Revision ID: 7d2b4e6f8a1c
+Revises: 3c5e1f7a9b2d
+Create Date: 2026-10-17 14:05:12.480913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2b4e6f8a1c'
+down_revision: Union[str, None] = '3c5e1f7a9b2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Admin listings page on (created_at, id) newest first
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS registrations_created_at_id_idx
+        ON public.registrations (created_at DESC, id DESC)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS preregistrations_created_at_id_idx
+        ON public.preregistrations (created_at DESC, id DESC)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS public.preregistrations_created_at_id_idx")
+    op.execute("DROP INDEX IF EXISTS public.registrations_created_at_id_idx")
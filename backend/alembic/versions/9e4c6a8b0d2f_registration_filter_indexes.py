@@ -0,0 +1,57 @@
+"""registration filter indexes
+
+Revision ID: 9e4c6a8b0d2f
+Revises: 7d2b4e6f8a1c
+Create Date: 2026-10-17 15:21:47.902331
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c6a8b0d2f'
+down_revision: Union[str, None] = '7d2b4e6f8a1c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Trigram indexes back the admin search (ILIKE '%term%') on these columns
+SEARCH_COLUMNS = ("full_name", "email", "hacker_code")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions")
+    for column in SEARCH_COLUMNS:
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS registrations_{column}_trgm_idx
+            ON public.registrations USING gin ({column} extensions.gin_trgm_ops)
+        """)
+
+    # Equality filters, ordered like the keyset pager so a filtered page is a range scan
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS registrations_education_level_created_at_idx
+        ON public.registrations (education_level, created_at DESC, id DESC)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS registrations_gender_identity_created_at_idx
+        ON public.registrations (gender_identity, created_at DESC, id DESC)
+    """)
+
+    # Registrations still waiting on a consent form upload
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS registrations_missing_consent_created_at_idx
+        ON public.registrations (created_at DESC, id DESC)
+        WHERE consent_form_url IS NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS public.registrations_missing_consent_created_at_idx")
+    op.execute("DROP INDEX IF EXISTS public.registrations_gender_identity_created_at_idx")
+    op.execute("DROP INDEX IF EXISTS public.registrations_education_level_created_at_idx")
+    for column in SEARCH_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS public.registrations_{column}_trgm_idx")
@@ -0,0 +1,140 @@
+"""registration stats
+
+Revision ID: b1f3d5e7a9c0
+Revises: 9e4c6a8b0d2f
+Create Date: 2026-10-17 16:48:03.215770
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Each bucket is split over this many rows, picked by user, so concurrent
+# registrations rarely wait on the same row lock (the total and the
+# two-valued dimensions are touched by every write)
+STAT_SHARDS = 16
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1f3d5e7a9c0'
+down_revision: Union[str, None] = '9e4c6a8b0d2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.registration_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            shard SMALLINT NOT NULL DEFAULT 0,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value, shard)
+        )
+    """)
+    op.execute("ALTER TABLE public.registration_stats ENABLE ROW LEVEL SECURITY")
+
+    # The (dimension, value) buckets a registration counts towards, and the
+    # shard of each that its counts go to
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION public.registration_stat_keys(r public.registrations)
+        RETURNS TABLE (dimension TEXT, value TEXT, shard SMALLINT)
+        LANGUAGE sql
+        STABLE SET search_path = ''
+        AS $$
+            SELECT k.dimension, k.value, (abs(pg_catalog.hashtext(r.user_id::TEXT)::BIGINT) % {STAT_SHARDS})::SMALLINT
+            FROM (
+                VALUES
+                    ('total', 'all'),
+                    ('education_level', COALESCE(r.education_level::TEXT, 'unknown')),
+                    ('gender_identity', COALESCE(NULLIF(btrim(r.gender_identity), ''), 'unknown')),
+                    ('staying_overnight', CASE WHEN r.staying_overnight THEN 'true' ELSE 'false' END),
+                    ('dietary_restrictions', COALESCE(NULLIF(lower(btrim(r.dietary_restrictions)), ''), 'none')),
+                    ('signups_per_hour', to_char(
+                        date_trunc('hour', r.created_at AT TIME ZONE 'UTC'), 'YYYY-MM-DD"T"HH24:00:00"Z"'
+                    ))
+                UNION ALL
+                SELECT 'minor_consent_form', CASE WHEN r.consent_form_url IS NULL THEN 'missing' ELSE 'uploaded' END
+                WHERE r.is_minor
+            ) k (dimension, value)
+        $$
+    """)
+
+    # Applies a write's net change to the buckets. Rows are touched in key
+    # order so concurrent writers lock them in the same order.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.registration_stats_apply()
+        RETURNS TRIGGER
+        LANGUAGE plpgsql
+        SECURITY DEFINER SET search_path = ''
+        AS $$
+        BEGIN
+            INSERT INTO public.registration_stats AS s (dimension, value, shard, count)
+            SELECT d.dimension, d.value, d.shard, sum(d.delta)
+            FROM (
+                SELECT k.dimension, k.value, k.shard, -1 AS delta
+                FROM public.registration_stat_keys(OLD) k
+                WHERE TG_OP IN ('UPDATE', 'DELETE')
+                UNION ALL
+                SELECT k.dimension, k.value, k.shard, 1
+                FROM public.registration_stat_keys(NEW) k
+                WHERE TG_OP IN ('INSERT', 'UPDATE')
+            ) d
+            GROUP BY d.dimension, d.value, d.shard
+            HAVING sum(d.delta) <> 0
+            ORDER BY d.dimension, d.value, d.shard
+            ON CONFLICT (dimension, value, shard) DO UPDATE SET count = s.count + EXCLUDED.count;
+            RETURN NULL;
+        END;
+        $$
+    """)
+
+    # Backfill under a lock that blocks writes, so no change slips in between
+    op.execute("LOCK TABLE public.registrations IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("DELETE FROM public.registration_stats")
+    op.execute("""
+        INSERT INTO public.registration_stats (dimension, value, shard, count)
+        SELECT k.dimension, k.value, k.shard, count(*)
+        FROM public.registrations r, LATERAL public.registration_stat_keys(r) k
+        GROUP BY k.dimension, k.value, k.shard
+    """)
+    op.execute("""
+        CREATE TRIGGER registration_stats_apply
+        AFTER INSERT OR UPDATE OR DELETE ON public.registrations
+        FOR EACH ROW EXECUTE FUNCTION public.registration_stats_apply()
+    """)
+
+    # All buckets as {dimension: {value: count}} in one row, shards summed
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.registration_stats_summary()
+        RETURNS JSONB
+        LANGUAGE sql
+        STABLE SECURITY DEFINER SET search_path = ''
+        AS $$
+            SELECT COALESCE(jsonb_object_agg(dimension, counts), '{}'::JSONB)
+            FROM (
+                SELECT dimension, jsonb_object_agg(value, count) AS counts
+                FROM (
+                    SELECT dimension, value, sum(count) AS count
+                    FROM public.registration_stats
+                    GROUP BY dimension, value
+                    HAVING sum(count) <> 0
+                ) b
+                GROUP BY dimension
+            ) d
+        $$
+    """)
+    op.execute("REVOKE ALL ON FUNCTION public.registration_stats_summary() FROM PUBLIC, anon, authenticated")
+    op.execute("GRANT EXECUTE ON FUNCTION public.registration_stats_summary() TO service_role")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS public.registration_stats_summary()")
+    op.execute("DROP TRIGGER IF EXISTS registration_stats_apply ON public.registrations")
+    op.execute("DROP FUNCTION IF EXISTS public.registration_stats_apply()")
+    op.execute("DROP FUNCTION IF EXISTS public.registration_stat_keys(public.registrations)")
+    op.execute("DROP TABLE IF EXISTS public.registration_stats")
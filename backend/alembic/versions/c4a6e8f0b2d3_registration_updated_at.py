@@ -0,0 +1,61 @@
+"""registration updated_at
+
+Revision ID: c4a6e8f0b2d3
+Revises: b1f3d5e7a9c0
+Create Date: 2026-10-17 18:02:36.771045
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a6e8f0b2d3'
+down_revision: Union[str, None] = 'b1f3d5e7a9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("registrations", "preregistrations")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.set_updated_at()
+        RETURNS TRIGGER
+        LANGUAGE plpgsql
+        SET search_path = ''
+        AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END;
+        $$
+    """)
+
+    for table in TABLES:
+        op.execute(f"ALTER TABLE public.{table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ")
+        op.execute(f"UPDATE public.{table} SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL")
+        op.execute(f"ALTER TABLE public.{table} ALTER COLUMN updated_at SET DEFAULT now()")
+        op.execute(f"ALTER TABLE public.{table} ALTER COLUMN updated_at SET NOT NULL")
+        op.execute(f"""
+            CREATE TRIGGER {table}_set_updated_at
+            BEFORE UPDATE ON public.{table}
+            FOR EACH ROW EXECUTE FUNCTION public.set_updated_at()
+        """)
+        # Delta sync reads changes in (updated_at, id) order
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table}_updated_at_id_idx
+            ON public.{table} (updated_at, id)
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS public.{table}_updated_at_id_idx")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_set_updated_at ON public.{table}")
+        op.execute(f"ALTER TABLE public.{table} DROP COLUMN IF EXISTS updated_at")
+    op.execute("DROP FUNCTION IF EXISTS public.set_updated_at()")
@@ -0,0 +1,123 @@
+"""
+Benchmark the rate limiter with millions of distinct keys.
+
+Compares the sliding-window counter (utils/rate_limit_backends.py) with the
+previous implementation, which kept a list of request timestamps per key
+in a defaultdict and never dropped idle keys. Each scenario replays the
+same key sequence against both on a simulated clock:
+
+- spray: every request comes from a new key (scanners, rotating IPs)
+- hot: requests cycle over a small set of keys, most of them rejected
+- hot, high limit: the same with a 1000-request limit, where the old
+  limiter rebuilt a list of up to 1000 timestamps on every check
+
+Memory is measured with tracemalloc on a separate pass, so it doesn't
+distort the timings.
+
+Usage (from backend/):
+    python benchmarks/bench_rate_limit.py [--keys 2000000] [--max-keys 100000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limit_backends import SlidingWindowCounter  # noqa: E402
+
+WINDOW_SECONDS = 60
+# Simulated requests per second; the spray scenario spans several windows
+REQUEST_RATE = 20000
+
+
+class TimestampListLimiter:
+    """The previous implementation, with the clock passed in."""
+
+    def __init__(self, window_seconds: int, max_requests: int):
+        self.window_seconds = window_seconds
+        self.max_requests = max_requests
+        self.store = defaultdict(list)
+
+    def check(self, key: str, now: float) -> bool:
+        store = self.store
+        store[key] = [t for t in store[key] if now - t < self.window_seconds]
+        if len(store[key]) >= self.max_requests:
+            return False
+        store[key].append(now)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def make_keys(count: int, distinct: int) -> list[str]:
+    return [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}:{i >> 24}" for i in (n % distinct for n in range(count))]
+
+
+def run(check, keys: list[str]) -> tuple[float, int]:
+    start_clock = 1_700_000_000.0
+    allowed = 0
+    start = time.perf_counter()
+    for n, key in enumerate(keys):
+        allowed += check(key, start_clock + n / REQUEST_RATE)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(keys) * 1e9, allowed
+
+
+def measure_memory(make_limiter, keys: list[str]) -> tuple[float, int]:
+    limiter, check = make_limiter()
+    tracemalloc.start()
+    run(check, keys)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / 1e6, len(limiter)
+
+
+def old_limiter(max_requests: int):
+    limiter = TimestampListLimiter(WINDOW_SECONDS, max_requests)
+    return limiter, limiter.check
+
+
+def new_limiter(max_requests: int, max_keys: int):
+    limiter = SlidingWindowCounter(WINDOW_SECONDS, max_requests, max_keys)
+    return limiter, lambda key, now: limiter.hit(key, now).allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=2_000_000, help="requests per scenario")
+    parser.add_argument("--max-keys", type=int, default=100_000, help="RATE_LIMIT_MAX_KEYS for the new limiter")
+    parser.add_argument("--hot-keys", type=int, default=1000)
+    args = parser.parse_args()
+
+    spray_keys = make_keys(args.keys, args.keys)
+    hot_keys = make_keys(args.keys, args.hot_keys)
+    scenarios = [
+        ("spray", spray_keys, 10),
+        ("hot", hot_keys, 10),
+        ("hot, high limit", hot_keys, 1000),
+    ]
+
+    print(f"{args.keys:,} requests per scenario at {REQUEST_RATE:,}/s simulated, {WINDOW_SECONDS}s window")
+    print(f"{'scenario':>16}  {'limit':>5}  {'implementation':>16}  {'ns/check':>9}  {'allowed':>10}  {'keys held':>10}  {'MB held':>8}")
+    for scenario, keys, max_requests in scenarios:
+        implementations = {
+            "timestamp lists": lambda: old_limiter(max_requests),
+            "sliding window": lambda: new_limiter(max_requests, args.max_keys),
+        }
+        for name, make_limiter in implementations.items():
+            _, check = make_limiter()
+            ns_per_check, allowed = run(check, keys)
+            megabytes, held = measure_memory(make_limiter, keys)
+            print(
+                f"{scenario:>16}  {max_requests:>5}  {name:>16}  {ns_per_check:>9.0f}  "
+                f"{allowed:>10,}  {held:>10,}  {megabytes:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Check that rate limits hold across worker processes, and time each backend.
+
+Starts --workers processes that all hammer the same keys through one
+backend, standing in for uvicorn workers, and counts how many requests
+were allowed in total. With the memory backend each process has its own
+counts, so roughly workers x limit get through; the mmap and redis
+backends should allow about the limit itself. The redis backend runs
+against benchmarks/resp_stand_in.py, started on a free port.
+
+Usage (from backend/):
+    python benchmarks/bench_rate_limit_backends.py [--workers 4] [--requests 20000] [--limit 100]
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.rate_limit_backends import MemoryBackend, MmapBackend, RedisBackend  # noqa: E402
+
+WINDOW_SECONDS = 3600
+KEYS = 10
+
+
+def make_backend(name: str, mmap_path: str, redis_url: str):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "mmap":
+        return MmapBackend(mmap_path)
+    return RedisBackend(redis_url, timeout=2.0)
+
+
+def worker(name: str, mmap_path: str, redis_url: str, store: str, requests: int, limit: int, start, results):
+    async def run():
+        backend = make_backend(name, mmap_path, redis_url)
+        start.wait()
+        allowed = 0
+        began = time.perf_counter()
+        for n in range(requests):
+            decision = await backend.hit(store, f"key-{n % KEYS}", WINDOW_SECONDS, limit)
+            allowed += decision.allowed
+        elapsed = time.perf_counter() - began
+        await backend.close()
+        return allowed, elapsed / requests * 1e6
+
+    results.put(asyncio.run(run()))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"RESP stand-in did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per worker")
+    parser.add_argument("--limit", type=int, default=100, help="requests allowed per key")
+    parser.add_argument("--backends", default="memory,mmap,redis")
+    args = parser.parse_args()
+
+    port = free_port()
+    stand_in = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "resp_stand_in.py"), "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+    )
+    mmap_dir = tempfile.mkdtemp()
+    try:
+        wait_for_port(port)
+        redis_url = f"redis://127.0.0.1:{port}/0"
+        expected = KEYS * args.limit
+        print(f"{args.workers} workers x {args.requests:,} requests over {KEYS} keys, limit {args.limit} per key")
+        print(f"{'backend':>8}  {'allowed':>8}  {'expected':>8}  {'us/check':>9}")
+        for name in args.backends.split(","):
+            context = multiprocessing.get_context("spawn")
+            start, results = context.Event(), context.Queue()
+            mmap_path = os.path.join(mmap_dir, "rate-limit")
+            processes = [
+                context.Process(
+                    target=worker,
+                    args=(name, mmap_path, redis_url, f"bench-{name}", args.requests, args.limit, start, results),
+                )
+                for _ in range(args.workers)
+            ]
+            for process in processes:
+                process.start()
+            # Let every worker open its backend before the clock starts
+            time.sleep(1.0)
+            start.set()
+            outcomes = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            allowed = sum(outcome[0] for outcome in outcomes)
+            micros = sum(outcome[1] for outcome in outcomes) / len(outcomes)
+            print(f"{name:>8}  {allowed:>8,}  {expected:>8,}  {micros:>9.1f}")
+    finally:
+        stand_in.terminate()
+        stand_in.wait()
+
+
+if __name__ == "__main__":
+    main()
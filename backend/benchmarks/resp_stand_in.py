@@ -0,0 +1,203 @@
+"""
+Minimal RESP server standing in for Redis when testing the redis rate
+limit backend.
+
+Supports what the backend sends (EVALSHA, falling back to EVAL, of its
+sliding window script) plus SCRIPT LOAD/FLUSH, PING, AUTH, SELECT, GET,
+INCR, DECR, PEXPIRE, DEL and MULTI/EXEC/DISCARD. There is no Lua
+interpreter: the script runs as a Python equivalent of
+SLIDING_WINDOW_SCRIPT and any other script is rejected. As in Redis,
+EVALSHA answers NOSCRIPT until the script has been sent once. Keys live in one dict
+with optional expiry; commands are handled one at a time on the event
+loop, so scripts and MULTI/EXEC blocks are atomic as in Redis.
+
+Usage (from backend/):
+    python benchmarks/resp_stand_in.py [--port 6390]
+    RATE_LIMIT_BACKEND=redis RATE_LIMIT_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+"""
+
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limit_backends import SLIDING_WINDOW_SCRIPT  # noqa: E402
+
+
+class Store:
+    def __init__(self):
+        self.values: dict[bytes, bytes] = {}
+        self.expires: dict[bytes, float] = {}
+        # Script source -> Python equivalent taking (keys, args)
+        self.scripts = {SLIDING_WINDOW_SCRIPT.encode(): self.sliding_window}
+        # SHA1 (hex) -> source of the scripts sent so far
+        self.loaded: dict[bytes, bytes] = {}
+
+    def load(self, source: bytes):
+        if source not in self.scripts:
+            return None
+        sha = hashlib.sha1(source).hexdigest().encode()
+        self.loaded[sha] = source
+        return sha
+
+    def _live(self, key: bytes):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+
+    def incr_by(self, key: bytes, amount: int):
+        value = self._live(key)
+        try:
+            number = int(value or 0) + amount
+        except ValueError:
+            return Error("ERR value is not an integer or out of range")
+        self.values[key] = str(number).encode()
+        return number
+
+    def sliding_window(self, keys: list, args: list):
+        current = int(self._live(keys[0]) or 0)
+        previous = int(self._live(keys[1]) or 0)
+        if previous * float(args[1]) + current < int(args[0]):
+            self.incr_by(keys[0], 1)
+            self.run(b"PEXPIRE", [keys[0], args[2]])
+        return [current, previous]
+
+    def run(self, name: bytes, args: list):
+        if name == b"PING":
+            return Simple("PONG")
+        if name in (b"AUTH", b"SELECT"):
+            return Simple("OK")
+        if name == b"GET":
+            return self._live(args[0])
+        if name == b"INCR":
+            return self.incr_by(args[0], 1)
+        if name == b"DECR":
+            return self.incr_by(args[0], -1)
+        if name == b"PEXPIRE":
+            if self._live(args[0]) is None:
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        if name in (b"EVAL", b"EVALSHA"):
+            if name == b"EVALSHA":
+                source = self.loaded.get(args[0].lower())
+                if source is None:
+                    return Error("NOSCRIPT No matching script. Please use EVAL.")
+            elif self.load(args[0]) is None:
+                return Error("ERR the stand-in only runs the rate limit script")
+            else:
+                source = args[0]
+            key_count = int(args[1])
+            return self.scripts[source](args[2:2 + key_count], args[2 + key_count:])
+        if name == b"SCRIPT" and args:
+            if args[0].upper() == b"LOAD":
+                sha = self.load(args[1])
+                return Error("ERR the stand-in only runs the rate limit script") if sha is None else sha
+            if args[0].upper() == b"FLUSH":
+                self.loaded.clear()
+                return Simple("OK")
+        if name == b"DEL":
+            removed = 0
+            for key in args:
+                removed += self._live(key) is not None
+                self.values.pop(key, None)
+                self.expires.pop(key, None)
+            return removed
+        return Error(f"ERR unknown command '{name.decode(errors='replace')}'")
+
+
+class Simple(str):
+    pass
+
+
+class Error(str):
+    pass
+
+
+def encode(reply) -> bytes:
+    if isinstance(reply, Error):
+        return b"-%s\r\n" % reply.encode()
+    if isinstance(reply, Simple):
+        return b"+%s\r\n" % reply.encode()
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+    raise TypeError(f"Cannot encode {reply!r}")
+
+
+async def read_command(reader: asyncio.StreamReader) -> list:
+    line = await reader.readuntil(b"\r\n")
+    if not line.startswith(b"*"):
+        # Inline command, e.g. from telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readuntil(b"\r\n"))[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def handler(store: Store):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        queued = None
+        try:
+            while True:
+                command = await read_command(reader)
+                if not command:
+                    continue
+                name, args = command[0].upper(), command[1:]
+                if name == b"MULTI":
+                    queued, reply = [], Simple("OK")
+                elif name == b"EXEC":
+                    if queued is None:
+                        reply = Error("ERR EXEC without MULTI")
+                    else:
+                        reply = [store.run(queued_name, queued_args) for queued_name, queued_args in queued]
+                        queued = None
+                elif name == b"DISCARD":
+                    queued, reply = None, Simple("OK")
+                elif queued is not None:
+                    queued.append((name, args))
+                    reply = Simple("QUEUED")
+                else:
+                    reply = store.run(name, args)
+                writer.write(encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(handler(Store()), host, port)
+    print(f"RESP stand-in listening on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
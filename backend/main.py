@@ -1,16 +1,45 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from routers import root, register, auth, admin
+from routers import root, register, auth, admin, me
 import os
-from utils.supabase_client import supabase
+from utils.database import close_clients
+from utils.auth import warm_jwks
+from utils.snapshot import start_snapshots, stop_snapshots
+from utils.rate_limit import get_rate_limit_backend, close_rate_limit_backend
+from utils.rate_limit_middleware import RateLimitMiddleware
+from utils.body_size_middleware import BodySizeLimitMiddleware
+from utils.email import init_email_service, close_email_service
+from utils.email_queue import email_queue
+from utils.email_outbox import email_outbox
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail at startup, not on the first request, if the backend is misconfigured
+    get_rate_limit_backend()
+    # Requests only read cached signing keys; fetch them before serving
+    await warm_jwks()
+    init_email_service()
+    email_queue.start()
+    # Replays email left over from workers that exited or crashed
+    email_outbox.start()
+    start_snapshots()
+    yield
+    await stop_snapshots()
+    await close_rate_limit_backend()
+    await email_queue.stop()
+    await email_outbox.stop()
+    close_email_service()
+    await close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def health_check():
@@ -48,6 +77,10 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
+# Added before CORS so that CORSMiddleware wraps them and 413s/429s carry CORS headers
+app.add_middleware(BodySizeLimitMiddleware)
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000",
@@ -58,12 +91,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset"],
 )
 
 app.include_router(root.router, prefix="/api")
 app.include_router(register.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
+app.include_router(me.router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
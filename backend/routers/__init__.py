@@ -1,2 +1,2 @@
 # empty init file
-from . import root, register, auth, admin
+from . import root, register, auth, admin, me
@@ -1,126 +1,574 @@
+import os
+import re
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from utils.auth import get_current_user
-from utils.auth_helpers import get_admin_client
-from utils.storage import get_guardian_form_url
-from utils.rate_limit import admin_rate_limit
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from postgrest.exceptions import APIError
+from models.registration import EducationLevel
+from utils.auth import auth_cache_stats, get_current_user
+from utils.database import get_admin_client, execute, database_stats
+from utils.storage import get_guardian_form_url, get_guardian_form_urls
+from utils.rate_limit import ADMIN_LIMIT, rate_limited
+from utils.cache import TTLCache
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    UNDEFINED_COLUMN,
+    INVALID_TEXT_REPRESENTATION,
+    parse_field_names,
+    parse_fields,
+    fetch_page,
+    iter_pages,
+)
+from utils.delta_sync import WATERMARK_COLUMNS, fetch_changes
+from utils.events import broker as event_broker
+from utils.snapshot import Condition, fresh_snapshot, snapshot_stats
+from utils.export import EXPORT_FORMATS, encode_csv, encode_ndjson
+from utils.email_queue import email_queue
+from utils.email_outbox import email_outbox
+from utils.idempotency import idempotency_stats
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Admin status is cached per user id; changes to users.is_admin take effect
+# after at most this many seconds unless invalidate_admin_status() is called.
+ADMIN_CACHE_TTL_SECONDS = int(os.getenv("ADMIN_CACHE_TTL_SECONDS", "60"))
+_admin_cache = TTLCache(maxsize=4096, ttl=ADMIN_CACHE_TTL_SECONDS)
 
-def check_is_admin(current_user) -> bool:
+MAX_SIGNED_URL_BATCH = 100
+
+
+class InvalidateAdminCacheRequest(BaseModel):
+    """Request to drop cached admin status (all users if user_id is omitted)"""
+    user_id: Optional[str] = None
+
+
+class ConsentFormUrlsRequest(BaseModel):
+    """consent_form_url paths to sign in one batch"""
+    paths: list[str] = Field(..., min_length=1, max_length=MAX_SIGNED_URL_BATCH)
+
+
+def _admin_claim(current_user) -> Optional[bool]:
+    """
+    Read admin status from a custom access token claim, if one is present.
+
+    A custom access token hook may add ``is_admin`` either at the top level
+    or under ``app_metadata`` (which users cannot edit themselves).
+    """
+    app_metadata = getattr(current_user, "app_metadata", None) or {}
+    if "is_admin" in app_metadata:
+        return app_metadata["is_admin"] is True
+
+    claims = getattr(current_user, "claims", None) or {}
+    if "is_admin" in claims:
+        return claims["is_admin"] is True
+
+    return None
+
+
+def invalidate_admin_status(user_id: Optional[str] = None):
+    """Drop cached admin status for one user, or for everyone if user_id is None."""
+    if user_id is None:
+        _admin_cache.clear()
+    else:
+        _admin_cache.pop(str(user_id))
+
+
+async def check_is_admin(current_user) -> bool:
     """Check if user has is_admin=true in the users table."""
     user_id = getattr(current_user, "id", None)
     if not user_id:
         return False
 
+    claimed = _admin_claim(current_user)
+    if claimed is not None:
+        return claimed
+
+    cached = _admin_cache.get(str(user_id))
+    if cached is not None:
+        return cached
+
     try:
-        admin_client = get_admin_client()
-        result = (
+        admin_client = await get_admin_client()
+        result = await execute(
             admin_client
             .table("users")
             .select("is_admin")
             .eq("id", str(user_id))
             .single()
-            .execute()
         )
 
-        if result.data and result.data.get("is_admin") is True:
-            return True
-        return False
+        is_admin = bool(result.data and result.data.get("is_admin") is True)
+        _admin_cache.set(str(user_id), is_admin)
+        return is_admin
     except Exception as exc:
         logger.warning("Failed to check admin status for user %s: %s", user_id, exc)
         return False
 
 
-def ensure_admin_access(current_user):
-    if not check_is_admin(current_user):
+async def ensure_admin_access(current_user):
+    if not await check_is_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin access required")
 
 
 @router.get("/admin/me")
+@rate_limited(ADMIN_LIMIT)
 async def admin_me(
     request: Request,
-    current_user=Depends(get_current_user),
-    _rate_limit: str = Depends(admin_rate_limit)
+    current_user=Depends(get_current_user)
 ):
-    return {"is_admin": check_is_admin(current_user)}
+    return {"is_admin": await check_is_admin(current_user)}
 
 
-@router.get("/admin/registrations")
-async def list_registrations(
+@router.post("/admin/invalidate-admin-cache")
+@rate_limited(ADMIN_LIMIT)
+async def invalidate_admin_cache(
+    request: Request,
+    body: InvalidateAdminCacheRequest,
+    current_user=Depends(get_current_user)
+):
+    """Forget cached admin status after users.is_admin changes"""
+    await ensure_admin_access(current_user)
+    invalidate_admin_status(body.user_id)
+    return {"success": True}
+
+
+@router.get("/admin/pool-stats")
+@rate_limited(ADMIN_LIMIT)
+async def pool_stats(
     request: Request,
-    current_user=Depends(get_current_user),
-    _rate_limit: str = Depends(admin_rate_limit)
+    current_user=Depends(get_current_user)
 ):
-    ensure_admin_access(current_user)
+    """Connection pool usage of the shared Supabase clients, and the caches that save round trips to them"""
+    await ensure_admin_access(current_user)
+    return {**database_stats(), "auth_cache": auth_cache_stats(), "idempotency": idempotency_stats()}
+
+
+@router.get("/admin/email-queue-stats")
+@rate_limited(ADMIN_LIMIT)
+async def email_queue_stats(
+    request: Request,
+    current_user=Depends(get_current_user)
+):
+    """Depth, outcomes and latency of the background email queue, and its outbox"""
+    await ensure_admin_access(current_user)
+    return {**email_queue.stats(), "outbox": email_outbox.stats()}
+
+
+# Characters kept in free-text search; anything else (PostgREST syntax such
+# as commas and parentheses, LIKE wildcards) becomes a wildcard.
+_SEARCH_UNSAFE_RE = re.compile(r"[^\w@.+' -]+")
+SEARCH_MAX_LENGTH = 100
+SEARCH_COLUMNS = ("full_name", "email", "hacker_code")
+
+
+@lru_cache(maxsize=256)
+def _ilike_pattern(pattern: str) -> re.Pattern:
+    # PostgREST turns * into %; % matches any run of characters and _ any one
+    parts = []
+    for char in pattern:
+        if char in "*%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
 
+def _ilike(value, pattern: re.Pattern) -> bool:
+    """Python equivalent of PostgREST's ilike filter (NULL never matches)."""
+    return isinstance(value, str) and pattern.fullmatch(value) is not None
+
+
+def _equals(column: str, expected) -> Condition:
+    return (column,), lambda value: value == expected
+
+
+class RegistrationFilters:
+    """Query parameters that narrow the admin registration listing and export."""
+
+    def __init__(
+        self,
+        education_level: Optional[EducationLevel] = Query(None),
+        gender_identity: Optional[str] = Query(None, max_length=100),
+        is_minor: Optional[bool] = Query(None),
+        missing_consent_form: Optional[bool] = Query(None, description="true: no consent form uploaded yet; false: consent form uploaded"),
+        staying_overnight: Optional[bool] = Query(None),
+        dietary_restrictions: Optional[str] = Query(None, max_length=200, description="Case-insensitive substring match"),
+        q: Optional[str] = Query(None, max_length=SEARCH_MAX_LENGTH, description="Search full name, email and hacker code"),
+    ):
+        self.education_level = education_level
+        self.gender_identity = gender_identity
+        self.is_minor = is_minor
+        self.missing_consent_form = missing_consent_form
+        self.staying_overnight = staying_overnight
+        self.dietary_restrictions = dietary_restrictions
+        self.q = q
+        term = _SEARCH_UNSAFE_RE.sub("*", (q or "").strip())
+        self.search_term = term if term.strip("* ") else None
+
+    def apply(self, query):
+        if self.education_level is not None:
+            query = query.eq("education_level", self.education_level.value)
+        if self.gender_identity:
+            query = query.eq("gender_identity", self.gender_identity)
+        if self.is_minor is not None:
+            query = query.eq("is_minor", self.is_minor)
+        if self.missing_consent_form is True:
+            query = query.is_("consent_form_url", "null")
+        elif self.missing_consent_form is False:
+            query = query.not_.is_("consent_form_url", "null")
+        if self.staying_overnight is not None:
+            query = query.eq("staying_overnight", self.staying_overnight)
+        if self.dietary_restrictions:
+            query = query.ilike("dietary_restrictions", f"*{self.dietary_restrictions}*")
+
+        if self.search_term:
+            query = query.or_(",".join(f"{column}.ilike.*{self.search_term}*" for column in SEARCH_COLUMNS))
+        return query
+
+    def conditions(self) -> list[Condition]:
+        """The tests apply() adds to a query, as conditions on snapshot columns."""
+        conditions = []
+        if self.education_level is not None:
+            conditions.append(_equals("education_level", self.education_level.value))
+        if self.gender_identity:
+            conditions.append(_equals("gender_identity", self.gender_identity))
+        if self.is_minor is not None:
+            conditions.append(_equals("is_minor", self.is_minor))
+        if self.missing_consent_form is not None:
+            missing = self.missing_consent_form
+            conditions.append((("consent_form_url",), lambda value: (value is None) == missing))
+        if self.staying_overnight is not None:
+            conditions.append(_equals("staying_overnight", self.staying_overnight))
+        if self.dietary_restrictions:
+            pattern = _ilike_pattern(f"*{self.dietary_restrictions}*")
+            conditions.append((("dietary_restrictions",), lambda value: _ilike(value, pattern)))
+        if self.search_term:
+            pattern = _ilike_pattern(f"*{self.search_term}*")
+            conditions.append((SEARCH_COLUMNS, lambda *values: any(_ilike(value, pattern) for value in values)))
+        return conditions
+
+
+def _query_error(exc: APIError, what: str) -> HTTPException:
+    """Map a PostgREST error from an admin listing to a client or server error."""
+    if exc.code == UNDEFINED_COLUMN:
+        return HTTPException(status_code=400, detail=exc.message or "Unknown field")
+    logger.exception("Failed to load %s: %s", what, exc)
+    return HTTPException(status_code=500, detail=f"Failed to load {what}")
+
+
+async def _guard_listing(awaitable, table: str):
+    """Await a listing query, mapping its failures to HTTP errors."""
     try:
-        admin_client = get_admin_client()
-        result = (
-            admin_client
-            .table("registrations")
-            .select("*")
-            .order("created_at", desc=True)
-            .execute()
+        return await awaitable
+    except HTTPException:
+        raise
+    except APIError as exc:
+        raise _query_error(exc, table) from exc
+    except Exception as exc:
+        logger.exception("Failed to load %s: %s", table, exc)
+        raise HTTPException(status_code=500, detail=f"Failed to load {table}") from exc
+
+
+async def list_page(
+    table: str,
+    fields: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    filters: Optional[RegistrationFilters] = None,
+) -> dict:
+    """One keyset page of a table, newest first, as ``{table: rows, "next_cursor": ...}``."""
+    select = parse_fields(fields)
+
+    snapshot = fresh_snapshot(table)
+    if snapshot is not None:
+        rows, next_cursor = snapshot.page(
+            cursor,
+            limit,
+            columns=None if select == "*" else select.split(","),
+            conditions=filters.conditions() if filters is not None else (),
         )
+        return {table: rows, "next_cursor": next_cursor}
+
+    admin_client = await get_admin_client()
+    query = admin_client.table(table).select(select)
+    if filters is not None:
+        query = filters.apply(query)
+    rows, next_cursor = await _guard_listing(fetch_page(query, cursor, limit), table)
+    return {table: rows, "next_cursor": next_cursor}
+
+
+async def export_table(
+    table: str,
+    export_format: str,
+    fields: Optional[str],
+    filters: Optional[RegistrationFilters] = None,
+) -> StreamingResponse:
+    """
+    Stream a whole table as CSV or NDJSON, one page in memory at a time.
+
+    The first page is fetched before the response starts so a bad request
+    (e.g. an unknown field) still gets a proper error status; a failure
+    after that can only end the stream early.
+    """
+    select = parse_fields(fields)
+    columns = parse_field_names(fields) or None
+    admin_client = await get_admin_client()
+
+    def make_query():
+        query = admin_client.table(table).select(select)
+        return filters.apply(query) if filters is not None else query
+
+    pages = iter_pages(make_query)
+    first_page = await _guard_listing(anext(pages), table)
 
-        if getattr(result, "error", None):
-            error_message = getattr(result.error, "message", None) or "Failed to load registrations"
-            raise HTTPException(status_code=500, detail=error_message)
+    async def all_pages():
+        yield first_page
+        try:
+            async for rows in pages:
+                yield rows
+        except Exception as exc:
+            logger.exception("Export of %s aborted: %s", table, exc)
+            raise
 
-        if result.data is None:
-            return {"registrations": []}
+    encoder = encode_csv if export_format == "csv" else encode_ndjson
+    filename = f"{table}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        encoder(all_pages(), columns),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
 
-        return {"registrations": result.data}
+
+async def list_changes(table: str, fields: Optional[str], since: Optional[str], limit: int) -> dict:
+    """Rows of a table written after a watermark, oldest change first."""
+    select = parse_fields(fields, WATERMARK_COLUMNS)
+    admin_client = await get_admin_client()
+    rows, watermark, has_more = await _guard_listing(
+        fetch_changes(admin_client.table(table).select(select), since, limit), table
+    )
+    return {table: rows, "watermark": watermark, "has_more": has_more}
+
+
+async def get_row(table: str, row_id: str, fields: Optional[str]) -> dict:
+    """A single row by id, or 404."""
+    select = parse_fields(fields)
+
+    snapshot = fresh_snapshot(table)
+    if snapshot is not None:
+        row = snapshot.get(row_id, None if select == "*" else select.split(","))
+        if row is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        return row
+
+    try:
+        admin_client = await get_admin_client()
+        result = await execute(
+            admin_client.table(table).select(select).eq("id", row_id).limit(1)
+        )
+    except HTTPException:
+        raise
+    except APIError as exc:
+        # A malformed id (e.g. not a UUID) can't match any row
+        if exc.code == INVALID_TEXT_REPRESENTATION:
+            raise HTTPException(status_code=404, detail="Not found") from exc
+        raise _query_error(exc, table) from exc
     except Exception as exc:
-        logger.exception("Failed to load registrations: %s", exc)
-        raise HTTPException(status_code=500, detail="Failed to load registrations") from exc
+        logger.exception("Failed to load %s %s: %s", table, row_id, exc)
+        raise HTTPException(status_code=500, detail=f"Failed to load {table}") from exc
 
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Not found")
+    return result.data[0]
 
-@router.get("/admin/preregistrations")
-async def list_preregistrations(
+
+@router.get("/admin/events")
+@rate_limited(ADMIN_LIMIT)
+async def admin_events(
     request: Request,
-    current_user=Depends(get_current_user),
-    _rate_limit: str = Depends(admin_rate_limit)
+    last_event_id: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
 ):
-    ensure_admin_access(current_user)
+    """
+    Live feed of registration writes as Server-Sent Events.
 
-    try:
-        admin_client = get_admin_client()
-        result = (
-            admin_client
-            .table("preregistrations")
-            .select("*")
-            .order("created_at", desc=True)
-            .execute()
+    Events carry ids only; on a ``resync`` event the client should catch
+    up through /admin/registrations/changes. The stream ends when the
+    access token expires, and the client reconnects with a fresh one.
+    """
+    await ensure_admin_access(current_user)
+    if not event_broker.accepting():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many live feed connections",
+            headers={"Retry-After": "30"},
         )
 
-        if getattr(result, "error", None):
-            error_message = getattr(result.error, "message", None) or "Failed to load preregistrations"
-            raise HTTPException(status_code=500, detail=error_message)
+    claims = getattr(current_user, "claims", None) or {}
+    return StreamingResponse(
+        event_broker.stream(last_event_id, claims.get("exp")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
-        if result.data is None:
-            return {"preregistrations": []}
+@router.get("/admin/snapshot-stats")
+@rate_limited(ADMIN_LIMIT)
+async def get_snapshot_stats(
+    request: Request,
+    current_user=Depends(get_current_user)
+):
+    """Size and freshness of the in-process registration snapshot"""
+    await ensure_admin_access(current_user)
+    return snapshot_stats()
 
-        return {"preregistrations": result.data}
+
+@router.get("/admin/stats")
+@rate_limited(ADMIN_LIMIT)
+async def registration_stats(
+    request: Request,
+    current_user=Depends(get_current_user)
+):
+    """
+    Registration counts, read from the trigger-maintained registration_stats
+    table so the cost doesn't grow with the number of applicants.
+    """
+    await ensure_admin_access(current_user)
+
+    try:
+        admin_client = await get_admin_client()
+        result = await execute(admin_client.rpc("registration_stats_summary", {}))
+    except HTTPException:
+        raise
     except Exception as exc:
-        logger.exception("Failed to load preregistrations: %s", exc)
-        raise HTTPException(status_code=500, detail="Failed to load preregistrations") from exc
+        logger.exception("Failed to load registration stats: %s", exc)
+        raise HTTPException(status_code=500, detail="Failed to load registration stats") from exc
 
+    buckets = result.data or {}
+    minors = buckets.get("minor_consent_form", {})
+    return {
+        "total": buckets.get("total", {}).get("all", 0),
+        "education_level": buckets.get("education_level", {}),
+        "gender_identity": buckets.get("gender_identity", {}),
+        "minors": {
+            "total": sum(minors.values()),
+            "with_consent_form": minors.get("uploaded", 0),
+            "without_consent_form": minors.get("missing", 0),
+        },
+        "staying_overnight": buckets.get("staying_overnight", {}).get("true", 0),
+        "dietary_restrictions": buckets.get("dietary_restrictions", {}),
+        "signups_per_hour": dict(sorted(buckets.get("signups_per_hour", {}).items())),
+    }
 
-@router.get("/admin/consent-form-url")
-async def get_consent_form_signed_url(
+
+@router.get("/admin/registrations")
+@rate_limited(ADMIN_LIMIT)
+async def list_registrations(
     request: Request,
-    path: str = Query(..., description="The consent_form_url path from the registration"),
-    current_user=Depends(get_current_user),
-    _rate_limit: str = Depends(admin_rate_limit)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    filters: RegistrationFilters = Depends(),
+    current_user=Depends(get_current_user)
 ):
-    """Generate a signed URL for viewing a consent form"""
-    ensure_admin_access(current_user)
+    """Matching registrations, newest first, one page at a time"""
+    await ensure_admin_access(current_user)
+    return await list_page("registrations", fields, cursor, limit, filters)
+
+
+# Declared before /admin/registrations/{registration_id} so these paths aren't taken as ids
+@router.get("/admin/registrations/changes")
+@rate_limited(ADMIN_LIMIT)
+async def registration_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="watermark from the previous response; omit for a full sync"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user=Depends(get_current_user)
+):
+    """Registrations inserted or updated since a watermark"""
+    await ensure_admin_access(current_user)
+    return await list_changes("registrations", fields, since, limit)
+
+
+@router.get("/admin/registrations/export")
+@rate_limited(ADMIN_LIMIT)
+async def export_registrations(
+    request: Request,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to export"),
+    filters: RegistrationFilters = Depends(),
+    current_user=Depends(get_current_user)
+):
+    """Download every matching registration as CSV or NDJSON"""
+    await ensure_admin_access(current_user)
+    return await export_table("registrations", export_format, fields, filters)
+
+
+@router.get("/admin/registrations/{registration_id}")
+@rate_limited(ADMIN_LIMIT)
+async def get_registration(
+    request: Request,
+    registration_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user=Depends(get_current_user)
+):
+    await ensure_admin_access(current_user)
+    return {"registration": await get_row("registrations", registration_id, fields)}
+
+
+@router.get("/admin/preregistrations")
+@rate_limited(ADMIN_LIMIT)
+async def list_preregistrations(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user=Depends(get_current_user)
+):
+    """Preregistrations, newest first, one page at a time"""
+    await ensure_admin_access(current_user)
+    return await list_page("preregistrations", fields, cursor, limit)
+
+
+@router.get("/admin/preregistrations/changes")
+@rate_limited(ADMIN_LIMIT)
+async def preregistration_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="watermark from the previous response; omit for a full sync"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user=Depends(get_current_user)
+):
+    """Preregistrations inserted or updated since a watermark"""
+    await ensure_admin_access(current_user)
+    return await list_changes("preregistrations", fields, since, limit)
+
+
+@router.get("/admin/preregistrations/{preregistration_id}")
+@rate_limited(ADMIN_LIMIT)
+async def get_preregistration(
+    request: Request,
+    preregistration_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user=Depends(get_current_user)
+):
+    await ensure_admin_access(current_user)
+    return {"preregistration": await get_row("preregistrations", preregistration_id, fields)}
+
 
+def validate_consent_form_path(path: str):
     if not path:
         raise HTTPException(status_code=400, detail="Path is required")
 
@@ -129,8 +577,39 @@ async def get_consent_form_signed_url(
     if ".." in path or path.startswith("/") or "\\" in path:
         raise HTTPException(status_code=400, detail="Invalid path format")
 
-    signed_url = get_guardian_form_url(path)
+
+@router.get("/admin/consent-form-url")
+@rate_limited(ADMIN_LIMIT)
+async def get_consent_form_signed_url(
+    request: Request,
+    path: str = Query(..., description="The consent_form_url path from the registration"),
+    current_user=Depends(get_current_user)
+):
+    """Generate a signed URL for viewing a consent form"""
+    await ensure_admin_access(current_user)
+    validate_consent_form_path(path)
+
+    signed_url = await get_guardian_form_url(path)
     if not signed_url:
         raise HTTPException(status_code=404, detail="Could not generate signed URL for consent form")
 
     return {"signed_url": signed_url}
+
+
+@router.post("/admin/consent-form-urls")
+@rate_limited(ADMIN_LIMIT)
+async def get_consent_form_signed_urls(
+    request: Request,
+    body: ConsentFormUrlsRequest,
+    current_user=Depends(get_current_user)
+):
+    """Generate signed URLs for many consent forms in one call"""
+    await ensure_admin_access(current_user)
+    for path in body.paths:
+        validate_consent_form_path(path)
+
+    signed_urls = await get_guardian_form_urls(body.paths)
+    return {
+        "signed_urls": signed_urls,
+        "missing": [path for path in dict.fromkeys(body.paths) if path not in signed_urls],
+    }
@@ -10,7 +10,7 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel, EmailStr
 from utils.auth import get_current_user
 from utils.auth_helpers import auto_verify_user_email, create_user_without_confirmation
-from utils.rate_limit import strict_rate_limit
+from utils.rate_limit import STRICT_LIMIT, rate_limited
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +30,11 @@ class CreateUserRequest(BaseModel):
 
 
 @router.post("/auto-verify-email")
+@rate_limited(STRICT_LIMIT)
 async def auto_verify_email(
     req: Request,
     request: AutoVerifyRequest,
-    current_user=Depends(get_current_user),
-    _rate_limit: str = Depends(strict_rate_limit)
+    current_user=Depends(get_current_user)
 ):
     """
     Auto-verify the current user's email address.
@@ -43,7 +43,7 @@ async def auto_verify_email(
     bypassing the confirmation email requirement.
 
     Only the user themselves can verify their own email (verified via JWT).
-    Rate limited to 5 requests per minute per IP.
+    Rate limited to 5 requests per minute per user.
     """
     # Ensure user can only verify their own email
     if current_user.id != request.user_id:
@@ -67,10 +67,10 @@ async def auto_verify_email(
 
 
 @router.post("/create-user-verified")
+@rate_limited(STRICT_LIMIT)
 async def create_user_verified(
     req: Request,
-    request: CreateUserRequest,
-    _rate_limit: str = Depends(strict_rate_limit)
+    request: CreateUserRequest
 ):
     """
     Create a new user with email already verified (no confirmation required).
@@ -0,0 +1,51 @@
+"""
+Session bootstrap for the dashboard.
+
+Returns everything the frontend needs after login in one request, so the
+token is validated once and the reads run concurrently instead of as
+three serial client round trips.
+"""
+
+import json
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from utils.auth import get_current_user
+from routers.admin import check_is_admin
+from routers.register import load_registration, registration_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/me/bootstrap")
+async def bootstrap(current_user=Depends(get_current_user)):
+    """Get the current user's registration, consent status and admin flag"""
+
+    try:
+        # Same cache entry as GET /registration, so neither reloads the other's row
+        cached, is_admin = await asyncio.gather(
+            registration_cache.get(
+                (current_user.id, "registration"),
+                lambda: load_registration(current_user.id),
+            ),
+            check_is_admin(current_user),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load session data: {str(e)}")
+
+    registration = json.loads(cached.body) if cached.status_code == 200 else None
+
+    return {
+        "user": {"id": current_user.id, "email": current_user.email},
+        "registration": registration,
+        "registration_status": {
+            "is_registered": registration is not None,
+            "registration_date": registration['created_at'] if registration else None,
+            "consent_form_submitted": bool(registration['consent_form_url']) if registration else False
+        },
+        "is_admin": is_admin,
+    }
@@ -1,14 +1,21 @@
+import os
+import asyncio
 import logging
-import random
-import string
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
-from utils.supabase_client import supabase
+from utils.database import get_client, execute
+from utils.hacker_codes import allocator as hacker_code_allocator
+from utils.idempotency import IdempotentRoute
+from utils.events import broker as event_broker
+from utils.etag_cache import ETagCache
 from utils.auth import get_current_user
-from utils.storage import upload_guardian_form
-from utils.email import send_google_signup_email, send_registration_complete_email
-from utils.rate_limit import standard_rate_limit, rate_limit_by_user, RateLimitConfig
+from utils.storage import upload_guardian_form, validate_guardian_form, guardian_form_path, delete_guardian_form
+from utils.email import GOOGLE_SIGNUP, REGISTRATION_COMPLETE
+from utils.email_queue import EmailQueueFull
+from utils.email_outbox import email_outbox
+from utils.rate_limit import STANDARD_LIMIT, rate_limited, rate_limit_by_user, RateLimitConfig
 from models.registration import RegistrationRequest, RegistrationResponse, EducationLevel
 
 logger = logging.getLogger(__name__)
@@ -19,20 +26,89 @@ class GoogleSignupEmailRequest(BaseModel):
     name: str
 
 
-def generate_hacker_code(length=5):
-    """Generate a unique 5-character alphanumeric code"""
-    chars = string.ascii_uppercase + string.digits
-    while True:
-        code = ''.join(random.choices(chars, k=length))
-        # Check if code already exists
-        existing = supabase.table("registrations").select("id").eq("hacker_code", code).execute()
-        if not existing.data:
-            return code
+# Attempts before giving up when a hacker code collides with an existing one
+HACKER_CODE_ATTEMPTS = 3
 
-router = APIRouter()
+# Per-user cache of GET /registration and GET /registration/status responses.
+# Writes through this API invalidate it; the TTL bounds staleness otherwise.
+# "Not registered" answers are not cached by default: the registration that
+# changes them may be handled by another worker, whose invalidation this
+# worker never sees.
+REGISTRATION_CACHE_TTL_SECONDS = int(os.getenv("REGISTRATION_CACHE_TTL_SECONDS", "30"))
+REGISTRATION_NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv("REGISTRATION_NEGATIVE_CACHE_TTL_SECONDS", "0"))
+
+
+def _not_registered(status_code: int, payload) -> bool:
+    return status_code != 200 or payload.get("is_registered") is False
+
+
+registration_cache = ETagCache(
+    maxsize=10000,
+    ttl=REGISTRATION_CACHE_TTL_SECONDS,
+    negative_ttl=REGISTRATION_NEGATIVE_CACHE_TTL_SECONDS,
+    is_negative=_not_registered,
+)
+REGISTRATION_VIEWS = ("registration", "status")
+
+
+def invalidate_registration_cache(user_id: str):
+    """Drop cached registration responses after the user's row changes."""
+    registration_cache.invalidate(user_id, REGISTRATION_VIEWS)
+
+
+def is_unique_violation(exc: Exception, column: str) -> bool:
+    """True if a write failed on the unique index over the given column."""
+    return isinstance(exc, APIError) and exc.code == "23505" and column in (exc.message or "")
+
+
+async def insert_registration(client, db_data: dict) -> dict:
+    """
+    Insert a registration row and return it, in one round trip.
+
+    The unique index on user_id makes a second registration fail atomically
+    instead of racing a separate existence check.
+    """
+    try:
+        # Codes are unique by construction; the unique index only trips if
+        # HACKER_CODE_KEY changed after codes were issued, so retry with the next one.
+        for attempt in range(HACKER_CODE_ATTEMPTS):
+            db_data["hacker_code"] = await hacker_code_allocator.next_code()
+            try:
+                result = await execute(client.table("registrations").insert(db_data))
+                break
+            except APIError as e:
+                if not is_unique_violation(e, "hacker_code") or attempt == HACKER_CODE_ATTEMPTS - 1:
+                    raise
+                logger.warning("Hacker code %s already taken, retrying", db_data["hacker_code"])
+
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to save registration")
+
+        return result.data[0]
+
+    except HTTPException:
+        raise
+    except APIError as e:
+        if is_unique_violation(e, "user_id"):
+            raise HTTPException(status_code=400, detail="You have already registered")
+        raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+
+
+async def delete_registration(client, registration_id: str):
+    """Remove a just-inserted registration (best effort, used to undo failed uploads)"""
+    try:
+        await execute(client.table("registrations").delete().eq("id", registration_id))
+    except Exception as e:
+        logger.exception("Failed to roll back registration %s: %s", registration_id, e)
+
+# Retried writes carrying an Idempotency-Key replay the first response
+router = APIRouter(route_class=IdempotentRoute)
 
 
 @router.post("/register", response_model=RegistrationResponse)
+@rate_limited(STANDARD_LIMIT)
 async def register(
     request: Request,
     # Form fields - Demographics
@@ -60,9 +136,7 @@ async def register(
     # File upload - optional, can be submitted later from dashboard
     consent_form: Optional[UploadFile] = File(None),
     # Auth
-    current_user=Depends(get_current_user),
-    # Rate limiting
-    _rate_limit: str = Depends(standard_rate_limit)
+    current_user=Depends(get_current_user)
 ):
     """Register a new hacker for the hackathon. Rate limited to 10 requests per minute."""
 
@@ -95,30 +169,19 @@ async def register(
     # Get full name from user metadata or fallback to email prefix
     full_name = current_user.user_metadata.get('full_name') or current_user.user_metadata.get('name') or email.split('@')[0]
 
-    # Check if already registered
-    try:
-        existing = supabase.table("registrations").select("id").eq("user_id", user_id).execute()
-        if existing.data:
-            raise HTTPException(status_code=400, detail="You have already registered")
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    client = await get_client()
 
-    # Handle consent form upload (optional - can be submitted later from dashboard)
+    # The consent form path is chosen up front so the upload can run alongside the insert
     consent_form_url = None
     if consent_form:
-        consent_form_url = await upload_guardian_form(consent_form, user_id)
-
-    # Generate unique hacker code
-    hacker_code = generate_hacker_code()
+        mime_type = await validate_guardian_form(consent_form)
+        consent_form_url = guardian_form_path(user_id, mime_type)
 
     # Prepare data for insertion
     db_data = {
         "user_id": user_id,
         "email": email,
         "full_name": full_name,
-        "hacker_code": hacker_code,
         "education_level": registration_data.education_level.value,
         "education_level_other": registration_data.education_level_other,
         "grade": registration_data.grade,
@@ -139,40 +202,71 @@ async def register(
         "consent_form_url": consent_form_url,
     }
 
-    try:
-        result = supabase.table("registrations").insert(db_data).execute()
+    operations = [insert_registration(client, db_data)]
+    if consent_form:
+        operations.append(upload_guardian_form(consent_form, user_id, consent_form_url))
+    registration, *uploaded = await asyncio.gather(*operations, return_exceptions=True)
+    upload_error = next((result for result in uploaded if isinstance(result, BaseException)), None)
+
+    # Compensate whichever half succeeded if the other one failed
+    if isinstance(registration, BaseException):
+        if uploaded and upload_error is None:
+            await delete_guardian_form(consent_form_url)
+        raise registration
+    if upload_error is not None:
+        await delete_registration(client, registration['id'])
+        raise upload_error
+
+    invalidate_registration_cache(user_id)
+    event_broker.publish("registration.created", {
+        "registration_id": registration['id'],
+        "user_id": user_id,
+        "consent_form_uploaded": consent_form_url is not None,
+    })
+
+    return RegistrationResponse(
+        id=registration['id'],
+        user_id=registration['user_id'],
+        email=registration['email'],
+        full_name=registration['full_name'],
+        education_level=registration['education_level'],
+        created_at=registration['created_at'],
+    )
 
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Failed to save registration")
 
-        registration = result.data[0]
+async def load_registration(user_id: str) -> tuple[int, dict]:
+    """Fetch a user's registration row as (status_code, payload)"""
+    client = await get_client()
+    result = await execute(client.table("registrations").select("*").eq("user_id", user_id))
 
-        return RegistrationResponse(
-            id=registration['id'],
-            user_id=registration['user_id'],
-            email=registration['email'],
-            full_name=registration['full_name'],
-            education_level=registration['education_level'],
-            created_at=registration['created_at'],
-        )
+    if not result.data:
+        return 404, {"detail": "Registration not found"}
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+    return 200, result.data[0]
 
 
-@router.get("/registration")
-async def get_registration(current_user=Depends(get_current_user)):
-    """Get current user's registration data"""
+async def load_registration_status(user_id: str) -> tuple[int, dict]:
+    """Fetch a user's registration status as (status_code, payload)"""
+    client = await get_client()
+    result = await execute(client.table("registrations").select("id, created_at, consent_form_url").eq("user_id", user_id))
 
-    try:
-        result = supabase.table("registrations").select("*").eq("user_id", current_user.id).execute()
+    return 200, {
+        "is_registered": len(result.data) > 0,
+        "registration_date": result.data[0]['created_at'] if result.data else None,
+        "consent_form_submitted": bool(result.data[0]['consent_form_url']) if result.data else False
+    }
 
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Registration not found")
 
-        return result.data[0]
+@router.get("/registration")
+async def get_registration(request: Request, current_user=Depends(get_current_user)):
+    """Get current user's registration data. Supports If-None-Match."""
+
+    try:
+        return await registration_cache.respond(
+            request,
+            (current_user.id, "registration"),
+            lambda: load_registration(current_user.id),
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -201,11 +295,18 @@ async def update_registration(
         raise HTTPException(status_code=400, detail="No valid fields to update")
 
     try:
-        result = supabase.table("registrations").update(filtered_updates).eq("user_id", current_user.id).execute()
+        client = await get_client()
+        result = await execute(client.table("registrations").update(filtered_updates).eq("user_id", current_user.id))
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Registration not found")
 
+        invalidate_registration_cache(current_user.id)
+        event_broker.publish("registration.updated", {
+            "registration_id": result.data[0]['id'],
+            "user_id": current_user.id,
+            "fields": sorted(filtered_updates),
+        })
         return {"message": "Registration updated successfully", "data": result.data[0]}
     except HTTPException:
         raise
@@ -214,27 +315,27 @@ async def update_registration(
 
 
 @router.get("/registration/status")
-async def get_registration_status(current_user=Depends(get_current_user)):
-    """Check if user is registered"""
+async def get_registration_status(request: Request, current_user=Depends(get_current_user)):
+    """Check if user is registered. Supports If-None-Match."""
 
     try:
-        result = supabase.table("registrations").select("id, created_at, consent_form_url").eq("user_id", current_user.id).execute()
-
-        return {
-            "is_registered": len(result.data) > 0,
-            "registration_date": result.data[0]['created_at'] if result.data else None,
-            "consent_form_submitted": bool(result.data[0]['consent_form_url']) if result.data else False
-        }
+        return await registration_cache.respond(
+            request,
+            (current_user.id, "status"),
+            lambda: load_registration_status(current_user.id),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to check registration status: {str(e)}")
 
 
 @router.post("/registration/consent-form")
+@rate_limited(STANDARD_LIMIT)
 async def upload_consent_form(
     request: Request,
     consent_form: UploadFile = File(...),
-    current_user=Depends(get_current_user),
-    _rate_limit: str = Depends(standard_rate_limit)
+    current_user=Depends(get_current_user)
 ):
     """Upload consent form after registration. Rate limited to 10 requests per minute."""
 
@@ -242,7 +343,8 @@ async def upload_consent_form(
 
     # Check if user is registered
     try:
-        result = supabase.table("registrations").select("id, consent_form_url").eq("user_id", user_id).execute()
+        client = await get_client()
+        result = await execute(client.table("registrations").select("id, consent_form_url").eq("user_id", user_id))
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Registration not found. Please complete registration first.")
@@ -251,13 +353,19 @@ async def upload_consent_form(
         consent_form_url = await upload_guardian_form(consent_form, user_id)
 
         # Update the registration with the consent form URL
-        update_result = supabase.table("registrations").update({
+        update_result = await execute(client.table("registrations").update({
             "consent_form_url": consent_form_url
-        }).eq("user_id", user_id).execute()
+        }).eq("user_id", user_id))
 
         if not update_result.data:
             raise HTTPException(status_code=500, detail="Failed to update registration with consent form")
 
+        invalidate_registration_cache(user_id)
+        event_broker.publish("registration.consent_form_uploaded", {
+            "registration_id": result.data[0]['id'],
+            "user_id": user_id,
+        })
+
         return {
             "success": True,
             "message": "Consent form uploaded successfully",
@@ -269,19 +377,38 @@ async def upload_consent_form(
         raise HTTPException(status_code=500, detail=f"Failed to upload consent form: {str(e)}")
 
 
-@router.post("/send-google-signup-email")
+def queue_email(email_type: str, current_user, request: GoogleSignupEmailRequest):
+    """
+    Record and queue an email for background delivery, mapping a full queue to 503.
+
+    Returns False if the same email is already pending for this user.
+    """
+    try:
+        return email_outbox.submit(email_type, current_user.id, request.email, request.name)
+    except EmailQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Email service is busy. Please try again shortly.",
+            headers={"Retry-After": "30"},
+        )
+    except Exception as e:
+        logger.error(f"Failed to queue {email_type} email: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+
+
+@router.post("/send-google-signup-email", status_code=202)
 async def send_google_signup_welcome_email(
     request: GoogleSignupEmailRequest,
     current_user=Depends(get_current_user)
 ):
-    """Send welcome email to users who signed up via Google OAuth. Rate limited to 5 emails per 5 minutes per user."""
+    """Queue a welcome email for users who signed up via Google OAuth. Rate limited to 5 emails per 5 minutes per user."""
 
     # Verify that the email matches the authenticated user
     if request.email != current_user.email:
         raise HTTPException(status_code=403, detail="Email mismatch")
 
     # Rate limit by user ID to prevent email spam
-    rate_limit_by_user(
+    await rate_limit_by_user(
         current_user.id,
         "email_google_signup",
         RateLimitConfig.EMAIL_WINDOW,
@@ -289,27 +416,23 @@ async def send_google_signup_welcome_email(
         "Too many email requests. Please wait before requesting another email."
     )
 
-    try:
-        await send_google_signup_email(request.email, request.name)
-        return {"success": True, "message": "Welcome email sent"}
-    except Exception as e:
-        logger.error(f"Failed to send Google signup email: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+    queue_email(GOOGLE_SIGNUP, current_user, request)
+    return {"success": True, "message": "Welcome email queued"}
 
 
-@router.post("/send-registration-complete-email")
+@router.post("/send-registration-complete-email", status_code=202)
 async def send_registration_complete_welcome_email(
     request: GoogleSignupEmailRequest,
     current_user=Depends(get_current_user)
 ):
-    """Send registration complete email after user finishes full registration. Rate limited to 5 emails per 5 minutes per user."""
+    """Queue the registration complete email after user finishes full registration. Rate limited to 5 emails per 5 minutes per user."""
 
     # Verify that the email matches the authenticated user
     if request.email != current_user.email:
         raise HTTPException(status_code=403, detail="Email mismatch")
 
     # Rate limit by user ID to prevent email spam
-    rate_limit_by_user(
+    await rate_limit_by_user(
         current_user.id,
         "email_registration_complete",
         RateLimitConfig.EMAIL_WINDOW,
@@ -317,9 +440,5 @@ async def send_registration_complete_welcome_email(
         "Too many email requests. Please wait before requesting another email."
     )
 
-    try:
-        await send_registration_complete_email(request.email, request.name)
-        return {"success": True, "message": "Registration complete email sent"}
-    except Exception as e:
-        logger.error(f"Failed to send registration complete email: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+    queue_email(REGISTRATION_COMPLETE, current_user, request)
+    return {"success": True, "message": "Registration complete email queued"}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from utils.supabase_client import supabase
+from utils.database import get_client, execute
 import os
 
 router = APIRouter()
@@ -17,7 +17,8 @@ async def database_health_check():
     """Check database connection health"""
     try:
         # Try a simple query to test the connection
-        result = supabase.table("preregistrations").select("email").limit(1).execute()
+        client = await get_client()
+        result = await execute(client.table("preregistrations").select("email").limit(1))
         return {
             "status": "ok",
             "database": "connected",
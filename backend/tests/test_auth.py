@@ -0,0 +1,50 @@
+import json
+import time
+import asyncio
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from utils import auth
+
+
+def make_es256_key(kid: str):
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    public_jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update(kid=kid, alg="ES256", use="sig")
+    return private_key, public_jwk
+
+
+def serve_jwks(monkeypatch, jwks: dict):
+    real_client = httpx.AsyncClient
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=jwks))
+    monkeypatch.setattr(auth.httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+
+
+def test_es256_token_verifies_locally_after_refresh(monkeypatch):
+    private_key, public_jwk = make_es256_key("key-1")
+    serve_jwks(monkeypatch, {"keys": [public_jwk]})
+    cache = auth.JWKSCache("https://example.test/jwks.json")
+    monkeypatch.setattr(auth, "_jwks", cache)
+
+    asyncio.run(cache.refresh())
+
+    token = jwt.encode(
+        {"sub": "user-1", "aud": auth.JWT_AUDIENCE, "iss": auth.JWT_ISSUER, "exp": int(time.time()) + 60},
+        private_key,
+        algorithm="ES256",
+        headers={"kid": "key-1"},
+    )
+    assert auth.verify_token_locally(token)["sub"] == "user-1"
+
+
+def test_unloadable_keys_are_logged_as_errors_and_keep_the_old_set(monkeypatch, caplog):
+    serve_jwks(monkeypatch, {"keys": [{"kty": "EC", "kid": "bad", "crv": "P-256", "x": "AA", "y": "AA"}]})
+    cache = auth.JWKSCache("https://example.test/jwks.json")
+    cache._keys = {"old": object()}
+
+    asyncio.run(cache.refresh())
+
+    assert "old" in cache._keys
+    assert any(record.levelname == "ERROR" for record in caplog.records)
@@ -0,0 +1,49 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.body_size_middleware import TOO_LARGE_DETAIL, BodySizeLimitMiddleware
+
+MAX_BYTES = 100
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_BYTES)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"received": len(await request.body())}
+
+    return TestClient(app)
+
+
+def chunks(count: int, size: int = 30):
+    for _ in range(count):
+        yield b"x" * size
+
+
+def test_body_within_the_limit_passes(client):
+    response = client.post("/echo", content=b"x" * MAX_BYTES)
+    assert response.status_code == 200
+    assert response.json() == {"received": MAX_BYTES}
+
+
+def test_declared_length_over_the_limit_is_rejected(client):
+    response = client.post("/echo", content=b"x" * (MAX_BYTES + 1))
+    assert response.status_code == 413
+    assert response.json() == {"detail": TOO_LARGE_DETAIL}
+
+
+def test_chunked_body_within_the_limit_passes(client):
+    response = client.post("/echo", content=chunks(3))
+    assert response.status_code == 200
+    assert response.json() == {"received": 90}
+
+
+def test_chunked_body_growing_past_the_limit_is_rejected(client):
+    # No Content-Length, so only the running total can catch it
+    response = client.post("/echo", content=chunks(5))
+    assert response.status_code == 413
+    assert response.json() == {"detail": TOO_LARGE_DETAIL}
@@ -0,0 +1,126 @@
+import asyncio
+
+from utils import cache
+from utils.cache import TTLCache, SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, maxsize=3, ttl=10):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return TTLCache(maxsize=maxsize, ttl=ttl), clock
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    ttl_cache, clock = make_cache(monkeypatch)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2, ttl=30)
+
+    clock.now += 10
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("b") == 2
+    assert len(ttl_cache) == 1
+
+
+def test_ttl_cache_evicts_least_recently_used(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    for key in "abc":
+        ttl_cache.set(key, key)
+    ttl_cache.get("a")
+    ttl_cache.set("d", "d")
+
+    assert "b" not in ttl_cache
+    assert all(key in ttl_cache for key in "acd")
+    assert ttl_cache.evictions == 1
+
+
+def test_ttl_cache_non_positive_ttl_drops_entry(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("a", 2, ttl=0)
+    assert ttl_cache.get("a") is None
+
+
+def test_ttl_cache_stats_count_hits_and_misses(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    ttl_cache.set("a", 1)
+    ttl_cache.get("a")
+    ttl_cache.get("missing")
+
+    stats = ttl_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_single_flight_collapses_concurrent_calls():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(flight.run("key", loader) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["value"] * 5
+    assert flight.collapsed == 4
+    assert len(flight) == 0
+
+
+def test_single_flight_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "value"
+
+        leader = asyncio.create_task(flight.run("key", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.run("key", loader))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return leader, await waiter
+
+    leader, result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert result == "value"
+
+
+def test_single_flight_shares_exceptions_and_forgets_the_key():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flight.run("key", failing), flight.run("key", failing), return_exceptions=True
+        )
+        assert len(flight) == 0
+
+        async def loader():
+            return "again"
+
+        return results, await flight.run("key", loader)
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "again"
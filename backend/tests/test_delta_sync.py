@@ -0,0 +1,60 @@
+import asyncio
+import types
+
+import pytest
+from fastapi import HTTPException
+
+from utils import delta_sync
+from utils.pagination import encode_token
+
+
+class RecordingQuery:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args):
+            self.calls.append((name, *args))
+            return self
+        return record
+
+
+@pytest.fixture
+def run(monkeypatch):
+    async def execute(query):
+        return types.SimpleNamespace(data=query.rows)
+
+    monkeypatch.setattr(delta_sync, "execute", execute)
+    return lambda query, watermark, limit=10: asyncio.run(delta_sync.fetch_changes(query, watermark, limit))
+
+
+@pytest.mark.parametrize("watermark", [
+    encode_token("2026-01-02T03:04:05"),
+    encode_token("2026-01-02T03:04:05", "abc"),
+    encode_token("yesterday"),
+])
+def test_watermarks_without_utc_offset_are_rejected(run, watermark):
+    with pytest.raises(HTTPException) as exc_info:
+        run(RecordingQuery([{"updated_at": "2026-01-02T03:04:06+00:00", "id": "a"}]), watermark)
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Invalid watermark"
+
+
+def test_caught_up_watermark_rereads_the_lookback_window(run):
+    query = RecordingQuery([{"updated_at": "2026-01-02T03:04:06+00:00", "id": "a"}])
+    rows, watermark, has_more = run(query, encode_token("2026-01-02T03:04:05+00:00"))
+    assert ("gte", "updated_at", "2026-01-02T03:03:35+00:00") in query.calls
+    assert not has_more
+    assert watermark == encode_token("2026-01-02T03:04:06+00:00")
+
+
+def test_full_batch_returns_a_cursor(run):
+    query = RecordingQuery([
+        {"updated_at": "2026-01-02T03:04:05+00:00", "id": "a"},
+        {"updated_at": "2026-01-02T03:04:06+00:00", "id": "b"},
+    ])
+    rows, watermark, has_more = run(query, None, limit=1)
+    assert has_more
+    assert rows == query.rows[:1]
+    assert watermark == encode_token("2026-01-02T03:04:05+00:00", "a")
@@ -0,0 +1,73 @@
+import pytest
+
+from utils.email_outbox import EmailOutbox
+from utils.email_queue import EmailQueueFull
+
+
+class FakeQueue:
+    """Stands in for EmailQueue; enqueue raises whatever is in ``errors``."""
+
+    def __init__(self):
+        self.on_finished = None
+        self.enqueued = []
+        self.errors = []
+
+    def enqueue(self, email_type, user_id, to_email, name):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.enqueued.append((email_type, user_id))
+
+
+@pytest.fixture
+def orphaned(tmp_path):
+    """An outbox whose only row was left behind by a worker that exited."""
+    path = str(tmp_path / "outbox.db")
+    gone = EmailOutbox(path, FakeQueue())
+    gone.open()
+    assert gone.submit("google_signup", "user-1", "a@example.com", "A")
+    gone._db.execute("DELETE FROM email_outbox_owners WHERE owner = ?", (gone.owner,))
+    gone._db.close()
+
+    queue = FakeQueue()
+    outbox = EmailOutbox(path, queue)
+    outbox.open()
+    yield outbox, queue
+    outbox._db.close()
+
+
+def pending(outbox):
+    return outbox._db.execute("SELECT user_id, email_type, owner FROM email_outbox").fetchall()
+
+
+def test_replay_queues_orphaned_rows(orphaned):
+    outbox, queue = orphaned
+    assert outbox.replay() == 1
+    assert queue.enqueued == [("google_signup", "user-1")]
+    assert pending(outbox) == [("user-1", "google_signup", outbox.owner)]
+
+
+def test_transient_replay_failure_is_retried_on_the_next_sweep(orphaned):
+    outbox, queue = orphaned
+    queue.errors.append(EmailQueueFull())
+
+    assert outbox.replay() == 0
+    assert pending(outbox)[0][2] == ""
+
+    assert outbox.replay() == 1
+    assert queue.enqueued == [("google_signup", "user-1")]
+
+
+def test_permanent_replay_failure_drops_the_row(orphaned):
+    outbox, queue = orphaned
+    queue.errors.append(ValueError("MAILTRAP_TEMPLATE_UUID required"))
+
+    assert outbox.replay() == 0
+    assert pending(outbox) == []
+    # Nothing blocks asking again once the template is configured
+    assert outbox.submit("google_signup", "user-1", "a@example.com", "A")
+
+
+def test_submit_deduplicates_pending_messages(orphaned):
+    outbox, queue = orphaned
+    assert not outbox.submit("google_signup", "user-1", "a@example.com", "A")
+    assert outbox.deduplicated == 1
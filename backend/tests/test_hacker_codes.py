@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from utils.hacker_codes import ALPHABET, CODE_LENGTH, CODE_SPACE, FeistelPermutation, HackerCodeAllocator, encode_code
+
+
+@pytest.mark.parametrize("domain", [1, 2, 1000, 36 ** 3])
+def test_permutation_is_a_bijection_on_its_domain(domain):
+    # 1000 and 36**3 are not powers of 4, so some values cycle-walk
+    permutation = FeistelPermutation(b"test-key", domain)
+    outputs = [permutation.permute(value) for value in range(domain)]
+    assert sorted(outputs) == list(range(domain))
+
+
+def test_permutation_depends_on_the_key():
+    first = FeistelPermutation(b"key-1", 1000)
+    second = FeistelPermutation(b"key-2", 1000)
+    assert [first.permute(v) for v in range(20)] != [second.permute(v) for v in range(20)]
+
+
+def test_permutation_rejects_values_outside_the_domain():
+    permutation = FeistelPermutation(b"test-key", 1000)
+    with pytest.raises(ValueError):
+        permutation.permute(1000)
+
+
+def test_encode_code_is_fixed_width():
+    assert encode_code(0) == "A" * CODE_LENGTH
+    assert encode_code(CODE_SPACE - 1) == "9" * CODE_LENGTH
+
+
+def test_leased_blocks_never_repeat_codes():
+    counter = 0
+    calls = []
+
+    async def reserve_block(block_size: int) -> int:
+        # Like reserve_hacker_code_block: bump a shared counter, return the old value
+        nonlocal counter
+        calls.append(block_size)
+        await asyncio.sleep(0)
+        start, counter = counter, counter + block_size
+        return start
+
+    async def scenario():
+        permutation = FeistelPermutation(b"test-key", CODE_SPACE)
+        # Two workers leasing from the same counter, several blocks each
+        workers = [HackerCodeAllocator(permutation, reserve_block, block_size=7) for _ in range(2)]
+        codes = await asyncio.gather(*(workers[i % 2].next_code() for i in range(100)))
+        return workers, codes
+
+    workers, codes = asyncio.run(scenario())
+    assert len(set(codes)) == len(codes) == 100
+    assert all(len(code) == CODE_LENGTH and set(code) <= set(ALPHABET) for code in codes)
+    # 50 codes per worker is 8 blocks of 7 each, one lease per block
+    assert [worker.blocks_reserved for worker in workers] == [8, 8]
+    assert len(calls) == 16
@@ -0,0 +1,83 @@
+import types
+
+import pytest
+from fastapi import APIRouter, FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from utils import idempotency
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_user(request):
+        auth = request.headers.get("Authorization")
+        return types.SimpleNamespace(id=auth.split()[1]) if auth else None
+
+    monkeypatch.setattr(idempotency, "get_optional_user", fake_user)
+    idempotency._responses.clear()
+
+    router = APIRouter(route_class=idempotency.IdempotentRoute)
+    calls = []
+
+    @router.post("/items")
+    async def create_item(body: dict):
+        calls.append(body)
+        return {"n": len(calls), "body": body}
+
+    @router.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        data = await file.read()
+        calls.append(len(data))
+        return {"size": len(data)}
+
+    app = FastAPI()
+    app.include_router(router)
+    test_client = TestClient(app)
+    test_client.calls = calls
+    return test_client
+
+
+HEADERS = {"Authorization": "Bearer user-1", "Idempotency-Key": "key-1"}
+
+
+def test_retry_replays_the_stored_response(client):
+    first = client.post("/items", json={"a": 1}, headers=HEADERS)
+    retry = client.post("/items", json={"a": 1}, headers=HEADERS)
+
+    assert retry.json() == first.json() == {"n": 1, "body": {"a": 1}}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(client.calls) == 1
+
+
+def test_same_key_with_a_different_body_is_rejected(client):
+    client.post("/items", json={"a": 1}, headers=HEADERS)
+    response = client.post("/items", json={"a": 2}, headers=HEADERS)
+
+    assert response.status_code == 422
+    assert len(client.calls) == 1
+
+
+def test_keys_are_scoped_per_user(client):
+    client.post("/items", json={"a": 1}, headers=HEADERS)
+    other = client.post("/items", json={"a": 1}, headers={**HEADERS, "Authorization": "Bearer user-2"})
+
+    assert other.json()["n"] == 2
+
+
+def test_upload_retry_matches_despite_a_new_boundary(client):
+    # Larger than Starlette's in-memory spool, so the file is hashed from disk
+    payload = bytes(range(256)) * 8192
+
+    first = client.post("/upload", files={"file": ("form.pdf", payload)}, headers=HEADERS)
+    retry = client.post("/upload", files={"file": ("form.pdf", payload)}, headers=HEADERS)
+
+    assert first.json() == {"size": len(payload)}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert client.calls == [len(payload)]
+
+
+def test_upload_with_different_file_contents_is_rejected(client):
+    client.post("/upload", files={"file": ("form.pdf", b"%PDF-1")}, headers=HEADERS)
+    response = client.post("/upload", files={"file": ("form.pdf", b"%PDF-2")}, headers=HEADERS)
+
+    assert response.status_code == 422
@@ -0,0 +1,51 @@
+import pytest
+from fastapi import HTTPException
+
+from utils.pagination import after_cursor, decode_cursor, decode_token, encode_cursor, encode_token
+
+
+class RecordingQuery:
+    def __init__(self):
+        self.filters = []
+
+    def or_(self, filters):
+        self.filters.append(filters)
+        return self
+
+
+def test_token_round_trip():
+    token = encode_token("2026-01-02T03:04:05+00:00", "abc-123")
+    assert "=" not in token
+    assert decode_token(token) == ["2026-01-02T03:04:05+00:00", "abc-123"]
+
+
+@pytest.mark.parametrize("token", ["", "not base64!", encode_token("a,b"), encode_token("x)")])
+def test_decode_token_rejects_malformed_tokens(token):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_token(token, "watermark")
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Invalid watermark"
+
+
+def test_cursor_round_trip():
+    row = {"created_at": "2026-01-02T03:04:05+00:00", "id": "7f1c"}
+    assert decode_cursor(encode_cursor(row)) == ("2026-01-02T03:04:05+00:00", "7f1c")
+
+
+def test_decode_cursor_requires_two_values():
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(encode_token("2026-01-02"))
+    assert exc_info.value.status_code == 400
+
+
+def test_after_cursor_without_cursor_leaves_query_alone():
+    query = RecordingQuery()
+    assert after_cursor(query, None) is query
+    assert query.filters == []
+
+
+def test_after_cursor_filters_rows_sorting_after_the_cursor():
+    query = after_cursor(RecordingQuery(), encode_token("2026-01-02T03:04:05", "7f1c"))
+    assert query.filters == [
+        "created_at.lt.2026-01-02T03:04:05,and(created_at.eq.2026-01-02T03:04:05,id.lt.7f1c)"
+    ]
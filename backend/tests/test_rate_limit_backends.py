@@ -0,0 +1,150 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+from benchmarks.resp_stand_in import Store, handler
+from utils import rate_limit
+from utils.rate_limit_backends import (
+    SLIDING_WINDOW_SHA,
+    MmapBackend,
+    RedisBackend,
+    SlidingWindowCounter,
+    sliding_window_decision,
+)
+
+
+def test_allows_under_the_limit_and_counts_the_request():
+    decision, current = sliding_window_decision(0, 3, 10.0, 60, 5)
+    assert decision.allowed
+    assert current == 4
+    assert decision.remaining == 1
+    assert decision.reset_after == 50.0
+
+
+def test_denies_at_the_limit_without_counting():
+    decision, current = sliding_window_decision(0, 5, 10.0, 60, 5)
+    assert not decision.allowed
+    assert current == 5
+    assert decision.remaining == 0
+    # Nothing from the previous window, so it waits for the next one
+    assert decision.reset_after == pytest.approx(50.0)
+    assert decision.retry_after == 50
+
+
+def test_previous_window_is_weighted_by_its_overlap():
+    # A quarter into the window, 3/4 of the previous 4 requests still count
+    denied, _ = sliding_window_decision(4, 2, 15.0, 60, 5)
+    assert not denied.allowed
+    # Halfway through, only 2 of them do
+    allowed, _ = sliding_window_decision(4, 2, 30.0, 60, 5)
+    assert allowed.allowed
+    assert allowed.remaining == 0
+
+
+def test_denied_wait_is_when_the_estimate_drops_below_the_limit():
+    decision, _ = sliding_window_decision(10, 0, 0.0, 60, 5)
+    assert not decision.allowed
+    # 10 * (1 - t/60) < 5 once t passes 30s
+    assert decision.reset_after == pytest.approx(30.0)
+
+
+def test_sliding_window_counter_rolls_over_windows():
+    counter = SlidingWindowCounter(window_seconds=60, max_requests=2)
+    assert counter.hit("ip", now=0).allowed
+    assert counter.hit("ip", now=1).allowed
+    assert not counter.hit("ip", now=2).allowed
+    # Next window, still weighed down by the previous one (2 * 58/60 + 1 >= 2 at t=62)
+    assert counter.hit("ip", now=61).allowed
+    assert not counter.hit("ip", now=62).allowed
+    # Two windows on, the old counts no longer matter
+    assert counter.hit("ip", now=200).remaining == 1
+
+
+async def start_stand_in(store: Store):
+    """The RESP stand-in on a free port; returns the server and the open client writers."""
+    writers = []
+    handle = handler(store)
+
+    async def tracked(reader, writer):
+        writers.append(writer)
+        await handle(reader, writer)
+
+    server = await asyncio.start_server(tracked, "127.0.0.1", 0)
+    return server, writers
+
+
+def test_redis_backend_against_stand_in():
+    store = Store()
+
+    async def scenario():
+        server, _ = await start_stand_in(store)
+        port = server.sockets[0].getsockname()[1]
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=1.0)
+        try:
+            decisions = [await backend.hit("strict", "ip:1", 60, 2) for _ in range(3)]
+            # The script cache is gone after a restart; the backend resends it
+            store.loaded.clear()
+            decisions.append(await backend.hit("strict", "ip:1", 60, 2))
+            decisions.append(await backend.hit("strict", "ip:2", 60, 2))
+        finally:
+            await backend.close()
+            server.close()
+        return decisions
+
+    decisions = asyncio.run(scenario())
+    assert [decision.allowed for decision in decisions] == [True, True, False, False, True]
+    assert decisions[0].remaining == 1
+    assert decisions[2].retry_after > 0
+    assert SLIDING_WINDOW_SHA.encode() in store.loaded
+    # Both windows of a key share a hash tag, i.e. one Redis Cluster slot
+    assert all(key.startswith((b"rl:{strict:ip:1}:", b"rl:{strict:ip:2}:")) for key in store.values)
+
+
+def test_redis_backend_failure_lets_requests_through(monkeypatch):
+    async def scenario():
+        server, writers = await start_stand_in(Store())
+        port = server.sockets[0].getsockname()[1]
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=1.0)
+        monkeypatch.setattr(rate_limit, "_backend", backend)
+        try:
+            before = [await rate_limit.hit_rate_limit("ip:1", "strict", 60, 1) for _ in range(2)]
+            server.close()
+            for writer in writers:
+                writer.close()
+            await server.wait_closed()
+            after = await rate_limit.hit_rate_limit("ip:1", "strict", 60, 1)
+        finally:
+            await backend.close()
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert [decision.allowed for decision in before] == [True, False]
+    assert after.allowed
+    assert after.remaining == 1
+
+
+# Mid-window, so both processes count in the same window
+MMAP_NOW = 1_000_000 * 60 + 30.0
+
+
+def hit_mmap(path: str, hits: int, start, results):
+    backend = MmapBackend(path, slots=64)
+    start.wait()
+    allowed = sum(backend.hit_now("admin", "user:1", 60, 30, now=MMAP_NOW).allowed for _ in range(hits))
+    results.put(allowed)
+
+
+def test_mmap_backend_shares_one_limit_across_processes(tmp_path):
+    path = str(tmp_path / "rate-limit")
+    context = multiprocessing.get_context("fork")
+    start, results = context.Barrier(2), context.Queue()
+    workers = [context.Process(target=hit_mmap, args=(path, 50, start, results)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    allowed = [results.get(timeout=10) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+
+    # 100 requests between them, but only one budget of 30
+    assert sum(allowed) == 30
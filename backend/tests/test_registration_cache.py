@@ -0,0 +1,77 @@
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import register
+from utils.auth import get_current_user
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The registration router with a fake user and a fake status loader."""
+    rows = {}
+    loads = []
+
+    async def load_registration_status(user_id):
+        loads.append(user_id)
+        row = rows.get(user_id)
+        return 200, {
+            "is_registered": row is not None,
+            "registration_date": row and row["created_at"],
+            "consent_form_submitted": False,
+        }
+
+    monkeypatch.setattr(register, "load_registration_status", load_registration_status)
+    monkeypatch.setattr(register, "registration_cache", register.ETagCache(
+        maxsize=100,
+        ttl=30,
+        negative_ttl=register.REGISTRATION_NEGATIVE_CACHE_TTL_SECONDS,
+        is_negative=register._not_registered,
+    ))
+
+    app = FastAPI()
+    app.include_router(register.router)
+    app.dependency_overrides[get_current_user] = lambda: types.SimpleNamespace(id="user-1")
+    test_client = TestClient(app)
+    test_client.rows, test_client.loads = rows, loads
+    return test_client
+
+
+def test_status_is_cached_and_revalidated_with_etag(client):
+    client.rows["user-1"] = {"created_at": "2026-01-01T00:00:00+00:00"}
+
+    first = client.get("/registration/status")
+    assert first.status_code == 200
+    assert first.json()["is_registered"] is True
+    etag = first.headers["etag"]
+
+    unchanged = client.get("/registration/status", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert unchanged.content == b""
+
+    # Weak validators match too; a stale one gets the full body
+    assert client.get("/registration/status", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    stale = client.get("/registration/status", headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.json() == first.json()
+
+    assert client.loads == ["user-1"]
+
+
+def test_not_registered_is_not_cached(client):
+    assert client.get("/registration/status").json()["is_registered"] is False
+
+    # Registered through another worker, whose invalidation never reaches this one
+    client.rows["user-1"] = {"created_at": "2026-01-01T00:00:00+00:00"}
+    assert client.get("/registration/status").json()["is_registered"] is True
+    assert client.loads == ["user-1", "user-1"]
+
+
+def test_missing_registration_is_negative():
+    assert register._not_registered(404, {"detail": "Registration not found"})
+    assert register._not_registered(200, {"is_registered": False})
+    assert not register._not_registered(200, {"is_registered": True})
+    assert not register._not_registered(200, {"id": "abc", "user_id": "user-1"})
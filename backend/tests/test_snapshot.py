@@ -0,0 +1,81 @@
+import pytest
+from fastapi import HTTPException
+
+from models.registration import EducationLevel
+from routers.admin import RegistrationFilters
+from utils.pagination import encode_cursor
+from utils.snapshot import TableSnapshot
+
+
+def row(n: int, **values) -> dict:
+    return {
+        "id": f"id-{n:02d}",
+        "created_at": f"2026-01-01T00:00:{n:02d}+00:00",
+        "full_name": f"Person {n}",
+        "email": f"person{n}@example.com",
+        "hacker_code": None,
+        "is_minor": False,
+        "consent_form_url": None,
+        **values,
+    }
+
+
+def snapshot_of(rows: list) -> TableSnapshot:
+    snapshot = TableSnapshot("registrations")
+    snapshot._apply(rows)
+    snapshot._order = sorted(range(len(snapshot._keys)), key=snapshot._keys.__getitem__)
+    return snapshot
+
+
+def filters(**values) -> RegistrationFilters:
+    params = dict.fromkeys(
+        ("education_level", "gender_identity", "is_minor", "missing_consent_form",
+         "staying_overnight", "dietary_restrictions", "q"),
+    )
+    return RegistrationFilters(**{**params, **values})
+
+
+def test_empty_table_accepts_known_fields():
+    snapshot = TableSnapshot("registrations")
+    assert snapshot.page(None, 10, columns=["id", "full_name", "why_interested"]) == ([], None)
+    assert snapshot.get("missing", ["email"]) is None
+
+
+def test_unknown_field_is_rejected():
+    snapshot = snapshot_of([row(1)])
+    with pytest.raises(HTTPException) as exc_info:
+        snapshot.page(None, 10, columns=["id", "password"])
+    assert exc_info.value.status_code == 400
+
+
+def test_conditions_filter_rows_without_building_the_others(monkeypatch):
+    snapshot = snapshot_of([
+        row(1, is_minor=True, consent_form_url="a/form.pdf"),
+        row(2, is_minor=True),
+        row(3, full_name="Ada Lovelace"),
+        row(4, is_minor=True, education_level=EducationLevel.HIGH_SCHOOL.value),
+        row(5, is_minor=True),
+    ])
+    built = []
+    original = snapshot._row
+    monkeypatch.setattr(snapshot, "_row", lambda position, columns: built.append(position) or original(position, columns))
+
+    minors_missing_forms = filters(is_minor=True, missing_consent_form=True).conditions()
+    rows, next_cursor = snapshot.page(None, 2, columns=["id"], conditions=minors_missing_forms)
+    assert rows == [{"id": "id-05"}, {"id": "id-04"}]
+    # Rows 1 and 3 never match, so no dict is built for them
+    assert 0 not in built and 2 not in built
+    assert next_cursor == encode_cursor(row(4))
+
+    rows, next_cursor = snapshot.page(next_cursor, 2, columns=["id"], conditions=minors_missing_forms)
+    assert rows == [{"id": "id-02"}]
+    assert next_cursor is None
+
+
+def test_search_matches_any_search_column():
+    snapshot = snapshot_of([row(1), row(2, full_name="Ada Lovelace"), row(3, hacker_code="ADA42")])
+    rows, _ = snapshot.page(None, 10, columns=["id"], conditions=filters(q="ada").conditions())
+    assert rows == [{"id": "id-03"}, {"id": "id-02"}]
+
+    level = filters(education_level=EducationLevel.HIGH_SCHOOL).conditions()
+    assert snapshot.page(None, 10, columns=["id"], conditions=level) == ([], None)
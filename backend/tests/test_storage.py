@@ -0,0 +1,74 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from utils import storage
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+
+
+def upload(content: bytes, filename: str, content_type: str) -> UploadFile:
+    return UploadFile(
+        io.BytesIO(content),
+        size=len(content),
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+class FakeSession:
+    def __init__(self):
+        self.requests = []
+
+    async def post(self, url, content, headers):
+        body = b"".join([chunk async for chunk in content])
+        self.requests.append((url, headers, body))
+        return FakeResponse()
+
+
+class FakeResponse:
+    is_error = False
+
+
+class FakeClient:
+    def __init__(self):
+        self.storage = type("Storage", (), {"session": FakeSession()})()
+
+
+@pytest.mark.parametrize("content", [b"MZ\x90\x00 not a pdf", b"", b"%PD"])
+def test_mislabeled_file_is_rejected(content):
+    file = upload(content, "form.pdf", "application/pdf")
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(storage.validate_guardian_form(file))
+    assert exc_info.value.status_code == 400
+
+
+def test_oversized_file_is_rejected():
+    file = upload(b"%PDF-" + b"0" * storage.MAX_FILE_SIZE, "form.pdf", "application/pdf")
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(storage.validate_guardian_form(file))
+    assert exc_info.value.status_code == 400
+
+
+def test_stored_type_and_extension_follow_the_file_contents(monkeypatch):
+    client = FakeClient()
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(storage, "get_client", get_client)
+    # A PNG that claims to be a PDF
+    file = upload(PNG, "form.pdf", "application/pdf")
+
+    path = asyncio.run(storage.upload_guardian_form(file, "user-1"))
+
+    assert path.startswith("user-1/") and path.endswith(".png")
+    ((url, headers, body),) = client.storage.session.requests
+    assert url == f"/object/guardian-forms/{path}"
+    assert headers["content-type"] == "image/png"
+    assert headers["content-length"] == str(len(PNG))
+    # Sniffing rewinds, so the whole file is streamed
+    assert body == PNG
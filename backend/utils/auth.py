@@ -1,22 +1,195 @@
+"""
+Bearer token authentication for API routes.
+
+Supabase access tokens are JWTs. When the project's JWT secret (HS256) or
+its published JWKS (RS256/ES256) is available, tokens are verified locally
+and the user is built from the claims, which avoids a GoTrue round trip on
+every request. Tokens that cannot be verified locally fall back to
+GoTrue's ``/user`` endpoint.
+
+Resolved users are cached per worker, keyed by the SHA-256 of the token,
+for at most ``AUTH_CACHE_TTL_SECONDS`` and never past the token's ``exp``.
+Invalid tokens are negatively cached briefly, and concurrent misses for the
+same token share one upstream call.
+
+Note that local verification cannot see sessions revoked before the token
+expires; keep ``jwt_expiry`` short (see supabase/config.toml).
+"""
+
+import os
+import time
+import hashlib
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+import jwt
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from utils.supabase_client import supabase
+from utils.cache import TTLCache, SingleFlight
+from utils.database import get_client, with_timeout
+from utils.supabase_client import SUPABASE_URL, SUPABASE_KEY
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Local verification settings (set AUTH_LOCAL_JWT=false to always ask GoTrue)
+LOCAL_JWT_VERIFICATION = os.getenv("AUTH_LOCAL_JWT", "true").strip().lower() != "false"
+JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWT_ISSUER = os.getenv("SUPABASE_JWT_ISSUER") or f"{SUPABASE_URL.rstrip('/')}/auth/v1"
+JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+JWKS_CACHE_SECONDS = int(os.getenv("SUPABASE_JWKS_CACHE_SECONDS", "600"))
+JWT_LEEWAY_SECONDS = int(os.getenv("SUPABASE_JWT_LEEWAY_SECONDS", "10"))
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify JWT token and return user data"""
-    token = credentials.credentials
+# Authenticated user cache settings
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_NEGATIVE_CACHE_SECONDS = int(os.getenv("AUTH_NEGATIVE_CACHE_SECONDS", "30"))
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+
+
+class TokenUser:
+    """
+    User built from verified access token claims.
+
+    Exposes the same attributes routes read from gotrue's ``User``
+    (``id``, ``email``, ``user_metadata``, ``app_metadata``).
+    """
+
+    __slots__ = ("id", "email", "role", "aud", "user_metadata", "app_metadata", "claims")
+
+    def __init__(self, claims: dict):
+        self.id = claims["sub"]
+        self.email = claims.get("email") or ""
+        self.role = claims.get("role")
+        self.aud = claims.get("aud")
+        self.user_metadata = claims.get("user_metadata") or {}
+        self.app_metadata = claims.get("app_metadata") or {}
+        self.claims = claims
+
+
+class JWKSCache:
+    """
+    Cached signing keys from the Supabase JWKS endpoint.
+
+    Requests only ever read the cached key set. Keys are refetched in a
+    background task every ``ttl`` seconds (stale keys keep serving
+    meanwhile); an unknown ``kid`` triggers an early refetch at most once
+    per ``min_refresh_interval`` so forged tokens cannot turn into a fetch
+    per request. Tokens whose key isn't cached yet fall back to GoTrue.
+    """
 
+    def __init__(self, url: str, ttl: int = JWKS_CACHE_SECONDS, min_refresh_interval: int = 30):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+
+    def get(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        age = now - self._fetched_at
+        if age > self.ttl or (key is None and age > self.min_refresh_interval):
+            self._schedule_refresh()
+        return key
+
+    def _schedule_refresh(self):
+        if self._refreshing is not None and not self._refreshing.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refreshing = loop.create_task(self.refresh())
+
+    async def refresh(self):
+        # Record the attempt up front so a failing endpoint is not hammered
+        self._fetched_at = time.monotonic()
+        try:
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.get(self.url, headers={"apikey": SUPABASE_KEY})
+            response.raise_for_status()
+            jwks = response.json()
+        except Exception as e:
+            # Transient; the cached keys keep serving until the next attempt
+            logger.warning("Failed to fetch JWKS from %s: %s", self.url, e)
+            return
+
+        try:
+            key_set = jwt.PyJWKSet.from_dict(jwks)
+        except (jwt.PyJWKError, jwt.PyJWKSetError) as e:
+            # E.g. MissingCryptographyError: every token would fall back to GoTrue
+            logger.error("Could not load JWKS keys from %s, local verification is off: %s", self.url, e)
+            return
+        self._keys = {jwk.key_id: jwk for jwk in key_set.keys if jwk.key_id}
+
+
+_jwks = JWKSCache(JWKS_URL)
+
+
+async def warm_jwks():
+    """Fetch the signing keys once at startup so the first requests can verify locally."""
+    if LOCAL_JWT_VERIFICATION:
+        await _jwks.refresh()
+
+
+def verify_token_locally(token: str) -> Optional[dict]:
+    """
+    Verify signature, expiry, audience and issuer of an access token.
+
+    Returns:
+        The token claims, or None if no key material is available to verify it
+
+    Raises:
+        jwt.InvalidTokenError: If the token is malformed, expired or forged
+    """
+    if not LOCAL_JWT_VERIFICATION:
+        return None
+
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm == "HS256":
+        if not JWT_SECRET:
+            return None
+        key = JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        jwk = _jwks.get(header.get("kid"))
+        if jwk is None:
+            return None
+        key = jwk.key
+    else:
+        return None
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=JWT_AUDIENCE,
+        issuer=JWT_ISSUER,
+        leeway=JWT_LEEWAY_SECONDS,
+        options={"require": ["exp", "sub"]},
+    )
+
+
+async def _get_user_remote(token: str):
+    """Validate the token with GoTrue and return its user."""
     try:
-        # Verify token with Supabase
-        user_response = supabase.auth.get_user(token)
+        client = await get_client()
+        user_response = await with_timeout(client.auth.get_user(token))
 
         if not user_response or not user_response.user:
             raise HTTPException(status_code=401, detail="Invalid authentication token")
 
         return user_response.user
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = str(e)
         if "Invalid" in error_msg or "expired" in error_msg.lower():
@@ -24,6 +197,82 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail=f"Authentication failed: {error_msg}")
 
 
+class _InvalidToken:
+    """Negative cache entry for a token that failed validation."""
+
+    __slots__ = ("detail",)
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+# Failures that say something about the token itself (not about GoTrue being unreachable)
+_NEGATIVE_CACHEABLE = {"Invalid authentication token", "Invalid or expired token"}
+
+_user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+_user_loads = SingleFlight()
+
+
+def _cache_ttl(token: str) -> float:
+    """Seconds a resolved user may be cached: the default TTL, capped at the token's exp."""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        return 0
+    if exp is None:
+        return AUTH_CACHE_TTL_SECONDS
+    return min(AUTH_CACHE_TTL_SECONDS, exp - time.time())
+
+
+async def _authenticate_uncached(token: str):
+    try:
+        claims = verify_token_locally(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    if claims is not None:
+        return TokenUser(claims)
+
+    return await _get_user_remote(token)
+
+
+async def _load_user(key: bytes, token: str):
+    try:
+        user = await _authenticate_uncached(token)
+    except HTTPException as exc:
+        if exc.detail in _NEGATIVE_CACHEABLE:
+            _user_cache.set(key, _InvalidToken(exc.detail), ttl=AUTH_NEGATIVE_CACHE_SECONDS)
+        raise
+
+    _user_cache.set(key, user, ttl=_cache_ttl(token))
+    return user
+
+
+async def authenticate_token(token: str):
+    """Return the user for a bearer token, raising 401 if it is not valid."""
+    key = hashlib.sha256(token.encode()).digest()
+
+    cached = _user_cache.get(key)
+    if isinstance(cached, _InvalidToken):
+        raise HTTPException(status_code=401, detail=cached.detail)
+    if cached is not None:
+        return cached
+
+    return await _user_loads.run(key, lambda: _load_user(key, token))
+
+
+def auth_cache_stats() -> dict:
+    """Hit/miss counters for the authenticated user cache."""
+    return {**_user_cache.stats(), "collapsed_loads": _user_loads.collapsed}
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Verify JWT token and return user data"""
+    return await authenticate_token(credentials.credentials)
+
+
 async def get_optional_user(request: Request):
     """Get user if authenticated, None otherwise"""
     auth_header = request.headers.get("Authorization")
@@ -32,7 +281,6 @@ async def get_optional_user(request: Request):
 
     token = auth_header.split(" ")[1]
     try:
-        user_response = supabase.auth.get_user(token)
-        return user_response.user if user_response else None
-    except:
+        return await authenticate_token(token)
+    except HTTPException:
         return None
@@ -4,41 +4,17 @@ Authentication helper functions for managing users.
 This module provides utilities for user management, including
 auto-verification of email addresses to bypass Supabase's
 email confirmation requirement.
+
+The service-role client is shared process-wide (see utils/database.py).
 """
 
-import os
 import logging
 from datetime import datetime
-from supabase import create_client, Client
+from utils.database import get_admin_client, with_timeout
 
 logger = logging.getLogger(__name__)
 
 
-def get_admin_client() -> Client:
-    """
-    Get Supabase client with admin privileges (service role).
-
-    IMPORTANT: Only use this server-side. Never expose the service role key to the client.
-
-    Returns:
-        Supabase client with admin permissions
-
-    Raises:
-        ValueError: If service role key is not set
-    """
-    url = os.getenv("SUPABASE_URL")
-    # Try SUPABASE_SERVICE_ROLE_KEY first, fallback to SUPABASE_KEY
-    service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
-
-    if not service_role_key:
-        raise ValueError(
-            "SUPABASE_SERVICE_ROLE_KEY or SUPABASE_KEY is required for admin operations. "
-            "Get it from: Supabase Dashboard > Settings > API > service_role key"
-        )
-
-    return create_client(url, service_role_key)
-
-
 async def auto_verify_user_email(user_id: str) -> bool:
     """
     Automatically verify a user's email address.
@@ -58,15 +34,15 @@ async def auto_verify_user_email(user_id: str) -> bool:
         True
     """
     try:
-        admin_client = get_admin_client()
+        admin_client = await get_admin_client()
 
         # Update the user to mark their email as confirmed
-        response = admin_client.auth.admin.update_user_by_id(
+        response = await with_timeout(admin_client.auth.admin.update_user_by_id(
             user_id,
             {
                 "email_confirmed_at": datetime.utcnow().isoformat()
             }
-        )
+        ))
 
         logger.info(f"Successfully auto-verified email for user {user_id}")
         return True
@@ -107,17 +83,17 @@ async def create_user_without_confirmation(email: str, password: str, metadata:
         ...     print(f"User created: {result['user']['email']}")
     """
     try:
-        admin_client = get_admin_client()
+        admin_client = await get_admin_client()
         logger.info(f"Creating user with email: {email}")
 
         # Create user with admin privileges
         # email_confirm=True marks the email as verified immediately
-        response = admin_client.auth.admin.create_user({
+        response = await with_timeout(admin_client.auth.admin.create_user({
             "email": email,
             "password": password,
             "email_confirm": True,
             "user_metadata": metadata or {}
-        })
+        }))
 
         logger.info(f"Create user response: {response}")
 
@@ -175,10 +151,10 @@ async def bulk_verify_unconfirmed_users(limit: int = 100) -> dict:
             - errors (list): List of error messages
     """
     try:
-        admin_client = get_admin_client()
+        admin_client = await get_admin_client()
 
         # List all unconfirmed users
-        response = admin_client.auth.admin.list_users()
+        response = await with_timeout(admin_client.auth.admin.list_users())
         users = response if isinstance(response, list) else []
 
         verified = 0
@@ -0,0 +1,57 @@
+"""
+ASGI middleware that caps the size of request bodies.
+
+Starlette spools a multipart upload to a temporary file before the
+endpoint (or any dependency) runs, so a size check in the endpoint only
+sees the file after it has been received in full. This middleware
+enforces MAX_REQUEST_BODY_BYTES while the body arrives: a declared
+``Content-Length`` over the limit is rejected with a 413 straight away,
+and a body without one (chunked) is cut off with a 413 once it passes the
+limit.
+"""
+
+import os
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.storage import MAX_FILE_SIZE
+
+# Room for the consent form plus the registration fields sent alongside it
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(MAX_FILE_SIZE + 1024 * 1024)))
+
+TOO_LARGE_DETAIL = "Request body too large"
+
+
+class BodySizeLimitMiddleware:
+    """Reject requests whose body is larger than max_bytes."""
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_REQUEST_BODY_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": TOO_LARGE_DETAIL}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the app, so its exception handling turns it into the 413
+                    raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,156 @@
+"""
+Async Supabase clients shared by every router.
+
+Two process-wide clients are created lazily on first use:
+
+    get_client()        uses SUPABASE_KEY (same key as utils.supabase_client)
+    get_admin_client()  uses SUPABASE_SERVICE_ROLE_KEY, falling back to SUPABASE_KEY
+
+Their PostgREST, Storage and Auth sub-clients each hold a pooled keep-alive
+connection (see utils/http_pool.py). Wrap upstream calls in ``execute`` or
+``with_timeout`` so a slow Supabase response fails that request with a 504
+instead of hanging it; SUPABASE_QUERY_TIMEOUT sets the default (seconds).
+"""
+
+import os
+import asyncio
+import logging
+from dataclasses import replace
+from typing import Any, Awaitable, Optional
+
+import httpx
+from fastapi import HTTPException
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+from utils.http_pool import build_http_client, client_stats
+from utils.supabase_client import SUPABASE_URL, SUPABASE_KEY
+
+logger = logging.getLogger(__name__)
+
+QUERY_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_QUERY_TIMEOUT", "10"))
+
+
+class PooledClient:
+    """Lazily created AsyncClient whose sub-clients use dedicated connection pools."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.client: Optional[AsyncClient] = None
+        self.http_clients: dict[str, httpx.AsyncClient] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, url: str, key: str) -> AsyncClient:
+        if self.client is not None:
+            return self.client
+
+        async with self._lock:
+            if self.client is None:
+                self.client = await self._build(url, key)
+                logger.info("Created pooled Supabase %s client", self.name)
+        return self.client
+
+    async def _build(self, url: str, key: str) -> AsyncClient:
+        client = await acreate_client(
+            url,
+            key,
+            AsyncClientOptions(auto_refresh_token=False, persist_session=False),
+        )
+
+        # supabase-py points a shared httpx client's base_url at whichever
+        # sub-client used it last, so each sub-client gets its own pool.
+        http_clients = {
+            "postgrest": build_http_client(httpx.AsyncClient),
+            "storage": build_http_client(httpx.AsyncClient),
+            "auth": build_http_client(httpx.AsyncClient),
+        }
+        client._postgrest = client._init_postgrest_client(
+            rest_url=client.rest_url,
+            headers=client.options.headers,
+            schema=client.options.schema,
+            http_client=http_clients["postgrest"],
+        )
+        client._storage = client._init_storage_client(
+            storage_url=client.storage_url,
+            headers=client.options.headers,
+            http_client=http_clients["storage"],
+        )
+        client.auth = client._init_supabase_auth_client(
+            auth_url=client.auth_url,
+            client_options=replace(client.options, httpx_client=http_clients["auth"]),
+        )
+
+        self.http_clients = http_clients
+        return client
+
+    async def close(self):
+        async with self._lock:
+            for http_client in self.http_clients.values():
+                try:
+                    await http_client.aclose()
+                except Exception as e:
+                    logger.warning("Failed to close %s HTTP client: %s", self.name, e)
+            self.http_clients = {}
+            self.client = None
+
+    def stats(self) -> dict:
+        return {
+            "initialized": self.client is not None,
+            "pools": {name: client_stats(http_client) for name, http_client in self.http_clients.items()},
+        }
+
+
+_default = PooledClient("default")
+_admin = PooledClient("admin")
+
+
+async def get_client() -> AsyncClient:
+    """Get the shared Supabase client (SUPABASE_KEY)."""
+    return await _default.get(SUPABASE_URL, SUPABASE_KEY)
+
+
+async def get_admin_client() -> AsyncClient:
+    """
+    Get Supabase client with admin privileges (service role).
+
+    IMPORTANT: Only use this server-side. Never expose the service role key to the client.
+
+    Returns:
+        Supabase client with admin permissions
+
+    Raises:
+        ValueError: If service role key is not set
+    """
+    # Try SUPABASE_SERVICE_ROLE_KEY first, fallback to SUPABASE_KEY
+    service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
+
+    if not service_role_key:
+        raise ValueError(
+            "SUPABASE_SERVICE_ROLE_KEY or SUPABASE_KEY is required for admin operations. "
+            "Get it from: Supabase Dashboard > Settings > API > service_role key"
+        )
+
+    return await _admin.get(SUPABASE_URL, service_role_key)
+
+
+async def with_timeout(awaitable: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Await an upstream Supabase call, raising 504 if it takes longer than the timeout."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout or QUERY_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Supabase request timed out after %ss", timeout or QUERY_TIMEOUT_SECONDS)
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
+
+
+async def execute(query, timeout: Optional[float] = None):
+    """Execute a PostgREST query builder with a timeout."""
+    return await with_timeout(query.execute(), timeout)
+
+
+async def close_clients():
+    """Close pooled connections of both clients (called on app shutdown)."""
+    await _default.close()
+    await _admin.close()
+
+
+def database_stats() -> dict:
+    """Connection pool usage of the shared clients, per sub-client."""
+    return {"default": _default.stats(), "admin": _admin.stats()}
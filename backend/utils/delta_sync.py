@@ -0,0 +1,100 @@
+"""
+"Changes since" queries for admin polling.
+
+Rows come back in ``(updated_at, id)`` order with an opaque watermark for
+the next request:
+
+- while a client is catching up (``has_more``) the watermark is a keyset
+  cursor on the last row, so the next batch continues exactly where this
+  one stopped;
+- once caught up it holds only the newest ``updated_at`` seen, and the next
+  poll re-reads CHANGES_LOOKBACK_SECONDS before it. ``updated_at`` is set
+  when a write runs, not when it commits, so a write that commits just
+  after a poll can carry a timestamp older than that poll's watermark; the
+  lookback window picks it up. Rows may therefore arrive more than once and
+  clients should merge them by id.
+
+Deletes are not reported.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from utils.database import execute
+from utils.pagination import MAX_PAGE_SIZE, decode_token, encode_token
+
+CHANGES_LOOKBACK_SECONDS = int(os.getenv("CHANGES_LOOKBACK_SECONDS", "30"))
+
+# Columns every batch needs to build its watermark
+WATERMARK_COLUMNS = ("updated_at", "id")
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a watermark timestamp; it must carry a UTC offset to compare with updated_at."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    if parsed.tzinfo is None:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    return parsed
+
+
+def _since(query, watermark: Optional[str]) -> tuple[object, Optional[datetime]]:
+    """Apply a watermark to a query; also returns the caught-up timestamp, if any."""
+    if not watermark:
+        return query, None
+
+    values = decode_token(watermark, "watermark")
+    if len(values) == 2:
+        updated_at, row_id = values
+        _parse_timestamp(updated_at)
+        return query.or_(
+            f"updated_at.gt.{updated_at},and(updated_at.eq.{updated_at},id.gt.{row_id})"
+        ), None
+    if len(values) == 1:
+        caught_up = _parse_timestamp(values[0])
+        start = caught_up - timedelta(seconds=CHANGES_LOOKBACK_SECONDS)
+        return query.gte("updated_at", start.isoformat()), caught_up
+
+    raise HTTPException(status_code=400, detail="Invalid watermark")
+
+
+async def fetch_changes(
+    query,
+    watermark: Optional[str],
+    limit: int,
+) -> tuple[list, Optional[str], bool]:
+    """
+    Run a select query as one batch of changes.
+
+    Args:
+        query: PostgREST select builder including WATERMARK_COLUMNS
+        watermark: Watermark from the previous batch, or None for a full sync
+        limit: Batch size, at most MAX_PAGE_SIZE
+
+    Returns:
+        (rows, next_watermark, has_more); next_watermark is None only when
+        a full sync found no rows
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query, caught_up = _since(query, watermark)
+    query = query.order("updated_at").order("id").limit(limit + 1)
+    result = await execute(query)
+    rows = result.data or []
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_token(rows[-1]["updated_at"], rows[-1]["id"]), True
+
+    newest = datetime.fromisoformat(rows[-1]["updated_at"]) if rows else None
+    if caught_up is not None and (newest is None or caught_up > newest):
+        newest = caught_up
+    if newest is None:
+        if not watermark:
+            return rows, None, False
+        # Finished catching up on an empty last batch: resume from the cursor's timestamp
+        newest = _parse_timestamp(decode_token(watermark, "watermark")[0])
+    return rows, encode_token(newest.isoformat()), False
@@ -1,150 +1,170 @@
+"""
+Transactional email through Mailtrap templates.
+
+EmailService is built once at startup (init_email_service) and owns one
+requests Session, so every batch reuses its connection pool (the SDK's
+``MailtrapClient.sending_api`` opens a new Session on every access).
+Sender, template UUIDs and unsubscribe settings are read from the
+environment once. Messages are built with EmailService.build() and sent
+only by the email queue (utils/email_queue.py) through send_batch().
+"""
+
 import os
-import asyncio
 import logging
+from typing import Optional
+
+import requests
 import mailtrap as mt
+from mailtrap.config import DEFAULT_REQUEST_TIMEOUT, SENDING_HOST
+from mailtrap.exceptions import APIError
 
 logger = logging.getLogger(__name__)
 
+# Email types
+PREREGISTRATION = "preregistration"
+GOOGLE_SIGNUP = "google_signup"
+REGISTRATION_COMPLETE = "registration_complete"
 
-async def send_prereg_email(to_email: str, name: str):
-    """Send a preregistration email using Mailtrap template API.
-
-    Uses `MAILTRAP_PASS` from env as API token and `MAIL_FROM` as sender.
-    The template UUID must exist in your Mailtrap account.
-    """
-    token = os.getenv("MAILTRAP_PASS")
-    if not token:
-        logger.error("MAILTRAP_PASS is not set")
-        raise ValueError("MAILTRAP_PASS required")
-
-    # Strip whitespace in case env var has extra spaces
-    token = token.strip()
-
-    sender_email = os.getenv("MAIL_FROM", "info@hackthebias.dev")
+# Env var holding each type's template UUID
+TEMPLATE_ENV_VARS = {
+    PREREGISTRATION: "MAILTRAP_TEMPLATE_UUID",
+    GOOGLE_SIGNUP: "MAILTRAP_TEMPLATE_UUID",
+    REGISTRATION_COMPLETE: "MAILTRAP_COMPLETE_REG_TEMPLATE_UUID",
+}
 
-    # Build unsubscribe URL (override with UNSUBSCRIBE_BASE env var if needed)
-    unsubscribe_base = os.getenv("UNSUBSCRIBE_BASE", "https://hackthebias.dev/unsubscribe")
-    unsubscribe_url = f"{unsubscribe_base}?email={to_email}"
+SENDER_NAME = "Hack The Bias Team"
 
-    # Prepare List-Unsubscribe header (mailto and https form)
-    list_unsub_header = f"<mailto:unsubscribe@{os.getenv('MAIL_DOMAIN','hackthebias.dev')}>, <{unsubscribe_url}>"
-    headers = {"List-Unsubscribe": list_unsub_header}
+BATCH_URL = f"https://{SENDING_HOST}/api/batch"
 
-    # Build the MailFromTemplate payload
-    mail = mt.MailFromTemplate(
-        sender=mt.Address(email=sender_email, name="Hack The Bias Team"),
-        to=[mt.Address(email=to_email)],
-        template_uuid=os.getenv("MAILTRAP_TEMPLATE_UUID"),
-        template_variables={"name": name, "unsubscribe_url": unsubscribe_url},
-        headers=headers,
-    )
 
-    client = mt.MailtrapClient(token=token)
-
-    # client.send is synchronous (uses requests). Run it in executor to avoid blocking.
-    loop = asyncio.get_running_loop()
+def _response_errors(response: requests.Response) -> list[str]:
     try:
-        resp = await loop.run_in_executor(None, client.send, mail)
-        logger.info("Mailtrap send response: %s", resp)
-        return resp
-    except Exception as e:
-        logger.exception("Mailtrap send failed: %s", e)
-        raise
-
+        errors = response.json().get("errors")
+    except (ValueError, AttributeError):
+        errors = None
+    if isinstance(errors, str):
+        return [errors]
+    return [str(error) for error in errors] if errors else [response.reason or "Request failed"]
 
-async def send_google_signup_email(to_email: str, name: str):
-    """Send a welcome email to users who signed up via Google OAuth.
 
-    Uses Mailtrap template API, same as prereg email.
+class EmailService:
     """
-    token = os.getenv("MAILTRAP_PASS")
-    print(f"Mailtrap token (first 3 chars): {os.getenv('MAILTRAP_PASS', 'NOT_FOUND')[:3]}")
-    if not token:
-        logger.error("MAILTRAP_PASS is not set")
-        raise ValueError("MAILTRAP_PASS required")
-
-    # Strip whitespace in case env var has extra spaces
-    token = token.strip()
-
-    # Debug logging (only shows first/last 4 chars for security)
-    token_preview = f"{token[:4]}...{token[-4:]}" if len(token) > 8 else "***"
-    logger.info(f"Using Mailtrap token: {token_preview} (length: {len(token)})")
-
-    sender_email = os.getenv("MAIL_FROM", "info@hackthebias.dev")
-
-    # Build unsubscribe URL (override with UNSUBSCRIBE_BASE env var if needed)
-    unsubscribe_base = os.getenv("UNSUBSCRIBE_BASE", "https://hackthebias.dev/unsubscribe")
-    unsubscribe_url = f"{unsubscribe_base}?email={to_email}"
-
-    # Prepare List-Unsubscribe header (mailto and https form)
-    list_unsub_header = f"<mailto:unsubscribe@{os.getenv('MAIL_DOMAIN','hackthebias.dev')}>, <{unsubscribe_url}>"
-    headers = {"List-Unsubscribe": list_unsub_header}
-
-    # Build the MailFromTemplate payload
-    mail = mt.MailFromTemplate(
-        sender=mt.Address(email=sender_email, name="Hack The Bias Team"),
-        to=[mt.Address(email=to_email)],
-        template_uuid=os.getenv("MAILTRAP_TEMPLATE_UUID"),
-        template_variables={"name": name, "unsubscribe_url": unsubscribe_url},
-        headers=headers,
-    )
-
-    client = mt.MailtrapClient(token=token)
-
-    loop = asyncio.get_running_loop()
-    try:
-        resp = await loop.run_in_executor(None, client.send, mail)
-        logger.info(f"Google signup welcome email sent to {to_email}: {resp}")
-        return {"success": True, "email": to_email}
-    except Exception as e:
-        logger.exception("Failed to send Google signup email: %s", e)
-        raise
-
-
-async def send_registration_complete_email(to_email: str, name: str):
-    """Send a registration complete email after user finishes full registration.
-
-    Uses a different Mailtrap template (MAILTRAP_COMPLETE_REG_TEMPLATE_UUID).
+    Mailtrap template sender with its settings resolved up front.
+
+    Args:
+        token: Mailtrap API token
+        sender_email: From address
+        mail_domain: Domain of the unsubscribe mailto address
+        unsubscribe_base: Unsubscribe page; the recipient is appended as ?email=
+        templates: Email type -> template UUID (None if not configured)
     """
-    token = os.getenv("MAILTRAP_PASS")
-    if not token:
-        logger.error("MAILTRAP_PASS is not set")
-        raise ValueError("MAILTRAP_PASS required")
-
-    # Strip whitespace in case env var has extra spaces
-    token = token.strip()
 
-    template_uuid = os.getenv("MAILTRAP_COMPLETE_REG_TEMPLATE_UUID")
-    if not template_uuid:
-        logger.error("MAILTRAP_COMPLETE_REG_TEMPLATE_UUID is not set")
-        raise ValueError("MAILTRAP_COMPLETE_REG_TEMPLATE_UUID required")
-
-    sender_email = os.getenv("MAIL_FROM", "info@hackthebias.dev")
+    def __init__(
+        self,
+        token: str,
+        sender_email: str,
+        mail_domain: str,
+        unsubscribe_base: str,
+        templates: dict[str, Optional[str]],
+    ):
+        # One requests Session for every send, so connections are kept alive
+        self.session = requests.Session()
+        self.session.headers.update(mt.MailtrapClient(token=token).headers)
+        self.sender = mt.Address(email=sender_email, name=SENDER_NAME)
+        self.templates = templates
+        self._unsubscribe_base = unsubscribe_base
+        self._unsubscribe_mailto = f"<mailto:unsubscribe@{mail_domain}>"
+
+    @classmethod
+    def from_env(cls) -> "EmailService":
+        token = (os.getenv("MAILTRAP_PASS") or "").strip()
+        if not token:
+            raise ValueError("MAILTRAP_PASS required")
+
+        templates = {email_type: os.getenv(var) for email_type, var in TEMPLATE_ENV_VARS.items()}
+        for email_type, template_uuid in templates.items():
+            if not template_uuid:
+                logger.warning(f"{TEMPLATE_ENV_VARS[email_type]} is not set; {email_type} emails will fail")
+
+        return cls(
+            token=token,
+            sender_email=os.getenv("MAIL_FROM", "info@hackthebias.dev"),
+            mail_domain=os.getenv("MAIL_DOMAIN", "hackthebias.dev"),
+            unsubscribe_base=os.getenv("UNSUBSCRIBE_BASE", "https://hackthebias.dev/unsubscribe"),
+            templates=templates,
+        )
+
+    def build(self, email_type: str, to_email: str, name: str) -> mt.MailFromTemplate:
+        """The templated message for one recipient."""
+        template_uuid = self.templates.get(email_type)
+        if not template_uuid:
+            raise ValueError(f"{TEMPLATE_ENV_VARS.get(email_type, email_type)} required")
+
+        unsubscribe_url = f"{self._unsubscribe_base}?email={to_email}"
+        return mt.MailFromTemplate(
+            sender=self.sender,
+            to=[mt.Address(email=to_email)],
+            template_uuid=template_uuid,
+            template_variables={"name": name, "unsubscribe_url": unsubscribe_url},
+            # List-Unsubscribe in both mailto and https form
+            headers={"List-Unsubscribe": f"{self._unsubscribe_mailto}, <{unsubscribe_url}>"},
+        )
+
+    def send_batch(self, mails: list) -> list[dict]:
+        """
+        Send several messages in one Mailtrap batch request (blocking).
+
+        The SDK has no batch call, so this posts to /api/batch through the
+        shared Session. The sender goes in ``base``; each message keeps its
+        own recipient, template and headers.
+
+        Returns:
+            One response per message, in order: {"success": True, "message_ids": [...]}
+            or {"success": False, "errors": [...]}
+
+        Raises:
+            mailtrap.exceptions.APIError: If the request as a whole failed
+        """
+        messages = []
+        for mail in mails:
+            data = mail.api_data
+            data.pop("from", None)
+            messages.append(data)
+        payload = {"base": {"from": self.sender.api_data}, "requests": messages}
+        response = self.session.post(BATCH_URL, json=payload, timeout=DEFAULT_REQUEST_TIMEOUT)
+        if not response.ok:
+            raise APIError(response.status_code, errors=_response_errors(response))
+        responses = (response.json() if response.content.strip() else {}).get("responses") or []
+        missing = {"success": False, "errors": ["No response for this message"]}
+        return [responses[i] if i < len(responses) else missing for i in range(len(mails))]
+
+    def close(self):
+        self.session.close()
+
+
+_service: Optional[EmailService] = None
+
+
+def init_email_service():
+    """Build the shared EmailService; called at startup."""
+    global _service
+    try:
+        _service = EmailService.from_env()
+    except ValueError as e:
+        logger.error(f"Email disabled: {e}")
 
-    # Build unsubscribe URL
-    unsubscribe_base = os.getenv("UNSUBSCRIBE_BASE", "https://hackthebias.dev/unsubscribe")
-    unsubscribe_url = f"{unsubscribe_base}?email={to_email}"
 
-    # Prepare List-Unsubscribe header
-    list_unsub_header = f"<mailto:unsubscribe@{os.getenv('MAIL_DOMAIN','hackthebias.dev')}>, <{unsubscribe_url}>"
-    headers = {"List-Unsubscribe": list_unsub_header}
+def get_email_service() -> EmailService:
+    """The shared EmailService, built on first use if startup didn't."""
+    global _service
+    if _service is None:
+        _service = EmailService.from_env()
+    return _service
 
-    # Build the MailFromTemplate payload
-    mail = mt.MailFromTemplate(
-        sender=mt.Address(email=sender_email, name="Hack The Bias Team"),
-        to=[mt.Address(email=to_email)],
-        template_uuid=template_uuid,
-        template_variables={"name": name, "unsubscribe_url": unsubscribe_url},
-        headers=headers,
-    )
 
-    client = mt.MailtrapClient(token=token)
+def close_email_service():
+    global _service
+    if _service is not None:
+        _service.close()
+        _service = None
 
-    loop = asyncio.get_running_loop()
-    try:
-        resp = await loop.run_in_executor(None, client.send, mail)
-        logger.info(f"Registration complete email sent to {to_email}: {resp}")
-        return {"success": True, "email": to_email}
-    except Exception as e:
-        logger.exception("Failed to send registration complete email: %s", e)
-        raise
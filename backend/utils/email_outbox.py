@@ -0,0 +1,250 @@
+"""
+Durable outbox for queued email.
+
+The in-memory email queue loses whatever it holds when a worker is
+recycled or crashes. The outbox records every message in a local SQLite
+database (EMAIL_OUTBOX_PATH) in the same request that queues it, and
+deletes the row once the message is delivered or given up on. Whatever
+is left is replayed by the dispatcher.
+
+There is at most one pending row per (user, email type): asking again
+while a message is pending doesn't queue a second one.
+
+The database runs in WAL mode with ``synchronous=NORMAL``. A commit is
+then an append to the WAL without an fsync, cheap enough to do inline
+in the request. Committed rows survive a process crash, but the last
+commits may be lost on power failure.
+
+Workers on the same host share the file. Each row belongs to the worker
+that wrote it, and each worker refreshes a heartbeat every
+EMAIL_OUTBOX_SWEEP_SECONDS. When a worker stops heartbeating, or exits
+and releases its rows, another worker claims them on its next sweep
+(and at startup) and queues them again. Delivery is at least once: a
+worker that dies mid-send may have its messages sent twice.
+
+Set EMAIL_OUTBOX_PATH to an empty string to disable the outbox.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+from typing import Optional
+
+from utils.email_queue import EmailJob, EmailQueue, email_queue
+
+logger = logging.getLogger(__name__)
+
+EMAIL_OUTBOX_PATH = os.getenv("EMAIL_OUTBOX_PATH", "email_outbox.db")
+EMAIL_OUTBOX_SWEEP_SECONDS = float(os.getenv("EMAIL_OUTBOX_SWEEP_SECONDS", "10"))
+# A worker whose heartbeat is older than this is presumed gone
+EMAIL_OUTBOX_OWNER_TIMEOUT_SECONDS = float(
+    os.getenv("EMAIL_OUTBOX_OWNER_TIMEOUT_SECONDS", str(EMAIL_OUTBOX_SWEEP_SECONDS * 3))
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    user_id TEXT NOT NULL,
+    email_type TEXT NOT NULL,
+    to_email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (user_id, email_type)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS email_outbox_owner ON email_outbox (owner);
+CREATE TABLE IF NOT EXISTS email_outbox_owners (
+    owner TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class EmailOutbox:
+    """
+    SQLite-backed record of queued email, replayed into an EmailQueue.
+
+    Args:
+        path: Database file on local disk, shared by the host's workers
+        queue: Queue to feed; its on_finished hook is taken over
+    """
+
+    def __init__(self, path: str = EMAIL_OUTBOX_PATH, queue: EmailQueue = email_queue):
+        self.path = path
+        self.queue = queue
+        # Identifies this process's rows; a restarted worker is a new owner
+        self.owner = uuid.uuid4().hex
+        self._db: Optional[sqlite3.Connection] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.replayed = 0
+        self.deduplicated = 0
+
+    def open(self):
+        # Autocommit: every statement is its own short transaction
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=2000")
+            db.executescript(SCHEMA)
+            db.execute(
+                "INSERT OR REPLACE INTO email_outbox_owners (owner, heartbeat_at) VALUES (?, ?)",
+                (self.owner, time.time()),
+            )
+        except Exception:
+            db.close()
+            raise
+        self._db = db
+        self.queue.on_finished = self._delivered
+
+    def submit(self, email_type: str, user_id: str, to_email: str, name: str) -> bool:
+        """
+        Record a message and queue it.
+
+        Returns:
+            False if one is already pending for this user and type
+
+        Raises:
+            ValueError: If email is not configured for this type
+            EmailQueueFull: If the queue is at capacity (nothing is recorded)
+        """
+        if self._db is None:
+            self.queue.enqueue(email_type, user_id, to_email, name)
+            return True
+
+        cursor = self._db.execute(
+            "INSERT INTO email_outbox (user_id, email_type, to_email, name, owner, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, email_type) DO NOTHING",
+            (user_id, email_type, to_email, name, self.owner, time.time()),
+        )
+        if cursor.rowcount == 0:
+            self.deduplicated += 1
+            return False
+        try:
+            self.queue.enqueue(email_type, user_id, to_email, name)
+        except Exception:
+            self._forget(user_id, email_type)
+            raise
+        return True
+
+    def _forget(self, user_id: str, email_type: str):
+        self._db.execute(
+            "DELETE FROM email_outbox WHERE user_id = ? AND email_type = ?", (user_id, email_type)
+        )
+
+    def _release(self, user_id: str, email_type: str):
+        # No live worker has an empty owner id, so the row counts as orphaned
+        self._db.execute(
+            "UPDATE email_outbox SET owner = '' WHERE user_id = ? AND email_type = ?", (user_id, email_type)
+        )
+
+    def _delivered(self, jobs: list[EmailJob]):
+        """Purge rows for messages that were delivered or dropped for good."""
+        self._db.executemany(
+            "DELETE FROM email_outbox WHERE user_id = ? AND email_type = ?",
+            [(job.user_id, job.email_type) for job in jobs],
+        )
+
+    def _claim_orphans(self) -> list[tuple]:
+        """Refresh this worker's heartbeat and take over rows no live worker holds."""
+        now = time.time()
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO email_outbox_owners (owner, heartbeat_at) VALUES (?, ?)",
+                (self.owner, now),
+            )
+            db.execute(
+                "DELETE FROM email_outbox_owners WHERE heartbeat_at < ?",
+                (now - EMAIL_OUTBOX_OWNER_TIMEOUT_SECONDS,),
+            )
+            rows = db.execute(
+                "SELECT user_id, email_type, to_email, name FROM email_outbox "
+                "WHERE owner NOT IN (SELECT owner FROM email_outbox_owners) ORDER BY created_at"
+            ).fetchall()
+            if rows:
+                db.execute(
+                    "UPDATE email_outbox SET owner = ? WHERE owner NOT IN (SELECT owner FROM email_outbox_owners)",
+                    (self.owner,),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def replay(self) -> int:
+        """Queue rows left behind by workers that are gone; returns how many."""
+        queued = 0
+        for user_id, email_type, to_email, name in self._claim_orphans():
+            try:
+                self.queue.enqueue(email_type, user_id, to_email, name)
+            except ValueError as exc:
+                # Not configured for this type; retrying won't help, and the
+                # row would block every later submit for this user and type
+                logger.error(f"Dropping {email_type} email for user {user_id} from the outbox: {exc}")
+                self._forget(user_id, email_type)
+                continue
+            except Exception as exc:
+                # Disown the row so the next sweep (here or elsewhere) retries it
+                logger.error(f"Could not replay {email_type} email for user {user_id}: {exc}")
+                self._release(user_id, email_type)
+                continue
+            queued += 1
+        if queued:
+            self.replayed += queued
+            logger.info(f"Replayed {queued} email(s) from the outbox")
+        return queued
+
+    async def _dispatch(self):
+        while True:
+            try:
+                self.replay()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning(f"Email outbox sweep failed: {exc}")
+            await asyncio.sleep(EMAIL_OUTBOX_SWEEP_SECONDS)
+
+    def start(self):
+        """Open the database and start replaying; call after the queue has started."""
+        if not self.path or self._dispatcher is not None:
+            return
+        try:
+            self.open()
+        except Exception as exc:
+            logger.error(f"Email outbox disabled, could not open {self.path}: {exc}")
+            return
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        """Stop sweeping and release this worker's rows to the others; call after the queue has stopped."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self._db is not None:
+            self.queue.on_finished = None
+            self._db.execute("DELETE FROM email_outbox_owners WHERE owner = ?", (self.owner,))
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        pending = None
+        if self._db is not None:
+            pending = self._db.execute("SELECT count(*) FROM email_outbox").fetchone()[0]
+        return {
+            "enabled": self._db is not None,
+            "pending": pending,
+            "replayed": self.replayed,
+            "deduplicated": self.deduplicated,
+        }
+
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,273 @@
+"""
+Background delivery of transactional email.
+
+Endpoints enqueue a message and return straight away; EMAIL_WORKERS
+async workers drain the queue. A worker takes the first waiting message,
+waits up to EMAIL_BATCH_WAIT_SECONDS for more, and sends up to
+EMAIL_BATCH_SIZE of them in one Mailtrap batch request. The blocking
+SDK calls run on a dedicated thread pool of the same size, so email
+never competes with the default executor.
+
+A batch that fails as a whole with a transient error (connection
+problems, timeouts, 429 or 5xx) is retried with exponential backoff and
+full jitter, up to EMAIL_MAX_ATTEMPTS. Messages rejected individually, or
+with a client error, are logged and dropped.
+
+The queue holds at most EMAIL_QUEUE_MAX_SIZE messages; enqueue() raises
+EmailQueueFull beyond that. The queue itself is in memory; on_finished
+lets the outbox (utils/email_outbox.py) forget messages once they are
+delivered or given up on, and replay the rest after a restart.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import requests
+from mailtrap.exceptions import APIError
+from utils.email import get_email_service
+
+logger = logging.getLogger(__name__)
+
+EMAIL_QUEUE_MAX_SIZE = int(os.getenv("EMAIL_QUEUE_MAX_SIZE", "1000"))
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+# Mailtrap accepts up to 500 messages per batch request
+EMAIL_BATCH_SIZE = min(int(os.getenv("EMAIL_BATCH_SIZE", "50")), 500)
+EMAIL_BATCH_WAIT_SECONDS = float(os.getenv("EMAIL_BATCH_WAIT_SECONDS", "0.2"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "1"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "60"))
+# How long shutdown waits for the queue to drain
+EMAIL_DRAIN_SECONDS = float(os.getenv("EMAIL_DRAIN_SECONDS", "5"))
+
+# Latency samples kept for stats
+LATENCY_SAMPLES = 1000
+
+
+class EmailQueueFull(Exception):
+    """Raised when EMAIL_QUEUE_MAX_SIZE messages are already waiting."""
+
+
+class EmailJob:
+    """One queued message."""
+
+    __slots__ = ("email_type", "user_id", "to_email", "name", "mail", "attempts", "enqueued_at")
+
+    def __init__(self, email_type: str, user_id: str, to_email: str, name: str, mail):
+        self.email_type = email_type
+        self.user_id = user_id
+        self.to_email = to_email
+        self.name = name
+        self.mail = mail
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+
+def is_transient(exc: Exception) -> bool:
+    """Whether a failed send is worth retrying."""
+    if isinstance(exc, APIError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def retry_delay(attempts: int) -> float:
+    """Full-jitter exponential backoff after the given number of attempts."""
+    return random.uniform(0, min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)))
+
+
+def _percentiles(samples: deque) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+class EmailQueue:
+    """
+    Bounded queue of outgoing email with a pool of batching workers.
+
+    Args:
+        max_size: Messages held before enqueue() raises EmailQueueFull
+        workers: Concurrent batch sends
+    """
+
+    def __init__(self, max_size: int = EMAIL_QUEUE_MAX_SIZE, workers: int = EMAIL_WORKERS):
+        self.max_size = max_size
+        self.worker_count = workers
+        # Called with the jobs of a batch that were delivered or dropped for good
+        self.on_finished: Optional[Callable[[list["EmailJob"]], None]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._retries: set[asyncio.TimerHandle] = set()
+        self._in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        # Seconds per batch request, and from enqueue to delivery
+        self._send_latency: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._delivery_latency: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="email")
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self, drain_seconds: float = EMAIL_DRAIN_SECONDS):
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping email queue with {self._queue.qsize()} messages undelivered")
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._executor.shutdown(wait=False)
+
+    def enqueue(self, email_type: str, user_id: str, to_email: str, name: str) -> EmailJob:
+        """
+        Queue a message for background delivery.
+
+        Raises:
+            ValueError: If email is not configured for this type
+            EmailQueueFull: If the queue is at capacity
+        """
+        if self._queue is None:
+            raise RuntimeError("Email queue is not running")
+        # Build now so configuration errors surface to the caller, not a worker
+        mail = get_email_service().build(email_type, to_email, name)
+        job = EmailJob(email_type, user_id, to_email, name, mail)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise EmailQueueFull()
+        return job
+
+    async def _next_batch(self) -> list[EmailJob]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EMAIL_BATCH_WAIT_SECONDS
+        while len(batch) < EMAIL_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _work(self):
+        while True:
+            batch = await self._next_batch()
+            self._in_flight += len(batch)
+            try:
+                await self._send(batch)
+            except Exception as exc:
+                logger.exception(f"Email worker failed on a batch of {len(batch)}: {exc}")
+            finally:
+                self._in_flight -= len(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send(self, batch: list[EmailJob]):
+        service = get_email_service()
+        loop = asyncio.get_running_loop()
+        for job in batch:
+            job.attempts += 1
+
+        started = time.monotonic()
+        try:
+            responses = await loop.run_in_executor(
+                self._executor, service.send_batch, [job.mail for job in batch]
+            )
+        except Exception as exc:
+            transient = is_transient(exc)
+            finished = []
+            for job in batch:
+                if transient and job.attempts < EMAIL_MAX_ATTEMPTS:
+                    self._schedule_retry(job)
+                else:
+                    self.failed += 1
+                    finished.append(job)
+                    logger.error(
+                        f"Dropping {job.email_type} email to {job.to_email} after {job.attempts} attempt(s): {exc}"
+                    )
+            self._finish(finished)
+            return
+
+        finished = time.monotonic()
+        self.batches += 1
+        self._send_latency.append(finished - started)
+        for job, response in zip(batch, responses):
+            if response.get("success"):
+                self.sent += 1
+                self._delivery_latency.append(finished - job.enqueued_at)
+            else:
+                self.failed += 1
+                logger.error(f"Mailtrap rejected {job.email_type} email to {job.to_email}: {response.get('errors')}")
+        self._finish(batch)
+
+    def _finish(self, jobs: list[EmailJob]):
+        if jobs and self.on_finished is not None:
+            try:
+                self.on_finished(jobs)
+            except Exception as exc:
+                logger.exception(f"Email on_finished hook failed: {exc}")
+
+    def _schedule_retry(self, job: EmailJob):
+        self.retried += 1
+        delay = retry_delay(job.attempts)
+        loop = asyncio.get_running_loop()
+
+        def requeue():
+            self._retries.discard(handle)
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.failed += 1
+                logger.error(f"Dropping {job.email_type} email to {job.to_email}: queue full on retry")
+                self._finish([job])
+
+        handle = loop.call_later(delay, requeue)
+        self._retries.add(handle)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "in_flight": self._in_flight,
+            "waiting_retry": len(self._retries),
+            "workers": len(self._workers),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "batches": self.batches,
+            "send_latency": _percentiles(self._send_latency),
+            "delivery_latency": _percentiles(self._delivery_latency),
+        }
+
+
+email_queue = EmailQueue()
@@ -0,0 +1,111 @@
+"""
+Per-key cache of serialized JSON responses with strong ETags.
+
+A cached entry holds the rendered body and its ETag, so a repeat request
+costs neither a database query nor serialization, and a request whose
+If-None-Match matches gets an empty 304. Entries are per worker; callers
+invalidate them on writes, and the TTL bounds staleness from writes made
+by other workers or outside the API. Negative answers ("not found yet")
+get their own, shorter TTL, since the write that changes them is usually
+handled by another worker.
+"""
+
+import hashlib
+from typing import Awaitable, Callable, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from utils.cache import TTLCache, SingleFlight
+
+
+class CachedResponse:
+    """Rendered JSON body, its status code and ETag."""
+
+    __slots__ = ("status_code", "body", "etag")
+
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers the given ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ETagCache:
+    """
+    Cache of JSON responses keyed by (owner, view).
+
+    Args:
+        maxsize: Maximum number of cached responses
+        ttl: Seconds a response may be served without reloading
+        negative_ttl: Seconds for negative responses; 0 doesn't cache them
+        is_negative: Whether a loaded (status_code, payload) is negative;
+            by default any status other than 200
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float = 0,
+        is_negative: Optional[Callable[[int, object], bool]] = None,
+    ):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loads = SingleFlight()
+        self.negative_ttl = negative_ttl
+        self._is_negative = is_negative or (lambda status_code, payload: status_code != 200)
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        load: Callable[[], Awaitable[tuple[int, object]]],
+    ) -> Response:
+        """
+        Serve the cached response for key, loading it on a miss.
+
+        ``load`` returns ``(status_code, payload)``; the payload is rendered
+        exactly as FastAPI would render it.
+        """
+        cached = await self.get(key, load)
+        headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+        if cached.status_code == 200 and etag_matches(request, cached.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=cached.body,
+            status_code=cached.status_code,
+            media_type="application/json",
+            headers=headers,
+        )
+
+    async def get(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[tuple[int, object]]],
+    ) -> CachedResponse:
+        """The cached response for key, loading it on a miss."""
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = await self._loads.run(key, lambda: self._load(key, load))
+        return cached
+
+    async def _load(self, key: Hashable, load) -> CachedResponse:
+        status_code, payload = await load()
+        cached = CachedResponse(status_code, JSONResponse(payload).body)
+        self._cache.set(key, cached, self.negative_ttl if self._is_negative(status_code, payload) else None)
+        return cached
+
+    def invalidate(self, owner: Hashable, views: Iterable[Hashable]):
+        for view in views:
+            self._cache.pop((owner, view))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
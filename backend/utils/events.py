@@ -0,0 +1,186 @@
+"""
+In-process pub/sub for the admin live feed.
+
+Write endpoints publish small events (ids and what changed, not full rows);
+each Server-Sent Events connection subscribes with its own bounded buffer.
+Publishing never waits on a subscriber: when a slow client's buffer is
+full its oldest event is dropped and the client is told to resync, i.e.
+to catch up through the changes-since endpoint instead.
+
+Events are per worker, so with several workers a subscriber only sees
+writes handled by its own worker; clients should keep polling the
+changes-since endpoint as a backstop.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "100"))
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "256"))
+EVENT_MAX_SUBSCRIBERS = int(os.getenv("EVENT_MAX_SUBSCRIBERS", "500"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+RESYNC_EVENT = "resync"
+
+
+class Event:
+    """A published event, pre-rendered as an SSE frame."""
+
+    __slots__ = ("id", "type", "frame")
+
+    def __init__(self, epoch: str, event_id: int, event_type: str, data: dict):
+        self.id = event_id
+        self.type = event_type
+        payload = json.dumps(data, separators=(",", ":"), default=str)
+        self.frame = f"id: {epoch}-{event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode()
+
+
+class Subscriber:
+    """One connection's bounded event buffer."""
+
+    __slots__ = ("queue", "wakeup", "overflowed", "dropped")
+
+    def __init__(self, buffer_size: int):
+        self.queue = deque(maxlen=buffer_size)
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+        self.dropped = 0
+
+    def push(self, event: Event):
+        if len(self.queue) == self.queue.maxlen:
+            self.overflowed = True
+            self.dropped += 1
+        self.queue.append(event)
+        self.wakeup.set()
+
+
+class TooManySubscribers(Exception):
+    """Raised when a worker already has EVENT_MAX_SUBSCRIBERS connections."""
+
+
+class EventBroker:
+    """
+    Fan-out of published events to subscribers.
+
+    Args:
+        buffer_size: Events buffered per subscriber before dropping the oldest
+        replay_size: Recent events kept for clients reconnecting with Last-Event-ID
+        max_subscribers: Connection limit per worker
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = EVENT_BUFFER_SIZE,
+        replay_size: int = EVENT_REPLAY_SIZE,
+        max_subscribers: int = EVENT_MAX_SUBSCRIBERS,
+    ):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscriber] = set()
+        self._recent: deque[Event] = deque(maxlen=replay_size)
+        self._next_id = 1
+        # Event ids are "<epoch>-<n>"; the epoch tells a reconnecting client's
+        # Last-Event-ID apart from one issued by another worker or process
+        self._epoch = uuid.uuid4().hex[:8]
+
+    def publish(self, event_type: str, data: dict):
+        """Send an event to every subscriber without waiting on any of them."""
+        event = Event(self._epoch, self._next_id, event_type, {**data, "at": time.time()})
+        self._next_id += 1
+        self._recent.append(event)
+        for subscriber in self._subscribers:
+            subscriber.push(event)
+
+    def accepting(self) -> bool:
+        return len(self._subscribers) < self.max_subscribers
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """
+        Register a subscriber, replaying events after last_event_id if they
+        are still held; otherwise the subscriber starts with a resync.
+        """
+        if not self.accepting():
+            raise TooManySubscribers()
+
+        subscriber = Subscriber(self.buffer_size)
+        if last_event_id is not None:
+            after = self._parse_event_id(last_event_id)
+            oldest = self._recent[0].id if self._recent else self._next_id
+            if after is not None and oldest <= after + 1 <= self._next_id:
+                for event in self._recent:
+                    if event.id > after:
+                        subscriber.push(event)
+            else:
+                subscriber.overflowed = True
+                subscriber.wakeup.set()
+
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def _parse_event_id(self, event_id: str) -> Optional[int]:
+        epoch, _, number = event_id.partition("-")
+        if epoch != self._epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def stream(
+        self,
+        last_event_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Subscribe and yield SSE frames, with heartbeats while idle.
+
+        Subscribing happens on the first iteration, so a response that is
+        never started never holds a subscription.
+
+        Args:
+            last_event_id: Last-Event-ID header of a reconnecting client
+            deadline: Epoch seconds at which to end the stream (e.g. token expiry)
+        """
+        try:
+            subscriber = self.subscribe(last_event_id)
+        except TooManySubscribers:
+            return
+
+        try:
+            # Tell the client how long to wait before reconnecting
+            yield b"retry: 3000\n\n"
+            while deadline is None or time.time() < deadline:
+                timeout = SSE_HEARTBEAT_SECONDS
+                if deadline is not None:
+                    timeout = min(timeout, max(0.0, deadline - time.time()))
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+
+                subscriber.wakeup.clear()
+                # Publishes can land while a frame is being sent, so re-check for overflow
+                while subscriber.queue and not subscriber.overflowed:
+                    yield subscriber.queue.popleft().frame
+
+                if subscriber.overflowed:
+                    if subscriber.dropped:
+                        logger.info("Live feed subscriber fell behind, %d events dropped", subscriber.dropped)
+                        subscriber.dropped = 0
+                    subscriber.overflowed = False
+                    subscriber.queue.clear()
+                    yield f"event: {RESYNC_EVENT}\ndata: {{}}\n\n".encode()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+broker = EventBroker()
@@ -0,0 +1,80 @@
+"""
+Streaming CSV / NDJSON encoders for admin exports.
+
+Rows arrive one page at a time from utils.pagination.iter_pages and are
+encoded page by page, so an export holds at most one page in memory no
+matter how large the table is.
+"""
+
+import io
+import csv
+import json
+from typing import AsyncIterator, Optional, Sequence
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Spreadsheet apps treat cells starting with these as formulas
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, separators=(",", ":"))
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def encode_csv(
+    pages: AsyncIterator[list],
+    columns: Optional[Sequence[str]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Encode pages of rows as CSV, header first.
+
+    Args:
+        pages: Async iterator of row lists
+        columns: Columns to write, in order; taken from the first row if None
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+
+    async for rows in pages:
+        if not header_written:
+            if columns is None:
+                if not rows:
+                    continue
+                columns = list(rows[0].keys())
+            writer.writerow(columns)
+            header_written = True
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+async def encode_ndjson(
+    pages: AsyncIterator[list],
+    columns: Optional[Sequence[str]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Encode pages of rows as newline-delimited JSON.
+
+    Args:
+        pages: Async iterator of row lists
+        columns: Keys to keep in each object; all keys if None
+    """
+    async for rows in pages:
+        if columns is not None:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        if rows:
+            yield "".join(
+                json.dumps(row, separators=(",", ":"), default=str) + "\n" for row in rows
+            ).encode()
@@ -0,0 +1,138 @@
+"""
+Hacker code allocation.
+
+Hacker codes are 5 characters from A-Z0-9 (36**5 = 60,466,176 codes). Each
+code is a keyed permutation of a counter value, so codes are unique by
+construction and look random, and allocating one never queries the
+registrations table. The unique index on registrations.hacker_code remains
+the backstop (e.g. if HACKER_CODE_KEY is changed after codes were issued).
+
+Counter values are leased from Postgres in blocks through the
+``reserve_hacker_code_block`` RPC, so workers never hand out the same value
+and the database is touched once per HACKER_CODE_BLOCK_SIZE codes.
+
+Set HACKER_CODE_KEY to a stable secret shared by all workers; it defaults
+to a key derived from SUPABASE_KEY.
+"""
+
+import os
+import hmac
+import asyncio
+import hashlib
+import logging
+import string
+from typing import Awaitable, Callable
+from utils.database import get_admin_client, execute
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 5
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+HACKER_CODE_BLOCK_SIZE = int(os.getenv("HACKER_CODE_BLOCK_SIZE", "100"))
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection on ``range(domain)``.
+
+    A balanced Feistel network permutes the smallest even-bit-width space
+    covering the domain; values that land outside the domain are re-encrypted
+    (cycle walking) until they fall inside it, which keeps the mapping a
+    bijection on the domain itself.
+    """
+
+    def __init__(self, key: bytes, domain: int, rounds: int = 4):
+        self.domain = domain
+        self.rounds = rounds
+        half_bits = ((domain - 1).bit_length() + 1) // 2
+        self._half_bits = half_bits
+        self._half_mask = (1 << half_bits) - 1
+        self._round_keys = [
+            hmac.new(key, f"round-{i}".encode(), hashlib.sha256).digest()[:16]
+            for i in range(rounds)
+        ]
+
+    def _round(self, i: int, value: int) -> int:
+        digest = hashlib.blake2b(
+            value.to_bytes(8, "big"), key=self._round_keys[i], digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") & self._half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left = value >> self._half_bits
+        right = value & self._half_mask
+        for i in range(self.rounds):
+            left, right = right, left ^ self._round(i, right)
+        return (left << self._half_bits) | right
+
+    def permute(self, value: int) -> int:
+        if not 0 <= value < self.domain:
+            raise ValueError(f"value must be in [0, {self.domain})")
+        value = self._encrypt(value)
+        while value >= self.domain:
+            value = self._encrypt(value)
+        return value
+
+
+def encode_code(value: int) -> str:
+    """Render an integer in [0, CODE_SPACE) as a fixed-width code."""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+class HackerCodeAllocator:
+    """
+    Hands out codes from leased blocks of counter values.
+
+    Args:
+        permutation: Keyed permutation over CODE_SPACE
+        reserve_block: Coroutine returning the first counter value of a fresh block
+        block_size: Number of counter values per block
+    """
+
+    def __init__(
+        self,
+        permutation: FeistelPermutation,
+        reserve_block: Callable[[int], Awaitable[int]],
+        block_size: int = HACKER_CODE_BLOCK_SIZE,
+    ):
+        self.permutation = permutation
+        self.reserve_block = reserve_block
+        self.block_size = block_size
+        self.blocks_reserved = 0
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def next_code(self) -> str:
+        if self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    start = await self.reserve_block(self.block_size)
+                    self._next, self._end = start, start + self.block_size
+                    self.blocks_reserved += 1
+
+        value = self._next
+        self._next += 1
+        if value >= CODE_SPACE:
+            raise RuntimeError("Hacker code space exhausted")
+        return encode_code(self.permutation.permute(value))
+
+
+def _code_key() -> bytes:
+    secret = os.getenv("HACKER_CODE_KEY") or os.getenv("SUPABASE_KEY") or ""
+    return hashlib.sha256(f"hacker-code:{secret}".encode()).digest()
+
+
+async def _reserve_block_from_db(block_size: int) -> int:
+    client = await get_admin_client()
+    result = await execute(client.rpc("reserve_hacker_code_block", {"block_size": block_size}))
+    return int(result.data)
+
+
+allocator = HackerCodeAllocator(FeistelPermutation(_code_key(), CODE_SPACE), _reserve_block_from_db)
@@ -0,0 +1,85 @@
+"""
+Shared HTTP connection pool settings for Supabase clients.
+
+Every pooled client keeps connections alive between requests and speaks
+HTTP/2 when the ``h2`` package is installed. Pool sizes are tunable via:
+
+    SUPABASE_POOL_MAX_CONNECTIONS   (default 50)
+    SUPABASE_POOL_MAX_KEEPALIVE     (default 20)
+    SUPABASE_POOL_KEEPALIVE_EXPIRY  (seconds, default 30)
+    SUPABASE_HTTP_TIMEOUT           (seconds, default 30)
+    SUPABASE_HTTP2                  (set to "false" to force HTTP/1.1)
+"""
+
+import os
+import logging
+from typing import Type, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "50"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "30"))
+
+try:
+    import h2  # noqa: F401
+    _H2_INSTALLED = True
+except ImportError:
+    _H2_INSTALLED = False
+
+HTTP2_ENABLED = _H2_INSTALLED and os.getenv("SUPABASE_HTTP2", "true").strip().lower() != "false"
+
+ClientT = TypeVar("ClientT", httpx.Client, httpx.AsyncClient)
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def build_http_client(client_cls: Type[ClientT] = httpx.Client) -> ClientT:
+    """Create a keep-alive HTTP client using the shared pool settings."""
+    return client_cls(
+        http2=HTTP2_ENABLED,
+        limits=pool_limits(),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    )
+
+
+def client_stats(client) -> dict:
+    """
+    Describe the connection pool behind an httpx client.
+
+    Reads httpcore's pool through private attributes, so missing fields are
+    reported as None rather than failing if the internals change.
+    """
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", None) or [])
+
+    idle = 0
+    http2 = 0
+    for connection in connections:
+        try:
+            if connection.is_idle():
+                idle += 1
+            if "HTTP/2" in repr(connection):
+                http2 += 1
+        except Exception:
+            continue
+
+    return {
+        "closed": getattr(client, "is_closed", None),
+        "connections": len(connections) if pool is not None else None,
+        "active": len(connections) - idle if pool is not None else None,
+        "idle": idle if pool is not None else None,
+        "http2_connections": http2 if pool is not None else None,
+        "max_connections": POOL_MAX_CONNECTIONS,
+        "max_keepalive": POOL_MAX_KEEPALIVE,
+    }
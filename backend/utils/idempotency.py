@@ -0,0 +1,188 @@
+"""
+Idempotency-Key support for write endpoints.
+
+Routers created with ``APIRouter(route_class=IdempotentRoute)`` honour an
+``Idempotency-Key`` header on POST/PATCH/PUT requests. The first response
+for a key is stored (per worker, for IDEMPOTENCY_TTL_SECONDS) and replayed
+verbatim for retries; a retry that arrives while the original is still
+running waits for it instead of running the handler a second time.
+
+Keys are scoped to the authenticated user's id, method and path, so one
+user's key can never replay another user's response, and a user's
+refreshed token still finds the original. Requests without a valid token
+skip idempotency and get the endpoint's own 401. Reusing a key with a
+different request body (for uploads: different form fields or file
+contents) is rejected with 422. Server errors (5xx) and
+auth/rate-limit rejections are not stored, so those requests can be
+retried for real.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import UploadFile
+from utils.auth import get_optional_user
+from utils.cache import TTLCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+MAX_KEY_LENGTH = 255
+FILE_HASH_CHUNK_SIZE = 64 * 1024
+
+IDEMPOTENT_METHODS = {"POST", "PATCH", "PUT"}
+
+# Responses that say the request was never processed, so a retry should run it
+NON_REPLAYABLE_STATUSES = {401, 403, 408, 429}
+
+
+class StoredResponse:
+    """Status, headers and body of a response, kept for replay."""
+
+    __slots__ = ("status_code", "headers", "body", "fingerprint")
+
+    def __init__(self, status_code: int, headers: dict, body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        # SHA-256 of the request body that produced this response
+        self.fingerprint: Optional[bytes] = None
+
+    @classmethod
+    def from_response(cls, response: Response) -> Optional["StoredResponse"]:
+        body = getattr(response, "body", None)
+        if body is None:
+            return None  # streaming responses can't be replayed
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        return cls(response.status_code, headers, body)
+
+    @classmethod
+    def from_http_exception(cls, exc: HTTPException) -> "StoredResponse":
+        # Same shape as FastAPI's default HTTPException handler
+        return cls.from_response(JSONResponse({"detail": exc.detail}, exc.status_code, exc.headers))
+
+    def to_response(self, replayed: bool) -> Response:
+        response = Response(content=self.body, status_code=self.status_code, headers=self.headers)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+_responses = TTLCache(maxsize=IDEMPOTENCY_MAX_ENTRIES, ttl=IDEMPOTENCY_TTL_SECONDS)
+_in_flight = SingleFlight()
+
+
+def _scoped_key(request: Request, user_id: str, key: str) -> bytes:
+    scope = "\n".join([
+        user_id,
+        request.method,
+        request.url.path,
+        key,
+    ])
+    return hashlib.sha256(scope.encode()).digest()
+
+
+async def _fingerprint(request: Request) -> bytes:
+    """
+    SHA-256 identifying the request's content.
+
+    Multipart bodies are fingerprinted from their parsed fields, with each
+    file hashed chunk by chunk from Starlette's spooled copy: the raw body
+    differs between retries (the boundary is random) and an upload is
+    never held in memory as a whole. Starlette keeps the parsed form (and
+    any other body) on the request, so the handler doesn't read it again.
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        parts = []
+        for name, value in (await request.form()).multi_items():
+            if isinstance(value, UploadFile):
+                digest = hashlib.sha256()
+                while chunk := await value.read(FILE_HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                await value.seek(0)
+                parts.append([name, value.filename, digest.hexdigest()])
+            else:
+                parts.append([name, value])
+        return hashlib.sha256(json.dumps(parts).encode()).digest()
+    return hashlib.sha256(await request.body()).digest()
+
+
+class _Unreplayable(Exception):
+    """Carries a response that cannot be stored back to the original caller."""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+async def _run_once(scoped_key: bytes, fingerprint: bytes, handler: Callable, request: Request) -> StoredResponse:
+    try:
+        response = await handler(request)
+    except HTTPException as exc:
+        if exc.status_code >= 500 or exc.status_code in NON_REPLAYABLE_STATUSES:
+            raise
+        stored = StoredResponse.from_http_exception(exc)
+    else:
+        stored = StoredResponse.from_response(response)
+        if stored is None:
+            raise _Unreplayable(response)
+
+    stored.fingerprint = fingerprint
+    if stored.status_code < 500 and stored.status_code not in NON_REPLAYABLE_STATUSES:
+        _responses.set(scoped_key, stored)
+    return stored
+
+
+class IdempotentRoute(APIRoute):
+    """APIRoute that de-duplicates retried writes carrying an Idempotency-Key."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key or request.method not in IDEMPOTENT_METHODS:
+                return await handler(request)
+
+            if len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+            user = await get_optional_user(request)
+            if user is None:
+                return await handler(request)
+
+            scoped_key = _scoped_key(request, str(user.id), key)
+            fingerprint = await _fingerprint(request)
+            stored = _responses.get(scoped_key)
+            ran_here = False
+            if stored is None:
+                async def run():
+                    nonlocal ran_here
+                    ran_here = True
+                    return await _run_once(scoped_key, fingerprint, handler, request)
+
+                try:
+                    stored = await _in_flight.run(scoped_key, run)
+                except _Unreplayable as exc:
+                    return exc.response
+
+            if stored.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{IDEMPOTENCY_HEADER} was already used with a different request body",
+                )
+            return stored.to_response(replayed=not ran_here)
+
+        return idempotent_handler
+
+
+def idempotency_stats() -> dict:
+    """Stored response counters and how many retries waited on an in-flight request."""
+    return {**_responses.stats(), "collapsed_requests": _in_flight.collapsed}
@@ -0,0 +1,156 @@
+"""
+Keyset pagination and column projection for admin listings.
+
+Pages are ordered by ``created_at DESC, id DESC``. The cursor is an opaque,
+URL-safe token holding the (created_at, id) of the last row on the previous
+page, so fetching page N costs the same as page 1 and rows inserted while
+paging never shift later pages. Every page is at most MAX_PAGE_SIZE rows,
+which keeps responses under PostgREST's ``max_rows`` (1000) instead of
+being silently truncated by it.
+"""
+
+import re
+import json
+import base64
+from typing import AsyncIterator, Callable, Optional, Sequence
+
+from fastapi import HTTPException
+from utils.database import execute
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Columns every page needs to build its cursor
+KEY_COLUMNS = ("created_at", "id")
+
+# Postgres error codes PostgREST passes through for bad selects/filters
+UNDEFINED_COLUMN = "42703"
+INVALID_TEXT_REPRESENTATION = "22P02"
+
+_COLUMN_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+# Token values are interpolated into PostgREST filters, so only plain ones are accepted
+_TOKEN_VALUE_RE = re.compile(r"^[0-9A-Za-z_:.+\- ]+$")
+
+
+def encode_token(*values: str) -> str:
+    """Pack plain string values into an opaque URL-safe token."""
+    raw = json.dumps([str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str, what: str = "cursor") -> list[str]:
+    """Unpack a token from encode_token, or raise 400 if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid {what}")
+
+    if not (
+        isinstance(values, list) and values
+        and all(isinstance(value, str) and _TOKEN_VALUE_RE.match(value) for value in values)
+    ):
+        raise HTTPException(status_code=400, detail=f"Invalid {what}")
+    return values
+
+
+def encode_cursor(row: dict) -> str:
+    """Cursor pointing just past the given row."""
+    return encode_token(row["created_at"], row["id"])
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Return (created_at, id) from a cursor, or raise 400 if it is malformed."""
+    values = decode_token(cursor)
+    if len(values) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values[0], values[1]
+
+
+def parse_field_names(fields: Optional[str]) -> list[str]:
+    """
+    Split a comma-separated ``fields`` parameter into column names.
+
+    Names must be plain identifiers; a column that does not exist is
+    reported by PostgREST (see UNDEFINED_COLUMN). Duplicates are dropped.
+    """
+    columns = []
+    for name in (part.strip() for part in (fields or "").split(",")):
+        if not name:
+            continue
+        if not _COLUMN_RE.match(name):
+            raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def parse_fields(fields: Optional[str], keys: Sequence[str] = KEY_COLUMNS) -> str:
+    """
+    Turn a comma-separated ``fields`` parameter into a select clause.
+
+    Returns ``*`` when no fields are given. The ``keys`` columns are always
+    included so the caller can build the next cursor.
+    """
+    columns = parse_field_names(fields)
+    if not columns:
+        return "*"
+    return ",".join(columns + [key for key in keys if key not in columns])
+
+
+def after_cursor(query, cursor: Optional[str]):
+    """Restrict a query to rows that sort after the cursor."""
+    if not cursor:
+        return query
+    created_at, row_id = decode_cursor(cursor)
+    return query.or_(
+        f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{row_id})"
+    )
+
+
+async def fetch_page(query, cursor: Optional[str], limit: int) -> tuple[list, Optional[str]]:
+    """
+    Run a select query as one keyset page.
+
+    Args:
+        query: PostgREST select builder (filters applied, no order/limit)
+        cursor: Cursor from the previous page, or None for the first page
+        limit: Page size, at most MAX_PAGE_SIZE
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = (
+        after_cursor(query, cursor)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)  # one extra row tells us whether another page exists
+    )
+    result = await execute(query)
+    rows = result.data or []
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+async def iter_pages(
+    make_query: Callable[[], object],
+    limit: int = MAX_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> AsyncIterator[list]:
+    """
+    Yield every page of a query in keyset order.
+
+    Args:
+        make_query: Returns a fresh select builder (builders are single use)
+        limit: Rows per page
+        cursor: Start after this cursor instead of at the newest row
+    """
+    while True:
+        rows, cursor = await fetch_page(make_query(), cursor, limit)
+        yield rows
+        if cursor is None:
+            return
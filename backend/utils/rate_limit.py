@@ -2,19 +2,33 @@
 Rate limiting utility for API endpoints.
 
 Provides configurable rate limiting with different tiers for different endpoint types.
-In production, consider replacing in-memory store with Redis for distributed rate limiting.
+
+Limits are sliding-window counters kept by the backend named in
+RATE_LIMIT_BACKEND (see utils/rate_limit_backends.py): ``memory`` (per
+worker, the default), ``mmap`` (shared by the workers on one host) or
+``redis`` (shared across hosts). If the backend fails, requests are let
+through rather than rejected.
+
+Route limits are applied by RateLimitMiddleware before the request body
+is parsed or the caller authenticated; mark an endpoint with
+``rate_limited(rule)`` to cover it. rate_limit_by_user() remains for
+limits that need the endpoint's own context, such as the authenticated
+user.
 """
 
+import os
 import time
 import logging
-from collections import defaultdict
-from functools import wraps
+from typing import Callable, Optional
 from fastapi import HTTPException, Request
+from utils.rate_limit_backends import RateLimitBackend, RateLimitDecision, create_backend
 
 logger = logging.getLogger(__name__)
 
-# In-memory rate limit stores (keyed by limiter name)
-_rate_limit_stores: dict[str, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+
+# Backend failures are logged at most this often
+BACKEND_ERROR_LOG_INTERVAL_SECONDS = 60
 
 
 class RateLimitConfig:
@@ -37,6 +51,37 @@ class RateLimitConfig:
     EMAIL_MAX = 5  # 5 emails per 5 minutes per user
 
 
+_backend: Optional[RateLimitBackend] = None
+_backend_error_logged_at = 0.0
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """The configured backend, created on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(RATE_LIMIT_BACKEND)
+    return _backend
+
+
+async def close_rate_limit_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+def rate_limit_headers(decision: RateLimitDecision) -> dict[str, str]:
+    """RateLimit-* response headers (IETF draft), plus Retry-After when denied."""
+    headers = {
+        "RateLimit-Limit": str(decision.limit),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(decision.retry_after),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(decision.retry_after)
+    return headers
+
+
 def get_client_ip(request: Request) -> str:
     """Extract client IP, handling proxies"""
     forwarded = request.headers.get("x-forwarded-for")
@@ -45,7 +90,25 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-def check_rate_limit(
+async def hit_rate_limit(
+    key: str,
+    store_name: str,
+    window_seconds: int,
+    max_requests: int
+) -> RateLimitDecision:
+    """Count a request against a store and return the full decision (allowed if the backend fails)."""
+    global _backend_error_logged_at
+    try:
+        return await get_rate_limit_backend().hit(store_name, key, window_seconds, max_requests)
+    except Exception as exc:
+        now = time.monotonic()
+        if now - _backend_error_logged_at >= BACKEND_ERROR_LOG_INTERVAL_SECONDS:
+            _backend_error_logged_at = now
+            logger.warning(f"Rate limit backend {RATE_LIMIT_BACKEND} failed, allowing requests: {exc!r}")
+        return RateLimitDecision(True, max_requests, max_requests, window_seconds)
+
+
+async def check_rate_limit(
     key: str,
     store_name: str,
     window_seconds: int,
@@ -63,43 +126,10 @@ def check_rate_limit(
     Returns:
         True if request is allowed, False if rate limited
     """
-    now = time.time()
-    store = _rate_limit_stores[store_name]
-
-    # Clean old entries
-    store[key] = [t for t in store[key] if now - t < window_seconds]
-
-    # Check limit
-    if len(store[key]) >= max_requests:
-        return False
-
-    # Record this request
-    store[key].append(now)
-    return True
-
-
-def rate_limit_by_ip(
-    store_name: str,
-    window_seconds: int = RateLimitConfig.STANDARD_WINDOW,
-    max_requests: int = RateLimitConfig.STANDARD_MAX,
-    error_message: str = "Too many requests. Please try again later."
-):
-    """
-    Decorator/dependency for rate limiting by IP address.
-
-    Usage as a function call in endpoint:
-        rate_limit_by_ip("admin", 60, 30)(request)
-    """
-    def check(request: Request):
-        client_ip = get_client_ip(request)
-        if not check_rate_limit(client_ip, store_name, window_seconds, max_requests):
-            logger.warning(f"Rate limit exceeded for IP {client_ip} on {store_name}")
-            raise HTTPException(status_code=429, detail=error_message)
-        return client_ip
-    return check
+    return (await hit_rate_limit(key, store_name, window_seconds, max_requests)).allowed
 
 
-def rate_limit_by_user(
+async def rate_limit_by_user(
     user_id: str,
     store_name: str,
     window_seconds: int = RateLimitConfig.EMAIL_WINDOW,
@@ -119,37 +149,71 @@ def rate_limit_by_user(
     Raises:
         HTTPException with 429 status if rate limited
     """
-    if not check_rate_limit(user_id, store_name, window_seconds, max_requests):
+    decision = await hit_rate_limit(user_id, store_name, window_seconds, max_requests)
+    if not decision.allowed:
         logger.warning(f"Rate limit exceeded for user {user_id} on {store_name}")
-        raise HTTPException(status_code=429, detail=error_message)
-
-
-# Pre-configured rate limiters for common use cases
-def strict_rate_limit(request: Request) -> str:
-    """Strict rate limiting for sensitive operations (5/min by IP)"""
-    return rate_limit_by_ip(
-        "strict",
-        RateLimitConfig.STRICT_WINDOW,
-        RateLimitConfig.STRICT_MAX,
-        "Too many attempts. Please wait a minute before trying again."
-    )(request)
-
-
-def admin_rate_limit(request: Request) -> str:
-    """Rate limiting for admin endpoints (30/min by IP)"""
-    return rate_limit_by_ip(
-        "admin",
-        RateLimitConfig.ADMIN_WINDOW,
-        RateLimitConfig.ADMIN_MAX,
-        "Too many admin requests. Please slow down."
-    )(request)
-
-
-def standard_rate_limit(request: Request) -> str:
-    """Standard rate limiting for authenticated operations (10/min by IP)"""
-    return rate_limit_by_ip(
-        "standard",
-        RateLimitConfig.STANDARD_WINDOW,
-        RateLimitConfig.STANDARD_MAX,
-        "Too many requests. Please try again later."
-    )(request)
+        raise HTTPException(
+            status_code=429,
+            detail=error_message,
+            headers=rate_limit_headers(decision),
+        )
+
+
+# Limits applied by RateLimitMiddleware (utils/rate_limit_middleware.py)
+class RateLimitRule:
+    """
+    A limit for the routes marked with rate_limited().
+
+    Each route counts separately, per token subject when the request
+    carries a verifiable bearer token and per client IP otherwise.
+    """
+
+    __slots__ = ("store_name", "window_seconds", "max_requests", "error_message")
+
+    def __init__(self, store_name: str, window_seconds: int, max_requests: int, error_message: str):
+        self.store_name = store_name
+        self.window_seconds = window_seconds
+        self.max_requests = max_requests
+        self.error_message = error_message
+
+
+# Sensitive operations (signup, email verification): 5/min
+STRICT_LIMIT = RateLimitRule(
+    "strict",
+    RateLimitConfig.STRICT_WINDOW,
+    RateLimitConfig.STRICT_MAX,
+    "Too many attempts. Please wait a minute before trying again.",
+)
+
+# Authenticated operations (registration, file uploads): 10/min
+STANDARD_LIMIT = RateLimitRule(
+    "standard",
+    RateLimitConfig.STANDARD_WINDOW,
+    RateLimitConfig.STANDARD_MAX,
+    "Too many requests. Please try again later.",
+)
+
+# Admin endpoints: 30/min
+ADMIN_LIMIT = RateLimitRule(
+    "admin",
+    RateLimitConfig.ADMIN_WINDOW,
+    RateLimitConfig.ADMIN_MAX,
+    "Too many admin requests. Please slow down.",
+)
+
+# Endpoint function -> rule, filled in by rate_limited()
+route_limits: dict[Callable, RateLimitRule] = {}
+
+
+def rate_limited(rule: RateLimitRule):
+    """
+    Mark an endpoint for RateLimitMiddleware. Goes below the route decorator:
+
+        @router.post("/register")
+        @rate_limited(STANDARD_LIMIT)
+        async def register(...):
+    """
+    def mark(endpoint: Callable) -> Callable:
+        route_limits[endpoint] = rule
+        return endpoint
+    return mark
@@ -0,0 +1,523 @@
+"""
+Storage backends for the rate limiter.
+
+Every backend implements the same sliding-window counter: per key it
+keeps the request count of the current and the previous fixed window and
+weights the previous one by how much of it still overlaps the sliding
+window. That is O(1) time and space per key, unlike keeping every request
+timestamp. Only where the two counts live differs:
+
+- ``memory``: a dict per worker. Limits are per process, so with N
+  workers they are effectively N times looser.
+- ``mmap``: a fixed table of slots in a shared file (``/dev/shm`` by
+  default), so every worker on one host shares the counts. Slots are
+  grouped in stripes, each guarded by an fcntl byte-range lock.
+- ``redis``: counts live in Redis (or anything speaking RESP), and each
+  check is one EVALSHA of a small Lua script that reads both counts and
+  counts the request only if it is allowed, so limits hold across hosts
+  with one round trip per check.
+"""
+
+import os
+import mmap
+import time
+import fcntl
+import math
+import struct
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_MMAP_PATH = os.getenv(
+    "RATE_LIMIT_MMAP_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "hackthebias-rate-limit"),
+)
+RATE_LIMIT_MMAP_SLOTS = int(os.getenv("RATE_LIMIT_MMAP_SLOTS", "65536"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.25"))
+
+# Expired keys removed per new key; keeps eviction O(1) amortized
+EVICTIONS_PER_CHECK = 2
+
+
+class RateLimitDecision:
+    """Outcome of one rate limit check."""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        # Seconds until a request would be allowed (if denied) or the window rolls over
+        self.reset_after = reset_after
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.reset_after))
+
+
+def sliding_window_decision(
+    previous: int,
+    current: int,
+    elapsed: float,
+    window_seconds: float,
+    max_requests: int,
+) -> tuple[RateLimitDecision, int]:
+    """
+    Decide one request from the two window counts.
+
+    Args:
+        previous: Requests counted in the previous window
+        current: Requests counted so far in the current window
+        elapsed: Seconds since the current window started
+        window_seconds: Window length
+        max_requests: Requests allowed per sliding window
+
+    Returns:
+        (decision, new current count)
+    """
+    weight = 1.0 - elapsed / window_seconds
+    estimated = previous * weight + current
+
+    if estimated < max_requests:
+        current += 1
+        remaining = max(0, math.floor(max_requests - estimated - 1))
+        return RateLimitDecision(True, max_requests, remaining, window_seconds - elapsed), current
+
+    # Time until the estimate drops below the limit again
+    if current < max_requests:
+        wait = window_seconds * (1.0 - (max_requests - current) / previous) - elapsed
+    else:
+        wait = (window_seconds - elapsed) + window_seconds * (1.0 - max_requests / current)
+    return RateLimitDecision(False, max_requests, 0, max(wait, 0.0)), current
+
+
+class SlidingWindowCounter:
+    """
+    In-process sliding-window limiter for one store.
+
+    Keys live in an OrderedDict in last-seen order, so idle keys are
+    evicted from the front as they expire.
+
+    Args:
+        window_seconds: Sliding window length
+        max_requests: Requests allowed per window
+        max_keys: Most keys held; the least recently seen is evicted beyond it
+    """
+
+    __slots__ = ("window_seconds", "max_requests", "max_keys", "_entries")
+
+    def __init__(self, window_seconds: float, max_requests: int, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.window_seconds = window_seconds
+        self.max_requests = max_requests
+        self.max_keys = max_keys
+        # key -> [window index, previous count, current count], oldest first
+        self._entries: OrderedDict[str, list] = OrderedDict()
+
+    def hit(self, key: str, now: Optional[float] = None) -> RateLimitDecision:
+        now = time.time() if now is None else now
+        window = int(now // self.window_seconds)
+        entries = self._entries
+
+        entry = entries.get(key)
+        if entry is None:
+            # Only new keys grow the store, so that's when room is made
+            self._evict(window)
+            entry = entries[key] = [window, 0, 0]
+        else:
+            entries.move_to_end(key)
+            if entry[0] != window:
+                # Roll forward; counts more than one window old no longer matter
+                entry[1] = entry[2] if entry[0] == window - 1 else 0
+                entry[2] = 0
+                entry[0] = window
+
+        decision, entry[2] = sliding_window_decision(
+            entry[1], entry[2], now - window * self.window_seconds,
+            self.window_seconds, self.max_requests,
+        )
+        return decision
+
+    def _evict(self, window: int):
+        entries = self._entries
+        # Least recently seen keys are at the front; drop a few that have fully expired
+        for _ in range(EVICTIONS_PER_CHECK):
+            if not entries:
+                return
+            oldest_key = next(iter(entries))
+            if entries[oldest_key][0] >= window - 1:
+                break
+            del entries[oldest_key]
+        if len(entries) >= self.max_keys:
+            entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RateLimitBackend:
+    """Where the counts live. Subclasses implement hit() and, if needed, close()."""
+
+    name = "base"
+
+    async def hit(self, store_name: str, key: str, window_seconds: int, max_requests: int) -> RateLimitDecision:
+        """Count one request for key in store_name and decide it."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    """Per-process counts; one SlidingWindowCounter per store."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._stores: dict[str, SlidingWindowCounter] = {}
+
+    async def hit(self, store_name: str, key: str, window_seconds: int, max_requests: int) -> RateLimitDecision:
+        store = self._stores.get(store_name)
+        if store is None:
+            store = self._stores[store_name] = SlidingWindowCounter(window_seconds, max_requests, self.max_keys)
+        return store.hit(key)
+
+
+class MmapBackend(RateLimitBackend):
+    """
+    Counts shared by every process on the host through a memory-mapped file.
+
+    The file is a fixed table of slots (key hash, window index, expiry,
+    previous count, current count). A key hashes to one stripe of
+    STRIPE_SLOTS slots and probes up to PROBES of them; when none is free
+    or expired, the slot closest to expiry is taken over. A hash collision
+    between two keys makes them share a count, which with 64-bit hashes is
+    negligible.
+
+    Args:
+        path: Shared file; every worker must use the same path and slot count
+        slots: Table size, rounded up to whole stripes
+    """
+
+    name = "mmap"
+
+    # hash, window index, expires at (ms), previous count, current count
+    SLOT = struct.Struct("<QqqII")
+    STRIPE_SLOTS = 64
+    PROBES = 8
+
+    def __init__(self, path: str = RATE_LIMIT_MMAP_PATH, slots: int = RATE_LIMIT_MMAP_SLOTS):
+        self.path = path
+        self.stripes = max(1, -(-slots // self.STRIPE_SLOTS))
+        self._stripe_bytes = self.STRIPE_SLOTS * self.SLOT.size
+        size = self.stripes * self._stripe_bytes
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # New pages read as zeros, i.e. empty slots, so concurrent creators agree
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        except Exception:
+            os.close(self._fd)
+            raise
+        # fcntl locks are per process; this serializes threads within one
+        self._lock = threading.Lock()
+
+    def _hash(self, store_name: str, key: str) -> int:
+        digest = hashlib.blake2b(f"{store_name}\0{key}".encode(), digest_size=8).digest()
+        # Zero marks an empty slot
+        return int.from_bytes(digest, "little") or 1
+
+    async def hit(self, store_name: str, key: str, window_seconds: int, max_requests: int) -> RateLimitDecision:
+        # Never awaits: the critical section is a few microseconds under a stripe lock
+        return self.hit_now(store_name, key, window_seconds, max_requests)
+
+    def hit_now(
+        self,
+        store_name: str,
+        key: str,
+        window_seconds: int,
+        max_requests: int,
+        now: Optional[float] = None,
+    ) -> RateLimitDecision:
+        now = time.time() if now is None else now
+        window = int(now // window_seconds)
+        now_ms = int(now * 1000)
+        key_hash = self._hash(store_name, key)
+        stripe, start = divmod(key_hash % (self.stripes * self.STRIPE_SLOTS), self.STRIPE_SLOTS)
+        stripe_offset = stripe * self._stripe_bytes
+        slot_struct, view = self.SLOT, self._map
+
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._stripe_bytes, stripe_offset)
+            try:
+                offset = previous = current = None
+                victim = victim_expiry = None
+                for probe in range(self.PROBES):
+                    slot_offset = stripe_offset + ((start + probe) % self.STRIPE_SLOTS) * slot_struct.size
+                    slot_hash, slot_window, expires_at, slot_previous, slot_current = slot_struct.unpack_from(
+                        view, slot_offset
+                    )
+                    if slot_hash == key_hash and expires_at > now_ms:
+                        offset = slot_offset
+                        # Roll forward; counts more than one window old no longer matter
+                        if slot_window == window:
+                            previous, current = slot_previous, slot_current
+                        else:
+                            previous, current = (slot_current if slot_window == window - 1 else 0), 0
+                        break
+                    if victim is None or expires_at < victim_expiry:
+                        victim, victim_expiry = slot_offset, expires_at
+                if offset is None:
+                    # Free, expired, or failing those the slot closest to expiry
+                    offset, previous, current = victim, 0, 0
+
+                decision, current = sliding_window_decision(
+                    previous, current, now - window * window_seconds, window_seconds, max_requests
+                )
+                # Counts are needed until the next window has fully passed
+                expires_at = (window + 2) * window_seconds * 1000
+                slot_struct.pack_into(view, offset, key_hash, window, expires_at, previous, current)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._stripe_bytes, stripe_offset)
+        return decision
+
+    async def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class RespError(Exception):
+    """An error reply from a RESP server."""
+
+
+def _encode_command(command: tuple) -> bytes:
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        # Returned rather than raised so an error inside an EXEC array doesn't desync the stream
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        return None if length < 0 else (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(body)
+        return None if length < 0 else [await _read_reply(reader) for _ in range(length)]
+    raise RespError(f"Unexpected reply type {kind!r}")
+
+
+class RespConnection:
+    """
+    Minimal pipelined RESP client on one connection.
+
+    Commands are written as soon as they are issued, without waiting for
+    earlier replies; a reader task resolves replies in order.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._pending: deque[asyncio.Future] = deque()
+        self.closed = False
+        self._reader_task = asyncio.create_task(self._read_replies())
+
+    @classmethod
+    async def open(cls, url: str, timeout: float) -> "RespConnection":
+        parts = urlsplit(url)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname or "localhost", parts.port or 6379), timeout
+        )
+        connection = cls(reader, writer)
+        setup = []
+        if parts.password:
+            user = unquote(parts.username) if parts.username else None
+            setup.append(("AUTH", user, unquote(parts.password)) if user else ("AUTH", unquote(parts.password)))
+        database = parts.path.lstrip("/")
+        if database and database != "0":
+            setup.append(("SELECT", database))
+        if setup:
+            try:
+                await asyncio.wait_for(connection.execute(*setup), timeout)
+            except BaseException:
+                connection.close()
+                raise
+        return connection
+
+    def execute(self, *commands: tuple) -> "asyncio.Future[list]":
+        """Send commands in one write; the result resolves to their replies."""
+        if self.closed:
+            raise ConnectionError("RESP connection is closed")
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in commands]
+        self._pending.extend(futures)
+        self._writer.write(b"".join(_encode_command(command) for command in commands))
+        return asyncio.gather(*futures)
+
+    async def _read_replies(self):
+        try:
+            while True:
+                reply = await _read_reply(self._reader)
+                future = self._pending.popleft()
+                # Callers that timed out have cancelled theirs
+                if future.done():
+                    continue
+                if isinstance(reply, RespError):
+                    future.set_exception(reply)
+                else:
+                    future.set_result(reply)
+        except asyncio.CancelledError:
+            self._fail(ConnectionError("RESP connection is closed"))
+            raise
+        except Exception as exc:
+            self._fail(exc if isinstance(exc, ConnectionError) else ConnectionError(str(exc) or repr(exc)))
+
+    def _fail(self, exc: Exception):
+        self.closed = True
+        self._writer.close()
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(exc)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._reader_task.cancel()
+            self._writer.close()
+
+
+# KEYS: current window, previous window. ARGV: max requests, weight of the
+# previous window, TTL in ms. Counts the request only if it is allowed and
+# returns both counts as they were before it.
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current < tonumber(ARGV[1]) then
+    redis.call('INCR', KEYS[1])
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+return {current, previous}
+"""
+SLIDING_WINDOW_SHA = hashlib.sha1(SLIDING_WINDOW_SCRIPT.encode()).hexdigest()
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Counts shared through Redis or any server speaking RESP.
+
+    Each window's count is its own key (``rl:{<store>:<key>}:<window>``);
+    the braces are a hash tag, so on Redis Cluster both windows of a key
+    land in the same slot. SLIDING_WINDOW_SCRIPT makes the whole decision
+    server-side and atomically, so denied requests are never counted, as
+    with the other backends. It is called by its SHA1, and sent in full
+    only when the server answers NOSCRIPT (after a restart or failover).
+
+    Args:
+        url: redis://[[user]:password@]host[:port][/db]
+        timeout: Seconds to wait for a connection or a reply
+    """
+
+    name = "redis"
+
+    # After a failed connect, don't try again for this long
+    RECONNECT_DELAY_SECONDS = 1.0
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, timeout: float = RATE_LIMIT_REDIS_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._connection: Optional[RespConnection] = None
+        self._connect_lock = asyncio.Lock()
+        self._retry_at = 0.0
+
+    async def _connect(self) -> RespConnection:
+        connection = self._connection
+        if connection is not None and not connection.closed:
+            return connection
+        async with self._connect_lock:
+            connection = self._connection
+            if connection is not None and not connection.closed:
+                return connection
+            if time.monotonic() < self._retry_at:
+                raise ConnectionError("Rate limit backend unavailable; waiting to reconnect")
+            try:
+                self._connection = await RespConnection.open(self.url, self.timeout)
+            except Exception:
+                self._retry_at = time.monotonic() + self.RECONNECT_DELAY_SECONDS
+                raise
+            return self._connection
+
+    async def hit(self, store_name: str, key: str, window_seconds: int, max_requests: int) -> RateLimitDecision:
+        connection = await self._connect()
+        now = time.time()
+        window = int(now // window_seconds)
+        prefix = f"rl:{{{store_name}:{key}}}:"
+        elapsed = now - window * window_seconds
+        arguments = (
+            2,
+            f"{prefix}{window}",
+            f"{prefix}{window - 1}",
+            max_requests,
+            repr(1.0 - elapsed / window_seconds),
+            # Counts are needed until the next window has fully passed
+            window_seconds * 2000,
+        )
+        try:
+            try:
+                (reply,) = await asyncio.wait_for(
+                    connection.execute(("EVALSHA", SLIDING_WINDOW_SHA) + arguments), self.timeout
+                )
+            except RespError as exc:
+                if not str(exc).startswith("NOSCRIPT"):
+                    raise
+                # EVAL also caches the script, so later calls go back to EVALSHA
+                (reply,) = await asyncio.wait_for(
+                    connection.execute(("EVAL", SLIDING_WINDOW_SCRIPT) + arguments), self.timeout
+                )
+        except asyncio.TimeoutError:
+            # Replies may still arrive out of step with new commands; start over
+            connection.close()
+            raise
+
+        # Same inputs as the script, so the same outcome
+        current, previous = reply
+        decision, _ = sliding_window_decision(previous, current, elapsed, window_seconds, max_requests)
+        return decision
+
+    async def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def create_backend(name: str) -> RateLimitBackend:
+    """Build the backend named by RATE_LIMIT_BACKEND."""
+    if name == "memory":
+        return MemoryBackend()
+    if name == "mmap":
+        return MmapBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name!r} (expected memory, mmap or redis)")
@@ -0,0 +1,276 @@
+"""
+Optional in-process snapshot of the registration tables for admin reads.
+
+When SNAPSHOT_ENABLED is set, each worker keeps a copy of
+``registrations`` and ``preregistrations`` as column arrays (one list per
+column plus an id -> position map), refreshed in the background through
+the changes-since query every SNAPSHOT_REFRESH_SECONDS. Admin listings and
+detail reads are then answered from memory.
+
+Each table's columns are declared in TABLE_COLUMNS, so ``fields=`` is
+checked the same way whether or not the table has rows yet; columns a
+refresh sees beyond those are added as they appear. Listing filters are
+evaluated on the column arrays, and a row dict is only built for rows
+that match.
+
+A snapshot is only used while its last successful refresh is at most
+SNAPSHOT_MAX_STALENESS_SECONDS old, and only while the table fits in
+SNAPSHOT_MAX_ROWS; otherwise reads go to PostgREST as before. Deletes are
+not visible to delta refreshes, so the snapshot is rebuilt from scratch
+every SNAPSHOT_RELOAD_SECONDS.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from utils.database import get_admin_client
+from utils.delta_sync import fetch_changes
+from utils.pagination import KEY_COLUMNS, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "false").lower() == "true"
+SNAPSHOT_TABLES = ("registrations", "preregistrations")
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "5"))
+SNAPSHOT_MAX_STALENESS_SECONDS = float(os.getenv("SNAPSHOT_MAX_STALENESS_SECONDS", "30"))
+SNAPSHOT_RELOAD_SECONDS = float(os.getenv("SNAPSHOT_RELOAD_SECONDS", "600"))
+SNAPSHOT_MAX_ROWS = int(os.getenv("SNAPSHOT_MAX_ROWS", "50000"))
+INTERN_MAX_LENGTH = 64
+
+# Columns known without seeing a row (see routers/register.py and the alembic migrations)
+TABLE_COLUMNS = {
+    "registrations": (
+        "id", "user_id", "email", "full_name", "hacker_code",
+        "education_level", "education_level_other", "grade", "year", "major",
+        "gender_identity", "dietary_restrictions", "hackathon_experience", "hackathon_count",
+        "relevant_skills", "interested_in_beginner", "why_interested", "creative_project",
+        "staying_overnight", "general_comments", "rules_consent", "is_minor",
+        "consent_form_url", "created_at", "updated_at",
+    ),
+    "preregistrations": ("id", "email", "created_at", "updated_at"),
+}
+
+# A row filter as (column names, test); the test gets those columns' values
+# in order, and a row matches when every condition's test returns True
+Condition = Tuple[Sequence[str], Callable[..., bool]]
+
+
+class SnapshotTooLarge(Exception):
+    """Raised when a table outgrows SNAPSHOT_MAX_ROWS."""
+
+
+def _sort_key(created_at: str, row_id) -> tuple:
+    return (datetime.fromisoformat(created_at), str(row_id))
+
+
+class TableSnapshot:
+    """
+    Column-array copy of one table, ordered by (created_at, id).
+
+    Args:
+        table: Table name
+        max_rows: Row limit; refreshes past it raise SnapshotTooLarge
+    """
+
+    def __init__(self, table: str, max_rows: int = SNAPSHOT_MAX_ROWS):
+        self.table = table
+        self.max_rows = max_rows
+        self._columns: dict[str, list] = {name: [] for name in TABLE_COLUMNS.get(table, ())}
+        self._positions: dict[str, int] = {}
+        self._keys: list[tuple] = []
+        self._order: list[int] = []  # positions, oldest first
+        self._order_stale = False
+        self._watermark: Optional[str] = None
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.last_error: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _apply(self, rows: list):
+        """Upsert rows, marking the order stale if any row was added or moved."""
+        for row in rows:
+            row_id = str(row["id"])
+            position = self._positions.get(row_id)
+            if position is None:
+                if len(self._keys) >= self.max_rows:
+                    raise SnapshotTooLarge(f"{self.table} has more than {self.max_rows} rows")
+                position = len(self._keys)
+                self._positions[row_id] = position
+                self._keys.append(None)
+                for values in self._columns.values():
+                    values.append(None)
+
+            for column, value in row.items():
+                values = self._columns.get(column)
+                if values is None:
+                    values = self._columns[column] = [None] * len(self._keys)
+                # Short strings (enums, flags, codes) repeat a lot; share one copy
+                if isinstance(value, str) and len(value) <= INTERN_MAX_LENGTH:
+                    value = sys.intern(value)
+                values[position] = value
+            key = _sort_key(row["created_at"], row_id)
+            if self._keys[position] != key:
+                self._keys[position] = key
+                self._order_stale = True
+
+    async def refresh(self):
+        """Pull rows written since the last refresh."""
+        admin_client = await get_admin_client()
+        has_more = True
+        while has_more:
+            rows, watermark, has_more = await fetch_changes(
+                admin_client.table(self.table).select("*"), self._watermark, MAX_PAGE_SIZE
+            )
+            self._apply(rows)
+            self._watermark = watermark or self._watermark
+        if self._order_stale:
+            self._order = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+            self._order_stale = False
+        self.refreshed_at = time.monotonic()
+        self.refreshes += 1
+        self.last_error = None
+
+    def is_fresh(self, max_staleness: float = SNAPSHOT_MAX_STALENESS_SECONDS) -> bool:
+        return self.refreshed_at is not None and time.monotonic() - self.refreshed_at <= max_staleness
+
+    def _row(self, position: int, columns: Optional[Sequence[str]]) -> dict:
+        names = columns if columns is not None else self._columns.keys()
+        return {name: self._columns[name][position] for name in names}
+
+    def _check_columns(self, columns: Optional[Sequence[str]]):
+        for name in columns or ():
+            if name not in self._columns:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+
+    def page(
+        self,
+        cursor: Optional[str],
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+        conditions: Sequence[Condition] = (),
+    ) -> tuple[list, Optional[str]]:
+        """Same contract as utils.pagination.fetch_page, answered from memory."""
+        self._check_columns(columns)
+        missing = [None] * len(self._keys)
+        checks = [
+            ([self._columns.get(name, missing) for name in names], test)
+            for names, test in conditions
+        ]
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            try:
+                start = bisect_left(self._order, _sort_key(created_at, row_id), key=self._keys.__getitem__)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        else:
+            start = len(self._order)
+
+        rows = []
+        for index in range(start - 1, -1, -1):
+            position = self._order[index]
+            if checks and not all(test(*[values[position] for values in arrays]) for arrays, test in checks):
+                continue
+            if len(rows) == limit:
+                # Another match exists, so point the cursor at the last row returned
+                return rows, encode_cursor(self._row(last, KEY_COLUMNS))
+            rows.append(self._row(position, columns))
+            last = position
+        return rows, None
+
+    def get(self, row_id: str, columns: Optional[Sequence[str]] = None) -> Optional[dict]:
+        self._check_columns(columns)
+        position = self._positions.get(row_id)
+        return None if position is None else self._row(position, columns)
+
+    def stats(self) -> dict:
+        # Approximate: list and map overhead plus the values they hold
+        size = sys.getsizeof(self._positions) + sys.getsizeof(self._keys) + sys.getsizeof(self._order)
+        for values in self._columns.values():
+            size += sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+        return {
+            "rows": len(self),
+            "columns": len(self._columns),
+            "approx_bytes": size,
+            "age_seconds": None if self.refreshed_at is None else round(time.monotonic() - self.refreshed_at, 3),
+            "fresh": self.is_fresh(),
+            "refreshes": self.refreshes,
+            "last_error": self.last_error,
+        }
+
+
+_snapshots: dict[str, TableSnapshot] = {}
+_refresher: Optional[asyncio.Task] = None
+
+
+def fresh_snapshot(table: str) -> Optional[TableSnapshot]:
+    """The table's snapshot if it may serve reads right now, else None."""
+    snapshot = _snapshots.get(table)
+    if snapshot is None or not snapshot.is_fresh():
+        return None
+    return snapshot
+
+
+async def _refresh_loop():
+    reload_at = {}
+    while True:
+        for table in SNAPSHOT_TABLES:
+            snapshot = _snapshots.get(table)
+            try:
+                if snapshot is None or time.monotonic() >= reload_at[table]:
+                    # Build the replacement off to the side so reads never see a partial table
+                    replacement = TableSnapshot(table)
+                    await replacement.refresh()
+                    _snapshots[table] = replacement
+                    reload_at[table] = time.monotonic() + SNAPSHOT_RELOAD_SECONDS
+                else:
+                    await snapshot.refresh()
+            except asyncio.CancelledError:
+                raise
+            except SnapshotTooLarge as exc:
+                logger.warning("Dropping %s snapshot: %s", table, exc)
+                _snapshots.pop(table, None)
+                reload_at[table] = time.monotonic() + SNAPSHOT_RELOAD_SECONDS
+            except Exception as exc:
+                logger.warning("Failed to refresh %s snapshot: %s", table, exc)
+                if snapshot is not None:
+                    snapshot.last_error = str(exc)
+        await asyncio.sleep(SNAPSHOT_REFRESH_SECONDS)
+
+
+def start_snapshots():
+    """Start the background refresher if SNAPSHOT_ENABLED is set."""
+    global _refresher
+    if SNAPSHOT_ENABLED and _refresher is None:
+        _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop_snapshots():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
+    _snapshots.clear()
+
+
+def snapshot_stats() -> dict:
+    return {
+        "enabled": SNAPSHOT_ENABLED,
+        "refresh_seconds": SNAPSHOT_REFRESH_SECONDS,
+        "max_staleness_seconds": SNAPSHOT_MAX_STALENESS_SECONDS,
+        "max_rows": SNAPSHOT_MAX_ROWS,
+        "tables": {table: snapshot.stats() for table, snapshot in _snapshots.items()},
+    }
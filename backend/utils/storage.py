@@ -1,63 +1,200 @@
+import os
 import logging
+from typing import AsyncIterator, Iterable, Optional
 from fastapi import UploadFile, HTTPException
-from utils.supabase_client import supabase
+from utils.database import get_client, with_timeout
+from utils.cache import TTLCache
 import uuid
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_MIME_TYPES = ['application/pdf', 'image/jpeg', 'image/png']
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+UPLOAD_CHUNK_SIZE = 64 * 1024  # Peak memory per upload is one chunk
+UPLOAD_TIMEOUT_SECONDS = 60
 
+# Signed consent form URLs are reused until SIGNED_URL_REFRESH_MARGIN_SECONDS
+# before they expire, so a link handed out is always valid for at least that long.
+SIGNED_URL_EXPIRY_SECONDS = 3600
+SIGNED_URL_REFRESH_MARGIN_SECONDS = int(os.getenv("SIGNED_URL_REFRESH_MARGIN_SECONDS", "300"))
+SIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv("SIGNED_URL_CACHE_MAX_ENTRIES", "5000"))
 
-async def upload_guardian_form(file: UploadFile, user_id: str) -> str:
-    """Upload guardian consent form to Supabase Storage"""
+# File signatures, checked against the start of the upload instead of trusting content_type
+MAGIC_NUMBERS = {
+    b'%PDF-': 'application/pdf',
+    b'\xff\xd8\xff': 'image/jpeg',
+    b'\x89PNG\r\n\x1a\n': 'image/png',
+}
 
-    # Validate file type
-    if file.content_type not in ALLOWED_MIME_TYPES:
+# Stored file extension for each detected type
+EXTENSIONS = {
+    'application/pdf': 'pdf',
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+}
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """Detect an allowed MIME type from the first bytes of a file"""
+    for magic, mime_type in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return mime_type
+    return None
+
+
+async def validate_guardian_form(file: UploadFile) -> str:
+    """
+    Reject consent forms with a disallowed type or size before doing any work.
+
+    Returns:
+        The MIME type detected from the file's magic bytes
+    """
+    # Multipart uploads are fully received by now, so their size is known
+    # (BodySizeLimitMiddleware caps how much is received in the first place)
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size must be under 5MB")
+
+    # Validate file type from its signature
+    head = await file.read(16)
+    await file.seek(0)
+    mime_type = sniff_mime_type(head)
+    if mime_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: PDF, JPEG, PNG"
         )
+    return mime_type
 
-    # Read file content
-    content = await file.read()
 
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File size must be under 5MB")
+def guardian_form_path(user_id: str, mime_type: str) -> str:
+    """Generate a unique storage path for a user's consent form"""
+    # The extension follows the detected type, never the client's filename
+    return f"{user_id}/{uuid.uuid4()}.{EXTENSIONS[mime_type]}"
 
-    # Generate unique filename
-    ext = file.filename.split('.')[-1] if '.' in file.filename else 'pdf'
-    filename = f"{user_id}/{uuid.uuid4()}.{ext}"
+
+async def _read_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """Yield the spooled file in chunks"""
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def upload_guardian_form(file: UploadFile, user_id: str, path: Optional[str] = None) -> str:
+    """
+    Upload guardian consent form to Supabase Storage.
+
+    The body is streamed to the Storage API chunk by chunk rather than read
+    into memory.
+    """
+
+    mime_type = await validate_guardian_form(file)
+    filename = path or guardian_form_path(user_id, mime_type)
+
+    headers = {"content-type": mime_type, "x-upsert": "false"}
+    if file.size is not None:
+        headers["content-length"] = str(file.size)
 
     try:
-        # Upload to Supabase Storage
-        result = supabase.storage.from_('guardian-forms').upload(
-            filename,
-            content,
-            {"content-type": file.content_type}
+        # Upload to Supabase Storage (raw body upload, same endpoint storage3 uses)
+        client = await get_client()
+        response = await with_timeout(
+            client.storage.session.post(
+                f"/object/guardian-forms/{filename}",
+                content=_read_chunks(file),
+                headers=headers,
+            ),
+            UPLOAD_TIMEOUT_SECONDS,
         )
+        if response.is_error:
+            raise Exception(f"{response.status_code} {response.text}")
 
         # Return the storage path (can be used to generate signed URLs later)
         return filename
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
 
-def get_guardian_form_url(filename: str) -> str:
+_signed_urls = TTLCache(
+    maxsize=SIGNED_URL_CACHE_MAX_ENTRIES,
+    ttl=SIGNED_URL_EXPIRY_SECONDS - SIGNED_URL_REFRESH_MARGIN_SECONDS,
+)
+
+
+async def delete_guardian_form(filename: str):
+    """Remove an uploaded consent form (best effort, used to undo failed writes)"""
+    _signed_urls.pop(filename)
+    try:
+        client = await get_client()
+        await with_timeout(client.storage.from_('guardian-forms').remove([filename]))
+    except Exception as e:
+        logger.exception("Failed to delete guardian form %s: %s", filename, e)
+
+
+async def get_guardian_form_urls(filenames: Iterable[str]) -> dict[str, str]:
+    """
+    Signed URLs for many guardian forms, keyed by path.
+
+    Cached URLs are reused; the rest are signed in one bulk storage request.
+    Paths that could not be signed (e.g. the object doesn't exist) are left
+    out of the result.
+    """
+    urls = {}
+    missing = []
+    for filename in dict.fromkeys(filenames):
+        cached = _signed_urls.get(filename)
+        if cached is not None:
+            urls[filename] = cached
+        else:
+            missing.append(filename)
+
+    if not missing:
+        return urls
+
+    try:
+        client = await get_client()
+        results = await with_timeout(client.storage.from_('guardian-forms').create_signed_urls(
+            missing,
+            SIGNED_URL_EXPIRY_SECONDS
+        ))
+    except Exception as e:
+        logger.exception("Failed to create signed URLs for %d files: %s", len(missing), e)
+        return urls
+
+    for item in results:
+        path = item.get('path')
+        signed_url = item.get('signedUrl') or item.get('signedURL')
+        if item.get('error') or not path or not signed_url:
+            logger.warning("No signed URL for file %s: %s", path, item.get('error'))
+            continue
+        _signed_urls.set(path, signed_url)
+        urls[path] = signed_url
+    return urls
+
+
+async def get_guardian_form_url(filename: str) -> str:
     """Generate a signed URL for accessing a guardian form"""
+    cached = _signed_urls.get(filename)
+    if cached is not None:
+        return cached
+
     try:
-        # Create signed URL valid for 1 hour
-        result = supabase.storage.from_('guardian-forms').create_signed_url(
+        client = await get_client()
+        result = await with_timeout(client.storage.from_('guardian-forms').create_signed_url(
             filename,
-            3600  # 1 hour expiry
-        )
+            SIGNED_URL_EXPIRY_SECONDS
+        ))
         logger.info("Supabase create_signed_url result: %s", result)
         # Handle both possible key names from different SDK versions
         signed_url = result.get('signedUrl') or result.get('signedURL') or ''
         if not signed_url:
             logger.warning("No signed URL in result for file: %s", filename)
+        else:
+            _signed_urls.set(filename, signed_url)
         return signed_url
     except Exception as e:
         logger.exception("Failed to create signed URL for %s: %s", filename, e)
@@ -1,5 +1,4 @@
 import os
-from supabase import create_client
 from dotenv import load_dotenv
 import logging
 
@@ -28,12 +27,6 @@ if not SUPABASE_URL.startswith(("http://", "https://")):
 
 # Log URL (masked for security)
 masked_url = SUPABASE_URL[:20] + "..." if len(SUPABASE_URL) > 20 else SUPABASE_URL
-logger.info(f"Initializing Supabase client with URL: {masked_url}")
+logger.info(f"Supabase configured with URL: {masked_url}")
 
-try:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    logger.info("Supabase client initialized successfully")
-except Exception as e:
-    error_msg = f"Failed to create Supabase client: {str(e)}. Check SUPABASE_URL format and network connectivity."
-    logger.error(error_msg)
-    raise ValueError(error_msg) from e
+# Clients are created lazily and shared process-wide in utils/database.py
@@ -18,10 +18,7 @@ export const AuthProvider = ({ children }) => {
       setSession(session)
       setUser(session?.user ?? null)
       if (session?.user) {
-        await Promise.all([
-          fetchRegistration(session.access_token),
-          fetchAdminStatus(session.access_token)
-        ])
+        await fetchBootstrap(session.access_token)
       } else {
         setIsAdmin(false)
       }
@@ -36,10 +33,7 @@ export const AuthProvider = ({ children }) => {
 
         // Only refetch on actual sign-in, not token refresh (which fires on tab focus)
         if (event === 'SIGNED_IN' && session?.user) {
-          await Promise.all([
-            fetchRegistration(session.access_token),
-            fetchAdminStatus(session.access_token)
-          ])
+          await fetchBootstrap(session.access_token)
         } else if (event === 'SIGNED_OUT' || !session?.user) {
           setRegistration(null)
           setIsAdmin(false)
@@ -50,6 +44,33 @@ export const AuthProvider = ({ children }) => {
     return () => subscription.unsubscribe()
   }, [])
 
+  // Registration and admin status in a single request
+  const fetchBootstrap = async (accessToken) => {
+    try {
+      const response = await fetch('/api/me/bootstrap', {
+        headers: {
+          'Authorization': `Bearer ${accessToken}`
+        }
+      })
+      if (response.ok) {
+        const data = await response.json()
+        setRegistration(data.registration)
+        setIsAdmin(Boolean(data.is_admin))
+        return data
+      }
+      // Fall back to the individual endpoints (e.g. older backend)
+      await Promise.all([
+        fetchRegistration(accessToken),
+        fetchAdminStatus(accessToken)
+      ])
+    } catch (error) {
+      console.error('Failed to fetch session data:', error)
+      setRegistration(null)
+      setIsAdmin(false)
+    }
+    return null
+  }
+
   const fetchRegistration = async (accessToken) => {
     try {
       const response = await fetch('/api/registration', {
@@ -1,9 +1,31 @@
-import { useEffect, useMemo, useState } from 'react'
+import { useEffect, useMemo, useRef, useState } from 'react'
 import { FaCheck, FaDownload, FaExternalLinkAlt, FaSortDown, FaSortUp } from 'react-icons/fa'
 import * as XLSX from 'xlsx'
 import { useAuth } from '../contexts/AuthContext'
 import './AdminPage.css'
 
+// How often the page polls for registrations written since the last sync;
+// the live feed usually triggers a sync sooner
+const REFRESH_INTERVAL_MS = 30000
+const LIVE_FEED_RETRY_MS = 5000
+const SEARCH_DEBOUNCE_MS = 300
+
+// Columns the first sync needs for the summary cards
+const SUMMARY_FIELDS = 'id,staying_overnight,interested_in_beginner'
+// Columns the simple table shows (and later syncs fetch, to update it in place);
+// the advanced view and the export load every column
+const SIMPLE_VIEW_FIELDS = [
+  'id',
+  'user_id',
+  'full_name',
+  'email',
+  'hacker_code',
+  'created_at',
+  'staying_overnight',
+  'interested_in_beginner',
+  'consent_form_url'
+].join(',')
+
 const toBoolean = (value) => value === true || value === 'true' || value === 1 || value === '1'
 
 const pickFlag = (record, keys) => keys.some((key) => toBoolean(record?.[key]))
@@ -19,39 +41,145 @@ const formatDate = (value) => {
   return date.toLocaleString()
 }
 
+const parseErrorDetail = async (response, fallbackMessage) => {
+  const rawText = await response.text()
+  let detail = ''
+  if (rawText) {
+    try {
+      const parsed = JSON.parse(rawText)
+      detail = parsed.detail || ''
+    } catch {
+      detail = rawText
+    }
+  }
+  return detail || fallbackMessage
+}
+
+// Every page of GET /admin/registrations for the given query parameters
+const fetchAllRegistrations = async (accessToken, query) => {
+  const rows = []
+  let cursor = null
+  do {
+    const params = new URLSearchParams({ ...query, limit: '500' })
+    if (cursor) params.set('cursor', cursor)
+
+    const response = await fetch(`/api/admin/registrations?${params}`, {
+      headers: {
+        'Authorization': `Bearer ${accessToken}`
+      }
+    })
+
+    if (!response.ok) {
+      const detail = await parseErrorDetail(response, 'Failed to load registrations')
+      throw new Error(detail)
+    }
+
+    const data = await response.json()
+    rows.push(...(data.registrations || []))
+    cursor = data.next_cursor
+  } while (cursor)
+  return rows
+}
+
+// Client-side twin of the API's q filter, applied only to rows from a delta sync
+const matchesSearch = (record, term) => {
+  if (!term) return true
+  const needle = term.toLowerCase()
+  return [record.full_name, record.email, record.hacker_code]
+    .some((value) => typeof value === 'string' && value.toLowerCase().includes(needle))
+}
+
+// Upsert rows by id, keeping columns the new copy wasn't fetched with
+const mergeById = (current, rows) => {
+  const byId = new Map(current.map((record) => [record.id, record]))
+  rows.forEach((record) => byId.set(record.id, { ...byId.get(record.id), ...record }))
+  return Array.from(byId.values())
+}
+
+const normalizeRecord = (record) => {
+  const fridayCheckIn = pickFlag(record, [
+    'check_in_friday',
+    'friday_check_in',
+    'checked_in_friday'
+  ])
+  const saturdayCheckIn = pickFlag(record, [
+    'check_in_saturday',
+    'saturday_check_in',
+    'checked_in_saturday'
+  ])
+  const foodFriday = pickFlag(record, [
+    'food_received_friday',
+    'friday_food_received'
+  ])
+  const foodSaturday = pickFlag(record, [
+    'food_received_saturday',
+    'saturday_food_received'
+  ])
+  const registered = Boolean(
+    record.consent_form_url ||
+    toBoolean(record.is_registered) ||
+    toBoolean(record.registered) ||
+    ['registered', 'confirmed'].includes(record.status)
+  )
+
+  return {
+    id: record.id || record.user_id || formatEmail(record),
+    name: formatName(record),
+    email: formatEmail(record),
+    registered,
+    fridayCheckIn,
+    saturdayCheckIn,
+    foodFriday,
+    foodSaturday,
+    consentFormUrl: record.consent_form_url || null,
+    createdAt: record.created_at || null,
+    stayingOvernight: toBoolean(record.staying_overnight),
+    interestedInBeginner: toBoolean(record.interested_in_beginner)
+  }
+}
+
 const AdminPage = () => {
   const { session, isAdmin } = useAuth()
   const [registrations, setRegistrations] = useState([])
+  const [listedRegistrations, setListedRegistrations] = useState([])
   const [isLoading, setIsLoading] = useState(true)
+  const [isListLoading, setIsListLoading] = useState(true)
+  const [isExporting, setIsExporting] = useState(false)
   const [error, setError] = useState('')
   const [sortConfig, setSortConfig] = useState({ key: 'name', direction: 'asc' })
   const [fridayFilter, setFridayFilter] = useState('all')
   const [saturdayFilter, setSaturdayFilter] = useState('all')
   const [registrationSearch, setRegistrationSearch] = useState('')
+  const [searchTerm, setSearchTerm] = useState('')
   const [advancedView, setAdvancedView] = useState(false)
   const [selectedRowId, setSelectedRowId] = useState(null)
+  // The listing's current query, read by the sync to merge changes into it
+  const listQuery = useRef({ advancedView: false, searchTerm: '' })
 
   useEffect(() => {
-    const parseErrorDetail = async (response, fallbackMessage) => {
-      const rawText = await response.text()
-      let detail = ''
-      if (rawText) {
-        try {
-          const parsed = JSON.parse(rawText)
-          detail = parsed.detail || ''
-        } catch {
-          detail = rawText
-        }
-      }
-      return detail || fallbackMessage
-    }
+    const timeout = setTimeout(() => setSearchTerm(registrationSearch.trim()), SEARCH_DEBOUNCE_MS)
+    return () => clearTimeout(timeout)
+  }, [registrationSearch])
 
-    const loadRegistrations = async () => {
-      setIsLoading(true)
-      setError('')
+  useEffect(() => {
+    let watermark = null
+    let cancelled = false
+
+    // Fetch every row written since the watermark, following has_more
+    const syncRegistrations = async () => {
+      const isDelta = watermark !== null
+      const changed = []
+      let hasMore = true
+      while (hasMore) {
+        const params = new URLSearchParams({ limit: '500' })
+        if (!isDelta) {
+          params.set('fields', SUMMARY_FIELDS)
+        } else if (!listQuery.current.advancedView) {
+          params.set('fields', SIMPLE_VIEW_FIELDS)
+        }
+        if (watermark) params.set('since', watermark)
 
-      try {
-        const response = await fetch('/api/admin/registrations', {
+        const response = await fetch(`/api/admin/registrations/changes?${params}`, {
           headers: {
             'Authorization': `Bearer ${session.access_token}`
           }
@@ -63,7 +191,32 @@ const AdminPage = () => {
         }
 
         const data = await response.json()
-        setRegistrations(data.registrations || [])
+        changed.push(...(data.registrations || []))
+        watermark = data.watermark
+        hasMore = data.has_more
+      }
+
+      if (cancelled || changed.length === 0) return
+      // Rows can be delivered more than once, so merge by id
+      setRegistrations((current) => mergeById(current, changed))
+      if (isDelta) {
+        const { searchTerm: term } = listQuery.current
+        const matching = changed.filter((record) => matchesSearch(record, term))
+        const stale = new Set(changed.filter((record) => !matchesSearch(record, term)).map((record) => record.id))
+        setListedRegistrations((current) => mergeById(
+          current.filter((record) => !stale.has(record.id)),
+          matching
+        ))
+      }
+    }
+
+    const loadRegistrations = async () => {
+      setIsLoading(true)
+      setError('')
+      setRegistrations([])
+
+      try {
+        await syncRegistrations()
       } catch (err) {
         setError(err.message || 'Failed to load registrations')
       } finally {
@@ -76,53 +229,109 @@ const AdminPage = () => {
       return
     }
 
-    loadRegistrations()
-  }, [session])
-
-  const normalizedRegistrations = useMemo(() => (
-    registrations.map((record) => {
-      const fridayCheckIn = pickFlag(record, [
-        'check_in_friday',
-        'friday_check_in',
-        'checked_in_friday'
-      ])
-      const saturdayCheckIn = pickFlag(record, [
-        'check_in_saturday',
-        'saturday_check_in',
-        'checked_in_saturday'
-      ])
-      const foodFriday = pickFlag(record, [
-        'food_received_friday',
-        'friday_food_received'
-      ])
-      const foodSaturday = pickFlag(record, [
-        'food_received_saturday',
-        'saturday_food_received'
-      ])
-      const registered = Boolean(
-        record.consent_form_url ||
-        toBoolean(record.is_registered) ||
-        toBoolean(record.registered) ||
-        ['registered', 'confirmed'].includes(record.status)
-      )
+    // Collapse overlapping sync requests into at most one follow-up run
+    let syncing = false
+    let syncPending = false
+    const requestSync = async () => {
+      if (syncing) {
+        syncPending = true
+        return
+      }
+      syncing = true
+      try {
+        do {
+          syncPending = false
+          await syncRegistrations().catch(() => {})
+        } while (syncPending && !cancelled)
+      } finally {
+        syncing = false
+      }
+    }
 
-      return {
-        id: record.id || record.user_id || formatEmail(record),
-        name: formatName(record),
-        email: formatEmail(record),
-        registered,
-        fridayCheckIn,
-        saturdayCheckIn,
-        foodFriday,
-        foodSaturday,
-        consentFormUrl: record.consent_form_url || null,
-        createdAt: record.created_at || null,
-        stayingOvernight: toBoolean(record.staying_overnight),
-        interestedInBeginner: toBoolean(record.interested_in_beginner)
+    // Live feed: any event means something changed, so pull the delta
+    const controller = new AbortController()
+    const listenForChanges = async () => {
+      while (!cancelled) {
+        try {
+          const response = await fetch('/api/admin/events', {
+            headers: {
+              'Authorization': `Bearer ${session.access_token}`
+            },
+            signal: controller.signal
+          })
+          if (!response.ok || !response.body) throw new Error('Live feed unavailable')
+
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+          let buffer = ''
+          for (;;) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += value
+            const frames = buffer.split('\n\n')
+            buffer = frames.pop()
+            if (frames.some((frame) => frame.split('\n').some((line) => line.startsWith('event:')))) {
+              requestSync()
+            }
+          }
+        } catch {
+          if (cancelled) return
+        }
+        await new Promise((resolve) => setTimeout(resolve, LIVE_FEED_RETRY_MS))
       }
+    }
+
+    let interval = null
+    loadRegistrations().then(() => {
+      if (cancelled) return
+      interval = setInterval(requestSync, REFRESH_INTERVAL_MS)
+      listenForChanges()
     })
+
+    return () => {
+      cancelled = true
+      controller.abort()
+      clearInterval(interval)
+    }
+  }, [session])
+
+  // The table is listed by the API, filtered and projected server-side, when
+  // the query changes; syncs after that merge changed rows into it
+  useEffect(() => {
+    if (!session?.access_token) {
+      setIsListLoading(false)
+      return
+    }
+
+    let cancelled = false
+    listQuery.current = { advancedView, searchTerm }
+    const query = {}
+    if (!advancedView) query.fields = SIMPLE_VIEW_FIELDS
+    if (searchTerm) query.q = searchTerm
+
+    fetchAllRegistrations(session.access_token, query)
+      .then((rows) => {
+        if (!cancelled) setListedRegistrations(rows)
+      })
+      .catch((err) => {
+        if (!cancelled) setError(err.message || 'Failed to load registrations')
+      })
+      .finally(() => {
+        if (!cancelled) setIsListLoading(false)
+      })
+
+    return () => {
+      cancelled = true
+    }
+  }, [session, advancedView, searchTerm])
+
+  const normalizedRegistrations = useMemo(() => (
+    registrations.map(normalizeRecord)
   ), [registrations])
 
+  const normalizedListedRegistrations = useMemo(() => (
+    listedRegistrations.map(normalizeRecord)
+  ), [listedRegistrations])
+
   const openConsentForm = async (consentFormPath) => {
     try {
       const response = await fetch(
@@ -168,12 +377,9 @@ const AdminPage = () => {
     }
   }, [normalizedRegistrations])
 
+  // Search is applied by the API; check-in status has no server-side filter
   const filteredRegistrations = useMemo(() => (
-    normalizedRegistrations.filter((record) => {
-      const searchValue = registrationSearch.trim().toLowerCase()
-      const matchesSearch = !searchValue
-        || record.name.toLowerCase().includes(searchValue)
-        || record.email.toLowerCase().includes(searchValue)
+    normalizedListedRegistrations.filter((record) => {
       const fridayMatch = fridayFilter === 'all'
         || (fridayFilter === 'checked' && record.fridayCheckIn)
         || (fridayFilter === 'not' && !record.fridayCheckIn)
@@ -182,19 +388,9 @@ const AdminPage = () => {
         || (saturdayFilter === 'checked' && record.saturdayCheckIn)
         || (saturdayFilter === 'not' && !record.saturdayCheckIn)
 
-      return matchesSearch && fridayMatch && saturdayMatch
+      return fridayMatch && saturdayMatch
     })
-  ), [normalizedRegistrations, fridayFilter, saturdayFilter, registrationSearch])
-
-  const advancedFilteredRegistrations = useMemo(() => {
-    const searchValue = registrationSearch.trim().toLowerCase()
-    if (!searchValue) return registrations
-    return registrations.filter((record) => (
-      [record.full_name, record.name, record.email, record.user_email, record.hacker_code]
-        .filter(Boolean)
-        .some((value) => String(value).toLowerCase().includes(searchValue))
-    ))
-  }, [registrations, registrationSearch])
+  ), [normalizedListedRegistrations, fridayFilter, saturdayFilter])
 
   const sortedRegistrations = useMemo(() => {
     const sorted = [...filteredRegistrations]
@@ -244,8 +440,20 @@ const AdminPage = () => {
     return sortConfig.direction === 'asc' ? <FaSortUp /> : <FaSortDown />
   }
 
-  const exportToExcel = () => {
-    const dataToExport = registrations.map((record) => ({
+  const exportToExcel = async () => {
+    setIsExporting(true)
+    let allRegistrations
+    try {
+      allRegistrations = await fetchAllRegistrations(session.access_token, {})
+    } catch (err) {
+      console.error('Failed to export registrations:', err)
+      alert('Failed to export registrations. Please try again.')
+      return
+    } finally {
+      setIsExporting(false)
+    }
+
+    const dataToExport = allRegistrations.map((record) => ({
       'ID': record.id || '',
       'User ID': record.user_id || '',
       'Full Name': record.full_name || record.name || '',
@@ -343,7 +551,7 @@ const AdminPage = () => {
               type="button"
               className="export-btn"
               onClick={exportToExcel}
-              disabled={registrations.length === 0}
+              disabled={registrations.length === 0 || isExporting}
             >
               <FaDownload /> Export Excel
             </button>
@@ -414,7 +622,7 @@ const AdminPage = () => {
           </div>
         </div>
 
-        {isLoading ? (
+        {isLoading || isListLoading ? (
           <div className="admin-empty-state">Loading registrations...</div>
         ) : error ? (
           <div className="admin-empty-state error">{error}</div>
@@ -429,14 +637,14 @@ const AdminPage = () => {
                 </tr>
               </thead>
               <tbody>
-                {advancedFilteredRegistrations.length === 0 ? (
+                {listedRegistrations.length === 0 ? (
                   <tr>
                     <td colSpan={advancedColumns.length} className="admin-empty-row">
                       No registrations found.
                     </td>
                   </tr>
                 ) : (
-                  advancedFilteredRegistrations.map((record) => {
+                  listedRegistrations.map((record) => {
                     const rowId = record.id || record.user_id
                     return (
                       <tr